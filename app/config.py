@@ -22,6 +22,102 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days (Laravel Sanctum default)
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 30  # denylist refresh from token_revocations
+    TOKEN_CACHE_SIZE: int = 20000  # verified tokens kept per worker (0 = disabled)
+    TOKEN_CACHE_CHECK_EXPIRY: bool = True  # re-check exp on every cache hit
+    TOKEN_CACHE_LEEWAY_SECONDS: int = 0  # clock skew allowance for that check
+    
+    # Laravel Passport tokens (oauth_access_tokens)
+    PASSPORT_TOKENS_ENABLED: bool = False
+    PASSPORT_PUBLIC_KEY_PATH: Optional[str] = None  # oauth-public.key, required when enabled; RS256 needs `cryptography`
+    PASSPORT_TOKEN_CACHE_SIZE: int = 20000
+    PASSPORT_TOKEN_CACHE_TTL_SECONDS: int = 60
+    PASSPORT_BATCH_WINDOW_MS: int = 5
+    PASSPORT_BATCH_MAX_SIZE: int = 100
+    
+    # Product barcode/code index (TransaksiService.get_product_by_barcode)
+    PRODUCT_INDEX_ENABLED: bool = True
+    PRODUCT_INDEX_REFRESH_SECONDS: int = 30  # incremental, from products.updated_at
+    PRODUCT_INDEX_FULL_RELOAD_SECONDS: int = 3600  # picks up deleted products
+    
+    # Product name search (/products/search): per-store trigram index built from the
+    # product index; falls back to LIKE queries when disabled or still building
+    PRODUCT_SEARCH_ENABLED: bool = True
+    PRODUCT_SEARCH_MAX_RESULTS: int = 50
+    
+    # Price tier cache (TransaksiService.get_harga)
+    PRICE_CACHE_ENABLED: bool = True
+    PRICE_CACHE_REFRESH_SECONDS: int = 30  # incremental, from product_prices.updated_at
+    PRICE_CACHE_FULL_RELOAD_SECONDS: int = 3600  # picks up deleted tiers
+    
+    # Catalog snapshot: products, price tiers, units, taxes in one mmap'd file shared by all
+    # workers (page cache); product index / price cache keep only deltas on top of it.
+    # Rebuilt by one worker (flock) every PRODUCT_INDEX_FULL_RELOAD_SECONDS
+    CATALOG_SNAPSHOT_ENABLED: bool = False
+    CATALOG_SNAPSHOT_PATH: str = "var/catalog.snapshot"
+    
+    # Promotion calendar (TransaksiService.check_promo)
+    PROMO_CALENDAR_ENABLED: bool = True
+    PROMO_CALENDAR_REFRESH_SECONDS: int = 60  # reload windows from products/product_promos
+    
+    # Reference data cache (units, taxes, customer_groups)
+    REFERENCE_DATA_ENABLED: bool = True
+    REFERENCE_DATA_REFRESH_SECONDS: int = 60  # version check; reloads only on change
+    
+    # Cart versioning / delta responses. Versions live in worker memory, so they are only
+    # used with CART_ENGINE_ENABLED (every cart pinned to its owner worker); without the
+    # engine this flag has no effect and carts are always sent in full.
+    CART_DELTA_ENABLED: bool = True
+    CART_VERSION_MAX_CARTS: int = 5000
+    
+    # Cart engine: carts in memory, journal on local disk, write-behind to transaksi_detail.
+    # Each transaksi is pinned to worker (transaksi_id % CART_WORKER_COUNT); run one
+    # process per CART_WORKER_INDEX and route carts to their owner (421 + X-Cart-Worker otherwise).
+    # Not compatible with `uvicorn --workers N` (all N share one CART_WORKER_INDEX): the index
+    # is locked in CART_JOURNAL_DIR at startup and a second process with the same index fails
+    CART_ENGINE_ENABLED: bool = False
+    CART_JOURNAL_DIR: str = "var/cart-journal"
+    CART_JOURNAL_FSYNC: bool = False
+    CART_FLUSH_INTERVAL_SECONDS: float = 2
+    CART_IDLE_SECONDS: int = 900  # evict clean carts idle this long
+    CART_WORKER_INDEX: int = 0
+    CART_WORKER_COUNT: int = 1
+    
+    # Transactional outbox: checkout commits sale + stock + one outbox event; payments,
+    # balance, customer_logs and product_logs are written by the outbox worker (every
+    # process runs one; SKIP LOCKED needs MySQL 8)
+    OUTBOX_ENABLED: bool = False
+    OUTBOX_POLL_SECONDS: float = 1
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_ATTEMPTS: int = 10  # failing events are left pending after this many tries
+    
+    # Sale / payment reference numbers from per-store hi/lo blocks (sequence_counters);
+    # off = old timestamp + random references
+    SEQUENCE_ALLOCATOR_ENABLED: bool = True
+    SEQUENCE_BLOCK_SIZE: int = 100  # values reserved per round trip (lost on restart)
+    
+    # Idempotent checkout (Idempotency-Key header): keys in idempotency_keys + per-worker LRU
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # replay window; older keys are purged
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_PURGE_SECONDS: int = 3600
+    
+    # Stock reservations: carts hold stock at scan time (per-worker ledger),
+    # finalize decrements with one conditional UPDATE instead of SELECT ... FOR UPDATE
+    STOCK_RESERVATION_ENABLED: bool = False
+    STOCK_RESERVATION_TTL_SECONDS: int = 1800  # idle carts lose their reservations
+    STOCK_RESERVATION_EXPIRE_SECONDS: int = 60
+    STOCK_ONHAND_TTL_SECONDS: int = 30  # on-hand qty cached for availability at scan
+    
+    # Stock write mode: "row" = each sale updates product_warehouse (row lock per product);
+    # "journal" = sales append deltas to stock_journal, folded into qty by the compactor
+    STOCK_MODE: str = "row"
+    STOCK_COMPACT_SECONDS: int = 2
+    STOCK_COMPACT_BATCH_SIZE: int = 5000
+    
+    # Group commit: finalizes arriving within the window share one transaction (per worker)
+    CHECKOUT_BATCH_ENABLED: bool = False
+    CHECKOUT_BATCH_WINDOW_MS: int = 5
+    CHECKOUT_BATCH_MAX_SIZE: int = 50  # dispatch early when this many are waiting
     
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:3000"]
@@ -31,6 +127,12 @@ class Settings(BaseSettings):
     
     # Password Hashing (Laravel compatible)
     BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2  # bcrypt threads per worker process
+    PASSWORD_HASH_MAX_QUEUE: int = 64  # waiting logins before 503
+    
+    # Authenticated user cache (get_current_user)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 300
     
     model_config = SettingsConfigDict(
         env_file=".env",
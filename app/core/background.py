@@ -0,0 +1,49 @@
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+
+
+class PeriodicTask:
+    """
+    Run an async callable every ``interval`` seconds on the event loop.
+
+    Started and stopped from the FastAPI lifespan hook. Errors are logged
+    and the loop keeps running, so a failed refresh only delays the next one.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.runs = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+                self.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Background task {self.name} failed: {e}")
+                if settings.DEBUG:
+                    traceback.print_exc()
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -44,4 +44,33 @@ class InactiveUserException(HTTPException):
         super().__init__(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=detail,
-        )
\ No newline at end of file
+        )
+
+
+class ServiceBusyException(HTTPException):
+    """Exception when a bounded worker pool is saturated"""
+    def __init__(self, detail: str = "Server is busy, please retry", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class CartNotOwnedException(HTTPException):
+    """Exception when a cart is owned by another worker (cart engine pinning)"""
+    def __init__(self, owner: int, detail: str = "Cart is handled by another worker"):
+        super().__init__(
+            status_code=status.HTTP_421_MISDIRECTED_REQUEST,
+            detail=detail,
+            headers={"X-Cart-Worker": str(owner)},
+        )
+
+
+class CartClosedException(HTTPException):
+    """Exception when a cart was checked out while the request waited for it"""
+    def __init__(self, detail: str = "Cart sudah di-checkout"):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail,
+        )
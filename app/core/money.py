@@ -0,0 +1,192 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Union
+
+Number = Union[int, float, Decimal, str, None]
+
+SEN_PER_RUPIAH = 100
+HUNDRED_RUPIAH = 100 * SEN_PER_RUPIAH
+
+_ONE = Decimal(1)
+
+
+def to_fixed(value: Number) -> int:
+    """
+    Scale a value with 2 decimals (Numeric(..., 2) column, request float)
+    to an integer of hundredths, rounding half up.
+
+    Used for money (sen), quantities and tax rates alike.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        scaled = value * 100
+        nearest = round(scaled)
+        if abs(scaled - nearest) < 1e-6:  # 2 decimals: exact, far from any .5 tie
+            return nearest
+        value = repr(value)  # shortest repr, so 0.1 is 0.1 and not 0.1000000000000000055
+    elif isinstance(value, Decimal) and value.as_tuple().exponent >= -2:
+        return int(value.scaleb(2))
+    return int((Decimal(value) * 100).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+to_sen = to_fixed
+
+
+def from_sen(sen: int) -> float:
+    """Sen to rupiah for the API / ORM boundary (nearest float to the exact value)"""
+    return sen / SEN_PER_RUPIAH
+
+
+def to_decimal(sen: int) -> Decimal:
+    return Decimal(sen).scaleb(-2)
+
+
+def div_half_up(numerator: int, denominator: int) -> int:
+    """Integer division rounding half away from zero (PHP / MySQL ROUND)"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def floor_hundreds(sen: int) -> int:
+    """Round down to hundreds of rupiah"""
+    return (sen // HUNDRED_RUPIAH) * HUNDRED_RUPIAH
+
+
+def round_hundreds(sen: int) -> int:
+    """Round to the nearest hundred rupiah, half up"""
+    return div_half_up(sen, HUNDRED_RUPIAH) * HUNDRED_RUPIAH
+
+
+def sum_sen(values: Iterable[Number]) -> int:
+    """Exact sum of money values in sen"""
+    return sum(to_sen(value) for value in values)
+
+
+class PriceLine(NamedTuple):
+    """One priced cart line, all amounts in sen"""
+    harganet: int
+    pajak: int
+    total: int
+    profit: int
+
+
+def price_line(
+    price: int,
+    cost: int,
+    tax_rate: int,
+    qty: int,
+    tax_method: Optional[str],
+    cust_group: int,
+) -> PriceLine:
+    """
+    Exact line pricing on integers.
+
+    ``price``/``cost`` are in sen, ``tax_rate`` in hundredths of a percent
+    and ``qty`` in hundredths (see to_fixed). Every amount is computed from
+    the exact rational value and rounded once, so tax-inclusive net prices
+    and profits do not carry the error of an already rounded net price.
+    """
+    if cust_group != 1:  # Cabang/Gudang: harga = cost, tanpa pajak
+        return PriceLine(
+            price, 0, div_half_up(price * qty, 100), div_half_up((price - cost) * qty, 100)
+        )
+
+    if tax_method == "1":  # Exclude tax
+        pajak = div_half_up(price * tax_rate * qty, 10000 * 100)
+        return PriceLine(
+            price,
+            pajak,
+            div_half_up(price * qty, 100) + pajak,
+            div_half_up((price - cost) * qty, 100),
+        )
+
+    # Include tax: harganet = price * 100 / (100 + rate)
+    denominator = 10000 + tax_rate
+    return PriceLine(
+        div_half_up(price * 10000, denominator),
+        div_half_up(price * tax_rate * qty, denominator * 100),
+        div_half_up(price * qty, 100),
+        div_half_up((price * 10000 - cost * denominator) * qty, denominator * 100),
+    )
+
+
+class PriceColumns(NamedTuple):
+    """Priced cart lines column by column, all amounts in sen"""
+    harganet: List[int]
+    pajak: List[int]
+    total: List[int]
+    profit: List[int]
+
+
+def _div_half_up_column(numerators: Iterable[int], denominators: Iterable[int]) -> List[int]:
+    """div_half_up over two columns (denominators > 0)"""
+    return [
+        (2 * n + d) // (2 * d) if n >= 0 else -((d - 2 * n) // (2 * d))
+        for n, d in zip(numerators, denominators)
+    ]
+
+
+def _div_half_up_by(numerators: Iterable[int], denominator: int) -> List[int]:
+    """div_half_up of a column by one denominator (> 0)"""
+    twice = 2 * denominator
+    return [
+        (2 * n + denominator) // twice if n >= 0 else -((denominator - 2 * n) // twice)
+        for n in numerators
+    ]
+
+
+def price_columns(
+    prices: Sequence[int],
+    costs: Sequence[int],
+    tax_rates: Sequence[int],
+    qtys: Sequence[int],
+    tax_methods: Sequence[Optional[str]],
+    cust_group: int,
+) -> PriceColumns:
+    """
+    price_line over whole columns (one entry per cart line).
+
+    Same units and integer formulas as price_line, each evaluated once
+    per column instead of once per line, so every row is identical to
+    price_line on that row.
+    """
+    gross = _div_half_up_by([p * q for p, q in zip(prices, qtys)], 100)
+    margin = _div_half_up_by([(p - c) * q for p, c, q in zip(prices, costs, qtys)], 100)
+    if cust_group != 1:  # Cabang/Gudang: harga = cost, tanpa pajak
+        return PriceColumns(list(prices), [0] * len(prices), gross, margin)
+
+    exclude = [method == "1" for method in tax_methods]
+    taxed = [p * r * q for p, r, q in zip(prices, tax_rates, qtys)]
+    if not any(exclude):  # all tax-inclusive: harganet = price * 100 / (100 + rate)
+        denominators = [10000 + r for r in tax_rates]
+        pajak = _div_half_up_column(taxed, [d * 100 for d in denominators])
+        return PriceColumns(
+            _div_half_up_column([p * 10000 for p in prices], denominators),
+            pajak,
+            gross,
+            _div_half_up_column(
+                [(p * 10000 - c * d) * q for p, c, d, q in zip(prices, costs, denominators, qtys)],
+                [d * 100 for d in denominators],
+            ),
+        )
+    if all(exclude):
+        pajak = _div_half_up_by(taxed, 10000 * 100)
+        return PriceColumns(list(prices), pajak, [g + t for g, t in zip(gross, pajak)], margin)
+
+    # Mixed tax methods: split by method and merge back in line order
+    included = [i for i, ex in enumerate(exclude) if not ex]
+    excluded = [i for i, ex in enumerate(exclude) if ex]
+    columns = PriceColumns(list(prices), [0] * len(prices), gross, margin)
+    for indexes, method in ((included, None), (excluded, "1")):
+        part = price_columns(
+            [prices[i] for i in indexes], [costs[i] for i in indexes], [tax_rates[i] for i in indexes],
+            [qtys[i] for i in indexes], [method] * len(indexes), cust_group,
+        )
+        for column, values in zip(columns, part):
+            for i, value in zip(indexes, values):
+                column[i] = value
+    return columns
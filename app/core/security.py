@@ -1,9 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import hashlib
+import time
 import jwt
 from jwt.exceptions import PyJWTError as JWTError
 from passlib.context import CryptContext
 from app.config import settings
+from app.core.cache import TTLCache
+from app.core.exceptions import ServiceBusyException
+
+
+# Bump when the set of claims issued by AuthService.create_user_token changes.
+# Tokens with an older version fall back to a database user lookup.
+TOKEN_CLAIMS_VERSION = 1
 
 
 # Laravel compatible bcrypt context
@@ -30,6 +41,92 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHashPool:
+    """
+    Bounded executor for bcrypt work.
+    
+    bcrypt at BCRYPT_ROUNDS=12 takes hundreds of milliseconds per call, so
+    running it inline blocks the event loop for every other request on the
+    worker. Calls are dispatched to a small thread pool (bcrypt releases the
+    GIL), at most ``workers`` run at once, and callers beyond ``max_queue``
+    waiting are rejected with ServiceBusyException instead of piling up.
+    """
+    
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="bcrypt",
+        )
+        self._slots = asyncio.Semaphore(self.workers)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) on the pool, respecting the concurrency cap"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ServiceBusyException("Too many concurrent logins, please retry")
+        
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        queued_at = time.monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        
+        self.total_wait_seconds += time.monotonic() - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._slots.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters for monitoring"""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(
+                self.total_wait_seconds / self.completed * 1000, 2
+            ) if self.completed else 0.0,
+        }
+    
+    def shutdown(self) -> None:
+        """Stop pool threads (called on application shutdown)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded bcrypt pool (use from async code)"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bounded bcrypt pool (use from async code)"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
@@ -50,7 +147,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
     encoded_jwt = jwt.encode(
         to_encode,
         settings.SECRET_KEY,
@@ -60,22 +157,52 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+# Verified token payloads keyed by token digest, kept until the token's exp
+token_cache = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    name="tokens",
+)
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """
     Decode and verify a JWT access token.
     
+    Successfully verified payloads are cached (keyed by SHA-256 of the
+    token) until the token expires, so repeat requests from a terminal
+    skip HMAC verification. The returned dict is shared; do not mutate it.
+    
     Args:
         token: JWT token string
         
     Returns:
         Decoded token payload or None if invalid
     """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        if settings.TOKEN_CACHE_CHECK_EXPIRY and (
+            payload["exp"] + settings.TOKEN_CACHE_LEEWAY_SECONDS <= time.time()
+        ):
+            token_cache.invalidate(key)
+            return None
+        return payload
+    
     try:
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
+            algorithms=[settings.ALGORITHM],
+            leeway=settings.TOKEN_CACHE_LEEWAY_SECONDS,
         )
-        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    
+    exp = payload.get("exp")
+    if exp is not None:
+        remaining = exp + settings.TOKEN_CACHE_LEEWAY_SECONDS - time.time()
+        if remaining > 0:
+            token_cache.set(key, payload, ttl=remaining)
+    
+    return payload
\ No newline at end of file
@@ -3,49 +3,79 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.core.security import decode_access_token
 from app.core.exceptions import AuthenticationException, UserNotFoundException
 from app.services.auth_service import AuthService
+from app.services.passport_service import PassportService
+from app.services.token_service import token_denylist
 
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
 
-async def get_current_user(
+async def get_token_payload(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
+) -> dict:
     """
-    Dependency to get current authenticated user from JWT token.
+    Dependency to get verified, non-revoked JWT claims.
+    
+    Accepts tokens issued by this backend and, when PASSPORT_TOKENS_ENABLED,
+    Laravel Passport tokens validated against oauth_access_tokens.
     
     Args:
         credentials: HTTP authorization credentials
-        db: Database session
         
     Returns:
-        Current authenticated user
+        Decoded token payload
         
     Raises:
-        AuthenticationException: If token is invalid or user not found
+        AuthenticationException: If token is invalid or revoked
     """
     token = credentials.credentials
     
     # Decode token
     payload = decode_access_token(token)
+    if payload is None and settings.PASSPORT_TOKENS_ENABLED:
+        payload = await PassportService.validate_token(token)
     if payload is None:
         raise AuthenticationException("Invalid token")
     
-    # Get user ID from token
-    user_id: Optional[str] = payload.get("sub")
-    if user_id is None:
+    if payload.get("sub") is None:
         raise AuthenticationException("Invalid token payload")
     
-    # Get user from database
+    # Check revocation (in-memory denylist, no DB)
+    if token_denylist.is_revoked(payload):
+        raise AuthenticationException("Token has been revoked")
+    
+    return payload
+
+
+async def get_current_db_user(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """
+    Dependency to get current user loaded from the database (via user cache).
+    
+    Use when the route needs columns that are not carried in token claims.
+    
+    Args:
+        payload: Verified token claims
+        db: Database session
+        
+    Returns:
+        Current authenticated user
+        
+    Raises:
+        AuthenticationException: If token is invalid or user not found
+    """
+    # Get user from cache (falls back to database)
     try:
-        user = await AuthService.get_user_by_id(db, int(user_id))
+        user = await AuthService.get_cached_user(db, int(payload["sub"]))
     except ValueError:
         raise AuthenticationException("Invalid user ID in token")
     
@@ -55,6 +85,38 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """
+    Dependency to get current authenticated user from JWT token.
+    
+    Tokens carrying the current claims version are served from claims
+    alone without a database read; older tokens fall back to the cached
+    user lookup.
+    
+    Args:
+        payload: Verified token claims
+        db: Database session
+        
+    Returns:
+        Current authenticated user
+        
+    Raises:
+        AuthenticationException: If token is invalid or user not found
+    """
+    try:
+        user = AuthService.user_from_claims(payload)
+    except ValueError:
+        raise AuthenticationException("Invalid user ID in token")
+    
+    if user is not None:
+        return user
+    
+    return await get_current_db_user(payload, db)
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
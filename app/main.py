@@ -5,12 +5,96 @@ from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
 from app.config import settings
 from app.database import engine, Base
+from app.core.background import PeriodicTask
+from app.core.security import password_hash_pool, token_cache
+from app.models import OWNED_TABLES
+from app.services.auth_service import user_cache
+from app.services.cart_versions import cart_versions
+from app.services.cart_engine import cart_engine
+from app.services.passport_service import passport_token_cache, passport_batcher
+from app.services.catalog_snapshot import catalog
+from app.services.outbox import outbox
+from app.services.checkout_batcher import checkout_batcher
+from app.services.sequence_allocator import sequence_allocator
+from app.services.idempotency_service import IdempotencyService, idempotency_cache
+from app.services.stock_reservations import stock_reservations
+from app.services.stock_journal import stock_journal
+from app.services.product_index import product_index
+from app.services.product_search import product_search
+from app.services.price_cache import price_cache
+from app.services.promo_calendar import promo_calendar
+from app.services.reference_data import reference_data
+from app.services.token_service import TokenService, token_denylist
 
 # Import semua routers
 from app.routers.auth import router as auth_router
 from app.routers.customer import router as customer_router
 from app.routers.transaksi import router as transaksi_router
 from app.routers.checkout import router as checkout_router
+from app.routers.product import router as product_router
+
+
+# Background refresh loops (started in lifespan)
+background_tasks = [
+    PeriodicTask(
+        "token-denylist-sync",
+        settings.TOKEN_REVOCATION_SYNC_SECONDS,
+        TokenService.sync_denylist,
+    ),
+]
+if settings.REFERENCE_DATA_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "reference-data-refresh",
+        settings.REFERENCE_DATA_REFRESH_SECONDS,
+        reference_data.refresh,
+    ))
+if settings.PRODUCT_INDEX_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "product-index-refresh",
+        settings.PRODUCT_INDEX_REFRESH_SECONDS,
+        product_index.refresh,
+    ))
+if settings.PRODUCT_INDEX_ENABLED and settings.PRICE_CACHE_ENABLED and settings.REFERENCE_DATA_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "price-cache-refresh",
+        settings.PRICE_CACHE_REFRESH_SECONDS,
+        price_cache.refresh,
+    ))
+if settings.PROMO_CALENDAR_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "promo-calendar-refresh",
+        settings.PROMO_CALENDAR_REFRESH_SECONDS,
+        promo_calendar.load,
+    ))
+background_tasks.append(PeriodicTask(
+    "idempotency-purge",
+    settings.IDEMPOTENCY_PURGE_SECONDS,
+    IdempotencyService.purge,
+))
+if settings.OUTBOX_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "outbox-worker",
+        settings.OUTBOX_POLL_SECONDS,
+        outbox.run,
+    ))
+if settings.STOCK_RESERVATION_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "stock-reservation-expiry",
+        settings.STOCK_RESERVATION_EXPIRE_SECONDS,
+        stock_reservations.expire,
+    ))
+if settings.STOCK_MODE == "journal":
+    background_tasks.append(PeriodicTask(
+        "stock-journal-compactor",
+        settings.STOCK_COMPACT_SECONDS,
+        stock_journal.compact,
+    ))
+if settings.CART_ENGINE_ENABLED:
+    background_tasks.append(PeriodicTask(
+        "cart-engine-flush",
+        settings.CART_FLUSH_INTERVAL_SECONDS,
+        cart_engine.flush_all,
+    ))
 
 
 @asynccontextmanager
@@ -23,8 +107,50 @@ async def lifespan(app: FastAPI):
         print(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
         print(f"Environment: {'Development' if settings.DEBUG else 'Production'}")
         
-        # Skip table creation since tables already exist from Laravel
-        print("Skipping table creation (tables exist from Laravel)")
+        # Laravel tables already exist; only create tables owned by this backend
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=OWNED_TABLES)
+        print("Skipping Laravel table creation (tables exist from Laravel)")
+        
+        await TokenService.sync_denylist()
+        
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            snapshot = await catalog.ensure(settings.PRODUCT_INDEX_FULL_RELOAD_SECONDS)
+            reference_data.seed(snapshot.reference())
+            print(
+                f"Catalog snapshot mapped: {snapshot.n_products} products, "
+                f"{snapshot.size // 1024} KiB"
+            )
+        
+        if settings.REFERENCE_DATA_ENABLED:
+            await reference_data.refresh()
+            print("Reference data loaded (units, taxes, customer groups)")
+        
+        if settings.PRODUCT_INDEX_ENABLED:
+            if settings.PRODUCT_SEARCH_ENABLED:
+                product_search.attach()
+            await product_index.load()
+            print(f"Product index loaded: {len(product_index)} products")
+            if settings.PRODUCT_SEARCH_ENABLED:
+                print(f"Product search index built in {product_search.build_ms:.0f}ms")
+        
+            if settings.PRICE_CACHE_ENABLED and settings.REFERENCE_DATA_ENABLED:
+                await price_cache.load()
+                print(f"Price cache loaded: {price_cache.stats()['tier_sets']} tier sets")
+        
+        if settings.PROMO_CALENDAR_ENABLED:
+            await promo_calendar.load()
+            print(f"Promo calendar loaded: {promo_calendar.stats()['active']} active promos")
+        
+        if settings.CART_ENGINE_ENABLED:
+            await cart_engine.recover()
+            print(
+                f"Cart engine: worker {cart_engine.worker_index}/{cart_engine.worker_count}, "
+                f"{cart_engine.recovered} carts recovered from journal"
+            )
+        
+        for task in background_tasks:
+            task.start()
         
         yield
         
@@ -35,6 +161,27 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Shutdown
+        for task in background_tasks:
+            await task.stop()
+        promo_calendar.stop()
+        if settings.CHECKOUT_BATCH_ENABLED:
+            await checkout_batcher.drain()
+        if settings.CART_ENGINE_ENABLED:
+            try:
+                await cart_engine.flush_all()
+            except Exception as e:
+                print(f"Cart flush on shutdown failed (journal kept): {e}")
+        if settings.OUTBOX_ENABLED:
+            try:
+                await outbox.run()
+            except Exception as e:
+                print(f"Outbox drain on shutdown failed (events stay pending): {e}")
+        if settings.STOCK_MODE == "journal":
+            try:
+                await stock_journal.compact()
+            except Exception as e:
+                print(f"Stock journal compaction on shutdown failed (deltas stay pending): {e}")
+        password_hash_pool.shutdown()
         try:
             await engine.dispose()
             print("Database connections closed")
@@ -117,6 +264,9 @@ print("✅ Transaksi router registered")
 
 app.include_router(checkout_router, prefix="/api/v1")
 print("✅ Checkout router registered")
+
+app.include_router(product_router, prefix="/api/v1")
+print("✅ Product router registered")
 # Debug routes
 if settings.DEBUG:
     print("\n📋 Registered API Routes:")
@@ -138,6 +288,36 @@ async def health_check():
     }
 
 
+# Cache statistics endpoint
+@app.get("/health/cache", tags=["Health"])
+async def cache_stats():
+    """In-process cache statistics for monitoring"""
+    return {
+        "users": user_cache.stats(),
+        "tokens": token_cache.stats(),
+        "password_hash_pool": password_hash_pool.stats(),
+        "token_denylist": token_denylist.stats(),
+        "passport_tokens": {
+            **passport_token_cache.stats(),
+            "batching": passport_batcher.stats(),
+        },
+        "catalog_snapshot": catalog.stats(),
+        "product_index": product_index.stats(),
+        "product_search": product_search.stats(),
+        "price_cache": price_cache.stats(),
+        "reference_data": reference_data.stats(),
+        "promo_calendar": promo_calendar.stats(),
+        "cart_versions": cart_versions.stats(),
+        "cart_engine": cart_engine.stats(),
+        "outbox": outbox.stats(),
+        "sequence_allocator": sequence_allocator.stats(),
+        "idempotency": idempotency_cache.stats(),
+        "stock_reservations": stock_reservations.stats(),
+        "stock_journal": stock_journal.stats(),
+        "checkout_batcher": checkout_batcher.stats(),
+    }
+
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
@@ -1,5 +1,14 @@
 from app.models.user import User
-from app.models.customer import Customer
-from app.models.transaksi import Transaksi, TransaksiDetail, Product, ProductPrice, Unit, Tax
+from app.models.customer import Customer, CustomerGroup
+from app.models.transaksi import Transaksi, TransaksiDetail, Product, ProductPrice, ProductPromo, Unit, Tax
+from app.models.token import RevokedToken, OauthAccessToken
+from app.models.outbox import OutboxEvent
+from app.models.sequence import SequenceCounter
+from app.models.idempotency import IdempotencyKey
+from app.models.stock_journal import StockJournalEntry
 
-__all__ = ["User", "Customer", "Transaksi", "TransaksiDetail", "Product", "ProductPrice", "Unit", "Tax"]
\ No newline at end of file
+# Tables owned by this backend (created on startup if missing).
+# Everything else already exists from Laravel.
+OWNED_TABLES = [RevokedToken.__table__, OutboxEvent.__table__, SequenceCounter.__table__, IdempotencyKey.__table__, StockJournalEntry.__table__]
+
+__all__ = ["User", "Customer", "CustomerGroup", "Transaksi", "TransaksiDetail", "Product", "ProductPrice", "ProductPromo", "Unit", "Tax", "RevokedToken", "OauthAccessToken", "OutboxEvent", "SequenceCounter", "IdempotencyKey", "StockJournalEntry", "OWNED_TABLES"]
\ No newline at end of file
@@ -65,4 +65,17 @@ class Customer(Base):
         try:
             return datetime.strptime(self.tgl_lhr, '%Y-%m-%d').date()
         except (ValueError, TypeError):
-            return None
\ No newline at end of file
+            return None
+
+
+class CustomerGroup(Base):
+    """CustomerGroup model - sesuai dengan Laravel CustomerGroup"""
+    
+    __tablename__ = "customer_groups"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    percentage: Mapped[Optional[float]] = mapped_column(Numeric(10, 2), nullable=True)
+    is_active: Mapped[Optional[int]] = mapped_column(Integer, default=1, nullable=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
\ No newline at end of file
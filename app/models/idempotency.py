@@ -0,0 +1,25 @@
+from sqlalchemy import String, Integer, DateTime, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency keys of finalized checkouts (owned by this backend, not Laravel).
+
+    Inserted in the checkout transaction itself, so a key exists exactly
+    when its sale was committed; ``response`` is the CheckoutResponse
+    (JSON) replayed for retries with the same key.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("store_id", "idem_key", name="uq_idempotency_keys_store_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    store_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    idem_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    response: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
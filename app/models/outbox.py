@@ -0,0 +1,25 @@
+from sqlalchemy import String, Integer, DateTime, Text, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.database import Base
+
+
+class OutboxEvent(Base):
+    """
+    Transactional outbox (owned by this backend, not Laravel).
+
+    Written in the same transaction as the sale; ``payload`` (JSON) is
+    expanded into ledger/log rows later by the outbox worker, which sets
+    ``processed_at``. Failed attempts are counted in ``attempts``.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (Index("ix_outbox_events_pending", "processed_at", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[str] = mapped_column(Text(16777215), nullable=False)  # MEDIUMTEXT on MySQL
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
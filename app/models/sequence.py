@@ -0,0 +1,17 @@
+from sqlalchemy import String, Integer, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+
+class SequenceCounter(Base):
+    """
+    Block counters for reference numbers (owned by this backend, not Laravel).
+
+    ``next_value`` is the first value not yet handed to any worker; workers
+    reserve ``[next_value, next_value + block)`` in one statement.
+    """
+    __tablename__ = "sequence_counters"
+
+    store_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    next_value: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -0,0 +1,22 @@
+from sqlalchemy import String, Integer, BigInteger, DateTime, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from decimal import Decimal
+from app.database import Base
+
+
+class StockJournalEntry(Base):
+    """
+    Pending stock deltas (owned by this backend, not Laravel).
+
+    With ``STOCK_MODE=journal`` a sale appends one signed delta per
+    ``product_warehouse`` row instead of updating that row; the compactor
+    adds them into ``product_warehouse.qty`` and deletes them.
+    """
+    __tablename__ = "stock_journal"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    product_warehouse_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    delta: Mapped[Decimal] = mapped_column(Numeric(15, 2), nullable=False)
+    reference_no: Mapped[str] = mapped_column(String(100), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -0,0 +1,36 @@
+from sqlalchemy import String, Integer, Boolean, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.database import Base
+
+
+class RevokedToken(Base):
+    """
+    Token revocation list (owned by this backend, not Laravel).
+
+    A row with ``jti`` revokes a single token. A row with only ``user_id``
+    revokes every token of that user issued before ``created_at``.
+    """
+    __tablename__ = "token_revocations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    jti: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, index=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class OauthAccessToken(Base):
+    """Laravel Passport access tokens - sesuai dengan Laravel OauthAccessToken"""
+    __tablename__ = "oauth_access_tokens"
+
+    id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    client_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    scopes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    revoked: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
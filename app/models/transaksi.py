@@ -131,4 +131,18 @@ class Tax(Base):
     is_active: Mapped[Optional[int]] = mapped_column(Integer, default=1, nullable=True)
     store_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class ProductPromo(Base):
+    """ProductPromo model - sesuai dengan Laravel ProductPromo (jadwal promo per product)"""
+    __tablename__ = "product_promos"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    store_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    start_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    end_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    deskripsi: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
\ No newline at end of file
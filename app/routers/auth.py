@@ -12,7 +12,8 @@ from app.schemas.auth import (
 )
 from app.models.user import User
 from app.services.auth_service import AuthService
-from app.dependencies import get_current_active_user
+from app.services.token_service import TokenService
+from app.dependencies import get_current_active_user, get_current_db_user, get_token_payload
 
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -87,12 +88,14 @@ async def login(
     description="Get current authenticated user information",
 )
 async def get_me(
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_db_user),
 ):
     """
     Get current authenticated user data.
     
     Requires valid Bearer token in Authorization header.
+    Loaded from the database (via user cache) since the response includes
+    columns that are not carried in the token.
     """
     return UserResponse.model_validate(current_user)
 
@@ -102,17 +105,20 @@ async def get_me(
     response_model=MessageResponse,
     status_code=status.HTTP_200_OK,
     summary="Logout user",
-    description="Logout current user (token should be discarded on client side)",
+    description="Logout current user and revoke the access token",
 )
 async def logout(
+    payload: dict = Depends(get_token_payload),
     current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Logout current user.
     
-    Note: JWT tokens are stateless. Client should discard the token.
-    For production, implement token blacklisting if needed.
+    The token's jti is added to token_revocations; other workers pick it
+    up on their next denylist sync (TOKEN_REVOCATION_SYNC_SECONDS).
     """
+    await TokenService.revoke_token(db, payload)
     return MessageResponse(message="Successfully logged out")
 
 
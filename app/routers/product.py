@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_db
+from app.schemas.product import ProductSearchItem, ProductSearchResponse, ProductStockResponse
+from app.models.user import User
+from app.services.transaksi_service import TransaksiService
+from app.services.stock_reservations import stock_reservations
+from app.dependencies import get_current_active_user
+
+
+router = APIRouter(prefix="/products", tags=["Products"])
+
+
+@router.get(
+    "/search",
+    response_model=ProductSearchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Search products",
+    description="Search products of the user's store by name, label name or code, best matches first",
+)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Nama, nama label atau kode product"),
+    limit: int = Query(20, ge=1, description="Jumlah hasil maksimal"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Search products when a label won't scan.
+    
+    **Query Parameters:**
+    - **q**: Search text; every word must start a word of the name, label name or code
+    - **limit**: Maximum results (capped at PRODUCT_SEARCH_MAX_RESULTS)
+    """
+    try:
+        products, source = await TransaksiService.search_products(
+            db,
+            current_user.store_id,
+            q,
+            min(limit, settings.PRODUCT_SEARCH_MAX_RESULTS),
+        )
+        return ProductSearchResponse(
+            success=True,
+            source=source,
+            products=[ProductSearchItem.model_validate(product) for product in products],
+        )
+    except Exception as e:
+        return ProductSearchResponse(success=False, msg=f"Error: {str(e)}")
+
+
+@router.get(
+    "/{product_id}/stock",
+    response_model=ProductStockResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Product stock",
+    description="Stock on hand, reserved by open carts and available, per warehouse",
+)
+async def product_stock(
+    product_id: int,
+    warehouse_id: int = Query(..., description="Warehouse"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Stock of a product in one warehouse.
+    
+    `reserved` counts carts served by this worker (STOCK_RESERVATION_ENABLED);
+    `on_hand` may be up to STOCK_ONHAND_TTL_SECONDS old.
+    """
+    try:
+        stock = await stock_reservations.availability(db, product_id, warehouse_id)
+        if stock is None:
+            return ProductStockResponse(success=False, msg="Product tidak ada di warehouse ini")
+        return ProductStockResponse(
+            success=True,
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            **stock
+        )
+    except Exception as e:
+        return ProductStockResponse(success=False, msg=f"Error: {str(e)}")
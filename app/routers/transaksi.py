@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -8,16 +9,45 @@ from app.schemas.transaksi import (
     TransaksiCreateResponse,
     TransaksiAddProductRequest,
     TransaksiAddProductResponse,
+    TransaksiAddProductsRequest,
+    TransaksiRepriceRequest,
 )
 from app.models.user import User
-from app.models.transaksi import TransaksiDetail
 from app.services.transaksi_service import TransaksiService
+from app.services.cart_versions import cart_versions, deltas_enabled
+from app.services.cart_engine import cart_engine
+from app.services.stock_reservations import stock_reservations
 from app.dependencies import get_current_active_user
 
 
 router = APIRouter(prefix="/transaksi", tags=["Transaksi POS"])
 
 
+def ensure_cart_owner(transaksi_id: int) -> None:
+    """421 kalau cart engine aktif dan cart ini dipegang worker lain"""
+    if settings.CART_ENGINE_ENABLED:
+        cart_engine.ensure_owned(transaksi_id)
+
+
+async def reserve_stock(db: AsyncSession, transaksi_id: int, items, warehouse_id: int) -> list:
+    """
+    Reservasi stock untuk baris cart (product, qty baris) kalau
+    STOCK_RESERVATION_ENABLED; returns warning untuk `errors` kalau
+    stock tersedia kurang (scan tetap diterima, finalize yang menolak).
+    """
+    warnings = []
+    if not settings.STOCK_RESERVATION_ENABLED:
+        return warnings
+    for product, line_qty in items:
+        available = await stock_reservations.hold(db, transaksi_id, product, warehouse_id, line_qty)
+        if available is not None and available < 0:
+            warnings.append({
+                "barcode": product.barcode,
+                "msg": f"Stok tidak cukup (tersedia {available + line_qty:g})"
+            })
+    return warnings
+
+
 @router.post("/create", response_model=TransaksiCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_transaksi(
     request: TransaksiCreateRequest,
@@ -128,114 +158,43 @@ async def add_product_to_cart(
     }
     ```
     """
+    ensure_cart_owner(request.id_transaksi)
+    
     try:
-        # 1. Get product by barcode
-        product = await TransaksiService.get_product_by_barcode(
+        # 1-4. Resolve product + harga + baris cart, lalu insert/update baris cart
+        product, line_qty, error = await TransaksiService.scan_product(
             db=db,
+            transaksi_id=request.id_transaksi,
             barcode=request.barcode,
-            store_id=current_user.store_id
-        )
-        
-        if not product:
-            return TransaksiAddProductResponse(
-                success=False,
-                msg="Product not found"
-            )
-        
-        # 2. Get harga based on qty and customer group
-        harga_data = await TransaksiService.get_harga(
-            db=db,
-            product_id=product.id,
             qty=request.jumlah,
             cust_group=request.is_cabang,
-            warehouse_id=request.warehouse_id
+            warehouse_id=request.warehouse_id,
+            store_id=current_user.store_id
         )
         
-        if not harga_data:
+        if error:
             return TransaksiAddProductResponse(
                 success=False,
-                msg="Harga belum disetting"
+                msg=error
             )
         
-        # 3. Calculate price, tax, total
-        calculation = TransaksiService.calculate_price(
-            harga_data=harga_data,
-            qty=request.jumlah,
-            cust_group=request.is_cabang
-        )
-        
-        # 4. Check if product already in cart
-        existing_item = await TransaksiService.get_cart_item(
-            db=db,
-            transaksi_id=request.id_transaksi,
-            barcode=product.barcode
-        )
-        
-        if existing_item:
-            # UPDATE: Product sudah ada, tambah quantity
-            new_qty = existing_item.jumlah + request.jumlah
-            
-            # Recalculate dengan qty baru (karena harga bisa berubah berdasarkan qty)
-            new_harga = await TransaksiService.get_harga(
-                db=db,
-                product_id=product.id,
-                qty=new_qty,
-                cust_group=request.is_cabang,
-                warehouse_id=request.warehouse_id
-            )
-            
-            new_calculation = TransaksiService.calculate_price(
-                harga_data=new_harga,
-                qty=new_qty,
-                cust_group=request.is_cabang
-            )
-            
-            existing_item.jumlah = new_qty
-            existing_item.harga = new_calculation['harganet']
-            existing_item.tax = new_calculation['pajak']
-            existing_item.total = new_calculation['total_harga']
-            existing_item.profit = new_calculation['profit']
-            
-        else:
-            # INSERT: Product baru di cart
-            new_item = TransaksiDetail(
-                transaksi_id=request.id_transaksi,
-                barcode=product.barcode,
-                nama=product.name,
-                product_id=product.id,
-                jumlah=request.jumlah,
-                unit=harga_data['unit_name'],
-                harga=calculation['harganet'],
-                diskon=0,
-                total=calculation['total_harga'],
-                is_point=product.is_point or 0,
-                tax_rate=calculation['tax_rate'],
-                tax=calculation['pajak'],
-                profit=calculation['profit'],
-                unit_id=harga_data['unit_id']
-            )
-            db.add(new_item)
-        
         await db.commit()
+        cart_versions.touch(request.id_transaksi, changed=[product.barcode])
+        warnings = await reserve_stock(db, request.id_transaksi, [(product, line_qty)], request.warehouse_id)
         
         # 5. Check promo
         promo = await TransaksiService.check_promo(db, product.id)
-        promo_data = None
-        if promo:
-            promo_data = {
-                "promotion_price": float(promo.promotion_price),
-                "max_item_promo": promo.max_item_promo
-            }
+        promo_data = TransaksiService.format_promo(promo, line_qty)
         
-        # 6. Get all cart items
-        cart_items = await TransaksiService.get_all_cart_items(db, request.id_transaksi)
-        dataproduk = TransaksiService.format_cart_items(cart_items)
+        # 6. Cart lines (delta sejak request.cart_version, atau full cart)
+        cart = await TransaksiService.get_cart_payload(db, request.id_transaksi, request.cart_version)
         
         return TransaksiAddProductResponse(
             success=True,
-            dataproduk=dataproduk,
             promo=promo_data,
-            productproperties=[]
+            productproperties=[],
+            errors=warnings or None,
+            **cart
         )
         
     except Exception as e:
@@ -272,26 +231,180 @@ async def add_product_to_cart(
         )
 
 
+@router.post("/add-products", response_model=TransaksiAddProductResponse)
+async def add_products_to_cart(
+    request: TransaksiAddProductsRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    **Tambah banyak product sekaligus (scanner buffer / terminal offline)**
+    
+    Scan dengan barcode yang sama digabung. Product dan harga di-resolve
+    dalam satu batch, semua baris ditulis dalam satu commit, dan cart
+    dikembalikan sekali.
+    
+    Request:
+    ```json
+    {
+      "id_transaksi": 300233,
+      "is_cabang": 1,
+      "warehouse_id": 1,
+      "items": [
+        {"barcode": "ppp", "jumlah": 1},
+        {"barcode": "8991234567890", "jumlah": 2}
+      ]
+    }
+    ```
+    
+    Response: sama seperti add-product, `promo` berisi promo per barcode dan
+    `errors` berisi barcode yang gagal (product tidak ada / harga belum disetting).
+    """
+    ensure_cart_owner(request.id_transaksi)
+    
+    try:
+        scanned, errors = await TransaksiService.scan_products(
+            db=db,
+            transaksi_id=request.id_transaksi,
+            items=[(item.barcode, item.jumlah) for item in request.items],
+            cust_group=request.is_cabang,
+            warehouse_id=request.warehouse_id,
+            store_id=current_user.store_id
+        )
+        
+        await db.commit()
+        if scanned:
+            cart_versions.touch(request.id_transaksi, changed=[product.barcode for product, _ in scanned])
+        errors += await reserve_stock(db, request.id_transaksi, scanned, request.warehouse_id)
+        
+        promo_data = {}
+        for product, line_qty in scanned:
+            promo = await TransaksiService.check_promo(db, product.id)
+            if promo:
+                promo_data[product.barcode] = TransaksiService.format_promo(promo, line_qty)
+        
+        cart = await TransaksiService.get_cart_payload(db, request.id_transaksi, request.cart_version)
+        
+        return TransaksiAddProductResponse(
+            success=bool(scanned),
+            msg=None if scanned else "Tidak ada product yang berhasil ditambahkan",
+            promo=promo_data or None,
+            productproperties=[],
+            errors=errors or None,
+            **cart
+        )
+        
+    except Exception as e:
+        await db.rollback()
+        import traceback
+        error_traceback = traceback.format_exc()
+        print(f"\n❌ Error in add_products_to_cart: {str(e)}\n{error_traceback}\n")
+        
+        return TransaksiAddProductResponse(
+            success=False,
+            msg=f"Error: {str(e)}"
+        )
+
+
+@router.post("/{transaksi_id}/reprice", response_model=TransaksiAddProductResponse)
+async def reprice_cart(
+    transaksi_id: int,
+    request: TransaksiRepriceRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    **Hitung ulang harga semua product di cart**
+    
+    Dipakai saat customer group (is_cabang) diganti. Tier harga semua
+    product di-load sekaligus dan hanya baris yang harganya berubah yang
+    di-update.
+    
+    Request:
+    ```json
+    {
+      "is_cabang": 2,
+      "warehouse_id": 1
+    }
+    ```
+    
+    Response: sama seperti add-product, `errors` berisi barcode yang
+    harganya belum disetting (baris tersebut tidak diubah).
+    """
+    ensure_cart_owner(transaksi_id)
+    
+    try:
+        changed, errors = await TransaksiService.reprice_cart(
+            db=db,
+            transaksi_id=transaksi_id,
+            cust_group=request.is_cabang,
+            warehouse_id=request.warehouse_id
+        )
+        
+        await db.commit()
+        if changed:
+            cart_versions.touch(transaksi_id, changed=changed)
+        
+        cart = await TransaksiService.get_cart_payload(db, transaksi_id, request.cart_version)
+        
+        return TransaksiAddProductResponse(
+            success=True,
+            msg=f"{len(changed)} product repriced",
+            promo=None,
+            productproperties=[],
+            errors=errors or None,
+            **cart
+        )
+        
+    except Exception as e:
+        await db.rollback()
+        import traceback
+        error_traceback = traceback.format_exc()
+        print(f"\n❌ Error in reprice_cart: {str(e)}\n{error_traceback}\n")
+        
+        return TransaksiAddProductResponse(
+            success=False,
+            msg=f"Error: {str(e)}"
+        )
+
+
 @router.get("/{transaksi_id}/cart", response_model=TransaksiAddProductResponse)
 async def get_cart(
     transaksi_id: int,
+    response: Response,
+    since: Optional[str] = Query(None, description="cart_version yang dipegang client; hanya kirim perubahan"),
+    full: bool = Query(False, description="Paksa kirim full cart"),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     **Get semua item di cart**
     
-    Response sama seperti add-product
+    Response sama seperti add-product. ETag = cart_version; kirim
+    `If-None-Match` untuk mendapat 304 jika cart tidak berubah, atau
+    `?since=<cart_version>` untuk mendapat baris yang berubah saja.
     """
+    ensure_cart_owner(transaksi_id)
+    
     try:
-        cart_items = await TransaksiService.get_all_cart_items(db, transaksi_id)
-        dataproduk = TransaksiService.format_cart_items(cart_items)
+        if deltas_enabled() and not full:
+            current_version = cart_versions.current(transaksi_id)
+            if current_version and if_none_match == f'"{current_version}"':
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": if_none_match}
+                )
+        
+        cart = await TransaksiService.get_cart_payload(db, transaksi_id, None if full else since)
+        if cart["cart_version"]:
+            response.headers["ETag"] = f'"{cart["cart_version"]}"'
         
         return TransaksiAddProductResponse(
             success=True,
-            dataproduk=dataproduk,
             promo=None,
-            productproperties=[]
+            productproperties=[],
+            **cart
         )
     except Exception as e:
         return TransaksiAddProductResponse(
@@ -304,34 +417,37 @@ async def get_cart(
 async def delete_product_from_cart(
     transaksi_id: int,
     barcode: str,
+    cart_version: Optional[str] = Query(None, description="cart_version yang dipegang client (untuk delta response)"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """
     **Hapus product dari cart**
     """
+    ensure_cart_owner(transaksi_id)
+    
     try:
-        item = await TransaksiService.get_cart_item(db, transaksi_id, barcode)
+        removed = await TransaksiService.remove_cart_item(db, transaksi_id, barcode)
         
-        if not item:
+        if not removed:
             return TransaksiAddProductResponse(
                 success=False,
                 msg="Product not found in cart"
             )
         
-        await db.delete(item)
         await db.commit()
+        cart_versions.touch(transaksi_id, removed=[barcode])
+        stock_reservations.release(transaksi_id, barcode)
         
         # Get updated cart
-        cart_items = await TransaksiService.get_all_cart_items(db, transaksi_id)
-        dataproduk = TransaksiService.format_cart_items(cart_items)
+        cart = await TransaksiService.get_cart_payload(db, transaksi_id, cart_version)
         
         return TransaksiAddProductResponse(
             success=True,
             msg="Product deleted",
-            dataproduk=dataproduk,
             promo=None,
-            productproperties=[]
+            productproperties=[],
+            **cart
         )
         
     except Exception as e:
@@ -371,102 +487,72 @@ async def update_product_quantity(
     
     Response: sama seperti add-product
     """
+    ensure_cart_owner(request.id_transaksi)
+    
     try:
-        # 1. Get existing item
-        existing_item = await TransaksiService.get_cart_item(
-            db=db,
-            transaksi_id=request.id_transaksi,
-            barcode=request.barcode
-        )
-        
-        if not existing_item:
-            return TransaksiAddProductResponse(
-                success=False,
-                msg="Product not found in cart"
-            )
-        
-        # 2. Jika jumlah = 0, hapus dari cart
+        # 1. Jika jumlah = 0, hapus dari cart
         if request.jumlah <= 0:
-            await db.delete(existing_item)
+            removed = await TransaksiService.remove_cart_item(
+                db=db,
+                transaksi_id=request.id_transaksi,
+                barcode=request.barcode
+            )
+            if not removed:
+                return TransaksiAddProductResponse(
+                    success=False,
+                    msg="Product not found in cart"
+                )
+            
             await db.commit()
+            cart_versions.touch(request.id_transaksi, removed=[request.barcode])
+            stock_reservations.release(request.id_transaksi, request.barcode)
             
             # Get updated cart
-            cart_items = await TransaksiService.get_all_cart_items(db, request.id_transaksi)
-            dataproduk = TransaksiService.format_cart_items(cart_items)
+            cart = await TransaksiService.get_cart_payload(db, request.id_transaksi, request.cart_version)
             
             return TransaksiAddProductResponse(
                 success=True,
                 msg="Product deleted (quantity = 0)",
-                dataproduk=dataproduk,
                 promo=None,
-                productproperties=[]
+                productproperties=[],
+                **cart
             )
         
-        # 3. Update quantity - Recalculate harga based on new qty
-        # Get product info
-        product = await TransaksiService.get_product_by_barcode(
+        # 2-6. Update quantity - recalculate harga based on NEW quantity (harga bisa beda!)
+        product, error = await TransaksiService.update_cart_item(
             db=db,
+            transaksi_id=request.id_transaksi,
             barcode=request.barcode,
-            store_id=current_user.store_id
-        )
-        
-        if not product:
-            return TransaksiAddProductResponse(
-                success=False,
-                msg="Product not found"
-            )
-        
-        # 4. Get harga based on NEW quantity (PENTING: harga bisa beda!)
-        harga_data = await TransaksiService.get_harga(
-            db=db,
-            product_id=product.id,
             qty=request.jumlah,
             cust_group=request.is_cabang,
-            warehouse_id=request.warehouse_id
+            warehouse_id=request.warehouse_id,
+            store_id=current_user.store_id
         )
         
-        if not harga_data:
+        if error:
             return TransaksiAddProductResponse(
                 success=False,
-                msg="Harga belum disetting"
+                msg=error
             )
         
-        # 5. Calculate dengan qty baru
-        calculation = TransaksiService.calculate_price(
-            harga_data=harga_data,
-            qty=request.jumlah,
-            cust_group=request.is_cabang
-        )
-        
-        # 6. Update item
-        existing_item.jumlah = request.jumlah
-        existing_item.harga = calculation['harganet']
-        existing_item.tax = calculation['pajak']
-        existing_item.total = calculation['total_harga']
-        existing_item.profit = calculation['profit']
-        existing_item.tax_rate = calculation['tax_rate']
-        
         await db.commit()
+        cart_versions.touch(request.id_transaksi, changed=[request.barcode])
+        warnings = await reserve_stock(db, request.id_transaksi, [(product, request.jumlah)], request.warehouse_id)
         
         # 7. Check promo
         promo = await TransaksiService.check_promo(db, product.id)
-        promo_data = None
-        if promo:
-            promo_data = {
-                "promotion_price": float(promo.promotion_price),
-                "max_item_promo": promo.max_item_promo
-            }
+        promo_data = TransaksiService.format_promo(promo, request.jumlah)
         
         # 8. Get updated cart
-        cart_items = await TransaksiService.get_all_cart_items(db, request.id_transaksi)
-        dataproduk = TransaksiService.format_cart_items(cart_items)
+        cart = await TransaksiService.get_cart_payload(db, request.id_transaksi, request.cart_version)
         
         return TransaksiAddProductResponse(
             success=True,
             msg="Product quantity updated",
-            dataproduk=dataproduk,
             promo=promo_data,
-            productproperties=[]
+            productproperties=[],
+            errors=warnings or None,
+            **cart
         )
         
     except Exception as e:
@@ -21,10 +21,19 @@ from app.schemas.transaksi import (
     TransaksiCreateResponse,
     TransaksiAddProductRequest,
     TransaksiAddProductResponse,
+    TransaksiScanItem,
+    TransaksiAddProductsRequest,
+    TransaksiRepriceRequest,
     CustomerInfoResponse,
     ProductInCartResponse,
 )
 
+from app.schemas.product import (
+    ProductSearchItem,
+    ProductSearchResponse,
+    ProductStockResponse,
+)
+
 __all__ = [
     # Auth
     "UserRegister",
@@ -43,6 +52,13 @@ __all__ = [
     "TransaksiCreateResponse",
     "TransaksiAddProductRequest",
     "TransaksiAddProductResponse",
+    "TransaksiScanItem",
+    "TransaksiAddProductsRequest",
+    "TransaksiRepriceRequest",
     "CustomerInfoResponse",
     "ProductInCartResponse",
+    # Product
+    "ProductSearchItem",
+    "ProductSearchResponse",
+    "ProductStockResponse",
 ]
\ No newline at end of file
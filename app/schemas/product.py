@@ -0,0 +1,33 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+
+
+class ProductSearchItem(BaseModel):
+    """Satu hasil pencarian produk"""
+    id: int
+    barcode: str
+    code: Optional[str] = None
+    name: str
+    name_lbl: Optional[str] = None
+    sale_unit_id: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductSearchResponse(BaseModel):
+    """Response pencarian produk (nama / nama label / kode)"""
+    success: bool
+    msg: Optional[str] = None
+    source: str = "index"  # index | database
+    products: List[ProductSearchItem] = []
+
+
+class ProductStockResponse(BaseModel):
+    """Stock product di satu warehouse: on hand, direservasi cart, tersedia"""
+    success: bool
+    msg: Optional[str] = None
+    product_id: Optional[int] = None
+    warehouse_id: Optional[int] = None
+    on_hand: Optional[float] = None
+    reserved: Optional[float] = None
+    available: Optional[float] = None
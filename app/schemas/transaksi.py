@@ -19,6 +19,29 @@ class TransaksiAddProductRequest(BaseModel):
     is_cabang: int = Field(default=1, description="Customer group: 0=gudang, 1=umum, 2=cabang")
     jumlah: float = Field(..., gt=0, description="Jumlah/quantity product")
     warehouse_id: int = Field(..., description="ID Warehouse")
+    cart_version: Optional[str] = Field(default=None, description="cart_version terakhir yang dipegang client (untuk delta response)")
+
+
+class TransaksiScanItem(BaseModel):
+    """Satu scan di dalam batch"""
+    barcode: str = Field(..., description="Barcode product")
+    jumlah: float = Field(..., gt=0, description="Jumlah/quantity product")
+
+
+class TransaksiAddProductsRequest(BaseModel):
+    """Request untuk menambah banyak product sekaligus (scanner buffer / offline)"""
+    id_transaksi: int = Field(..., description="ID Transaksi")
+    is_cabang: int = Field(default=1, description="Customer group: 0=gudang, 1=umum, 2=cabang")
+    warehouse_id: int = Field(..., description="ID Warehouse")
+    items: List[TransaksiScanItem] = Field(..., min_length=1, max_length=500, description="List scan (barcode, jumlah)")
+    cart_version: Optional[str] = Field(default=None, description="cart_version terakhir yang dipegang client (untuk delta response)")
+
+
+class TransaksiRepriceRequest(BaseModel):
+    """Request untuk hitung ulang harga semua product di cart"""
+    is_cabang: int = Field(default=1, description="Customer group: 0=gudang, 1=umum, 2=cabang")
+    warehouse_id: int = Field(..., description="ID Warehouse")
+    cart_version: Optional[str] = Field(default=None, description="cart_version terakhir yang dipegang client (untuk delta response)")
 
 
 # ==================== RESPONSE SCHEMAS ====================
@@ -65,4 +88,8 @@ class TransaksiAddProductResponse(BaseModel):
     msg: Optional[str] = None
     dataproduk: Optional[List[ProductInCartResponse]] = None
     promo: Optional[dict] = None
-    productproperties: List = []
\ No newline at end of file
+    productproperties: List = []
+    errors: Optional[List[dict]] = None
+    cart_version: Optional[str] = None
+    removed: Optional[List[str]] = None  # barcode yang dihapus (delta response)
+    delta: bool = False  # True = dataproduk hanya berisi baris yang berubah
\ No newline at end of file
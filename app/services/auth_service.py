@@ -1,11 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, event, inspect
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, Dict
+import uuid
 
+from app.config import settings
+from app.core.cache import TTLCache
 from app.models.user import User
 from app.schemas.auth import UserRegister, UserLogin
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import (
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+    TOKEN_CLAIMS_VERSION,
+)
 from app.core.exceptions import (
     UserAlreadyExistsException,
     InvalidCredentialsException,
@@ -14,6 +22,14 @@ from app.core.exceptions import (
 )
 
 
+# Per-worker cache of active users, keyed by user id
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    name="users",
+)
+
+
 class AuthService:
     """Service class for authentication operations"""
     
@@ -42,7 +58,7 @@ class AuthService:
             raise UserAlreadyExistsException()
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         now = datetime.now(timezone.utc)
         
         new_user = User(
@@ -89,7 +105,7 @@ class AuthService:
             raise InvalidCredentialsException()
         
         # Verify password
-        if not verify_password(login_data.password, user.password):
+        if not await verify_password_async(login_data.password, user.password):
             raise InvalidCredentialsException()
         
         # Check if user is active
@@ -103,6 +119,10 @@ class AuthService:
         """
         Create JWT access token for user.
         
+        The token carries the store/warehouse/role context routes need,
+        so authenticated requests can run on claims alone (see
+        user_from_claims), plus a jti for revocation on logout.
+        
         Args:
             user: User object
             
@@ -113,10 +133,42 @@ class AuthService:
             "sub": str(user.id),
             "email": user.email,
             "name": user.name,
+            "ver": TOKEN_CLAIMS_VERSION,
+            "jti": uuid.uuid4().hex,
+            "store_id": user.store_id,
+            "warehouse_id": user.warehouse_id,
+            "biller_id": user.biller_id,
+            "role_id": user.role_id,
         }
         
         return create_access_token(token_data)
     
+    @staticmethod
+    def user_from_claims(payload: Dict) -> Optional[User]:
+        """
+        Build a transient (not session-bound) User from token claims.
+        
+        Args:
+            payload: Decoded token claims
+            
+        Returns:
+            User object, or None if the token predates the current claims version
+        """
+        if payload.get("ver") != TOKEN_CLAIMS_VERSION:
+            return None
+        
+        return User(
+            id=int(payload["sub"]),
+            email=payload.get("email"),
+            name=payload.get("name"),
+            store_id=payload.get("store_id"),
+            warehouse_id=payload.get("warehouse_id"),
+            biller_id=payload.get("biller_id"),
+            role_id=payload.get("role_id"),
+            is_active=True,
+            is_deleted=False,
+        )
+    
     @staticmethod
     async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """
@@ -136,4 +188,53 @@ class AuthService:
                 User.is_active == True
             )
         )
-        return result.scalar_one_or_none()
\ No newline at end of file
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def get_cached_user(db: AsyncSession, user_id: int) -> Optional[User]:
+        """
+        Get active user by ID, served from the in-process user cache.
+        
+        On a miss the user is loaded with get_user_by_id and detached from
+        the session so it can be shared safely between requests.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            
+        Returns:
+            User object or None
+        """
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        user = await AuthService.get_user_by_id(db, user_id)
+        if user is not None:
+            db.expunge(user)
+            user_cache.set(user_id, user)
+        
+        return user
+    
+    @staticmethod
+    def invalidate_user(user_id: int) -> None:
+        """
+        Drop a user from the cache.
+        
+        Call after changing anything get_user_by_id filters on or routes
+        depend on (is_active, is_deleted, store_id).
+        """
+        user_cache.invalidate(user_id)
+
+
+def _invalidate_cached_user(target: User, value, oldvalue, initiator) -> None:
+    """Attribute hook: invalidate cache when an auth-relevant column changes"""
+    state = inspect(target)
+    if state.transient or state.pending:
+        return
+    if target.id is not None and value != oldvalue:
+        AuthService.invalidate_user(target.id)
+
+
+for _attr in (User.is_active, User.is_deleted, User.store_id):
+    event.listen(_attr, "set", _invalidate_cached_user)
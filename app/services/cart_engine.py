@@ -0,0 +1,423 @@
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import fcntl
+import json
+import os
+import time
+
+from app.config import settings
+from app.core.exceptions import CartClosedException, CartNotOwnedException
+from app.database import AsyncSessionLocal
+from app.models.transaksi import Transaksi, TransaksiDetail
+
+
+class CartLine:
+    """
+    Compact in-memory cart line.
+
+    Same attribute names as TransaksiDetail, so format_cart_items and the
+    checkout code can use either. ``no`` is 0 until the line is persisted.
+    """
+    __slots__ = (
+        "no", "transaksi_id", "barcode", "product_id", "nama", "jumlah",
+        "unit", "harga", "total", "diskon", "profit", "is_point",
+        "tax_rate", "tax", "unit_id",
+    )
+
+    def __init__(self, transaksi_id: int, barcode: str, no: int = 0):
+        self.no = no
+        self.transaksi_id = transaksi_id
+        self.barcode = barcode
+        self.product_id = 0
+        self.nama = ""
+        self.jumlah = 0.0
+        self.unit = ""
+        self.harga = 0.0
+        self.total = 0.0
+        self.diskon = 0.0
+        self.profit = 0.0
+        self.is_point = 0
+        self.tax_rate = 0.0
+        self.tax = 0.0
+        self.unit_id = 0
+
+    @classmethod
+    def from_row(cls, row: TransaksiDetail) -> "CartLine":
+        line = cls(row.transaksi_id, row.barcode, row.no)
+        line.product_id = row.product_id
+        line.nama = row.nama
+        line.jumlah = float(row.jumlah)
+        line.unit = row.unit
+        line.harga = float(row.harga)
+        line.total = float(row.total)
+        line.diskon = float(row.diskon or 0)
+        line.profit = float(row.profit or 0)
+        line.is_point = row.is_point or 0
+        line.tax_rate = float(row.tax_rate or 0)
+        line.tax = float(row.tax or 0)
+        line.unit_id = row.unit_id
+        return line
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# Columns written back to transaksi_detail (everything except the key)
+_ROW_FIELDS = CartLine.__slots__[1:]
+
+
+class Cart:
+    """Lines of one transaksi plus what still has to be written to the DB"""
+    __slots__ = ("transaksi_id", "lines", "dirty", "deleted", "lock", "last_used", "closed", "unjournaled")
+
+    def __init__(self, transaksi_id: int):
+        self.transaksi_id = transaksi_id
+        self.lines: Dict[str, CartLine] = {}  # barcode -> line, in `no` order
+        self.dirty: Set[str] = set()  # barcodes not yet written
+        self.deleted: Set[int] = set()  # `no` of persisted lines removed from the cart
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.closed = False  # checked out; requests that waited for the lock fail
+        self.unjournaled: List[str] = []  # journal records not yet written
+
+    @property
+    def is_clean(self) -> bool:
+        return not self.dirty and not self.deleted
+
+
+class CartEngine:
+    """
+    Session-resident carts with write-behind to transaksi_detail.
+
+    Active carts live in process memory; every mutation is appended to a
+    per-transaksi journal file (JSON lines in CART_JOURNAL_DIR) before the
+    cart lock is released, so before the handler returns. Appends go
+    through one writer task that batches the records of all waiting carts
+    into one thread hop (one fsync per file per batch), keeping file I/O
+    off the event loop. Dirty carts are written to transaksi_detail by a
+    background task and before checkout. On startup, leftover journals are
+    replayed on top of transaksi_detail and flushed, so a crash loses no
+    scan that was acknowledged.
+
+    Each transaksi is owned by exactly one worker
+    (``transaksi_id % CART_WORKER_COUNT == CART_WORKER_INDEX``); requests
+    for carts owned elsewhere get 421 with the owning worker index so the
+    proxy / client can route them there. A worker index is claimed with a
+    lock file in CART_JOURNAL_DIR, so a second process started with the
+    same index (e.g. ``uvicorn --workers N``, which shares one
+    environment) fails at startup instead of splitting its carts.
+    """
+
+    def __init__(self, journal_dir: str, worker_index: int, worker_count: int):
+        self.journal_dir = journal_dir
+        self.worker_index = worker_index
+        self.worker_count = max(worker_count, 1)
+        self._carts: Dict[int, Cart] = {}
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.recovered = 0
+        self._writes: List[Tuple[int, List[str], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._index_lock = None
+        self.journal_batches = 0
+
+    # ---- ownership ----
+
+    def owner_of(self, transaksi_id: int) -> int:
+        return transaksi_id % self.worker_count
+
+    def ensure_owned(self, transaksi_id: int) -> None:
+        """Raise CartNotOwnedException if another worker owns this cart"""
+        owner = self.owner_of(transaksi_id)
+        if owner != self.worker_index:
+            raise CartNotOwnedException(owner)
+
+    # ---- journal ----
+
+    def _journal_path(self, transaksi_id: int) -> str:
+        return os.path.join(self.journal_dir, f"{transaksi_id}.jnl")
+
+    @staticmethod
+    def _journal(cart: Cart, record: Dict) -> None:
+        """Queue a record; written by ``_sync_journal`` before the lock is released"""
+        cart.unjournaled.append(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _write_batch(self, batch: List[Tuple[int, List[str], asyncio.Future]]) -> None:
+        """Append records (in a thread), one open + fsync per journal file"""
+        per_cart: Dict[int, List[str]] = {}
+        for transaksi_id, records, _ in batch:
+            per_cart.setdefault(transaksi_id, []).extend(records)
+        for transaksi_id, records in per_cart.items():
+            with open(self._journal_path(transaksi_id), "a", encoding="utf-8") as f:
+                f.write("".join(records))
+                if settings.CART_JOURNAL_FSYNC:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    async def _write_loop(self) -> None:
+        while self._writes:
+            batch, self._writes = self._writes, []
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            self.journal_batches += 1
+        self._writer = None
+
+    async def _sync_journal(self, cart: Cart) -> None:
+        """Write the cart's queued records (call while holding the cart lock)"""
+        if not cart.unjournaled:
+            return
+        records, cart.unjournaled = cart.unjournaled, []
+        future = asyncio.get_running_loop().create_future()
+        self._writes.append((cart.transaksi_id, records, future))
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop(), name="cart-journal-writer")
+        await future
+
+    def _drop_journal(self, transaksi_id: int) -> None:
+        try:
+            os.remove(self._journal_path(transaksi_id))
+        except FileNotFoundError:
+            pass
+
+    # ---- cart access ----
+
+    async def _load(self, db: AsyncSession, transaksi_id: int) -> Cart:
+        cart = self._carts.get(transaksi_id)
+        if cart is not None:
+            return cart
+
+        result = await db.execute(
+            select(TransaksiDetail)
+            .where(TransaksiDetail.transaksi_id == transaksi_id)
+            .order_by(TransaksiDetail.no.asc())
+        )
+        rows = result.scalars().all()
+
+        # Another request may have loaded it while we awaited
+        cart = self._carts.get(transaksi_id)
+        if cart is None:
+            cart = Cart(transaksi_id)
+            for row in rows:
+                cart.lines[row.barcode] = CartLine.from_row(row)
+            self._carts[transaksi_id] = cart
+        return cart
+
+    async def get(self, db: AsyncSession, transaksi_id: int) -> Cart:
+        """Cart of a transaksi, loaded from transaksi_detail on first use"""
+        self.ensure_owned(transaksi_id)
+        cart = await self._load(db, transaksi_id)
+        cart.last_used = time.monotonic()
+        return cart
+
+    @asynccontextmanager
+    async def locked(self, db: AsyncSession, transaksi_id: int) -> AsyncIterator[Cart]:
+        """Cart held exclusively (no concurrent mutation or flush) for a read-modify-write"""
+        cart = await self.get(db, transaksi_id)
+        async with cart.lock:
+            if cart.closed:
+                raise CartClosedException()
+            try:
+                yield cart
+            finally:
+                await self._sync_journal(cart)
+
+    @asynccontextmanager
+    async def checkout(self, transaksi_id: int) -> AsyncIterator[None]:
+        """
+        Flush a cart and keep it locked while its sale is finalized and
+        committed, so no scan lands between the flush and the cart's
+        DELETE. Call ``discard`` inside the block once committed; scans
+        that waited for the lock then fail instead of being acknowledged.
+        """
+        self.ensure_owned(transaksi_id)
+        async with AsyncSessionLocal() as db:
+            cart = await self._load(db, transaksi_id)
+        async with cart.lock:
+            if cart.closed:
+                raise CartClosedException()
+            await self._flush_locked(cart)
+            yield
+
+    def upsert_line(self, cart: Cart, barcode: str, values: Dict, journal: bool = True) -> CartLine:
+        """Create or update a line (call inside ``locked``, which journals it on exit)"""
+        line = cart.lines.get(barcode)
+        if line is None:
+            line = CartLine(cart.transaksi_id, barcode)
+            cart.lines[barcode] = line
+        for name, value in values.items():
+            setattr(line, name, value)
+        cart.dirty.add(barcode)
+        if journal:
+            self._journal(cart, {"op": "set", "line": line.to_dict()})
+        return line
+
+    def remove_line(self, cart: Cart, barcode: str, journal: bool = True) -> bool:
+        """Remove a line (call inside ``locked``, which journals it on exit)"""
+        line = cart.lines.pop(barcode, None)
+        if line is None:
+            return False
+        if line.no:
+            cart.deleted.add(line.no)
+        cart.dirty.discard(barcode)
+        if journal:
+            self._journal(cart, {"op": "del", "barcode": barcode})
+        return True
+
+    def discard(self, transaksi_id: int) -> None:
+        """Close and forget a cart after its sale committed (inside ``checkout``)"""
+        cart = self._carts.pop(transaksi_id, None)
+        if cart is not None:
+            cart.closed = True
+        self._drop_journal(transaksi_id)
+
+    # ---- write-behind ----
+
+    async def _flush_locked(self, cart: Cart) -> None:
+        if cart.is_clean:
+            return
+
+        new_lines: List[CartLine] = []
+        updates: List[Dict] = []
+        for barcode in cart.dirty:
+            line = cart.lines[barcode]
+            if line.no:
+                updates.append({"no": line.no, **{f: getattr(line, f) for f in _ROW_FIELDS}})
+            else:
+                new_lines.append(line)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                if cart.deleted:
+                    await db.execute(
+                        delete(TransaksiDetail).where(TransaksiDetail.no.in_(list(cart.deleted)))
+                    )
+                if updates:
+                    await db.execute(update(TransaksiDetail), updates)
+                rows = []
+                for line in new_lines:
+                    row = TransaksiDetail(**{f: getattr(line, f) for f in _ROW_FIELDS})
+                    db.add(row)
+                    rows.append(row)
+                if rows:
+                    await db.flush()  # assigns `no`
+                await db.commit()
+        except Exception:
+            self.flush_failures += 1
+            raise
+
+        for line, row in zip(new_lines, rows):
+            line.no = row.no
+        self.rows_written += len(cart.deleted) + len(updates) + len(new_lines)
+        cart.dirty.clear()
+        cart.deleted.clear()
+        self.flushes += 1
+        self._drop_journal(cart.transaksi_id)
+
+    async def flush_all(self) -> None:
+        """Write every dirty cart and evict idle clean ones (PeriodicTask entry point)"""
+        idle_before = time.monotonic() - settings.CART_IDLE_SECONDS
+        for transaksi_id, cart in list(self._carts.items()):
+            try:
+                async with cart.lock:
+                    if cart.closed:
+                        continue
+                    await self._flush_locked(cart)
+            except Exception as e:
+                print(f"❌ Cart {transaksi_id} flush failed: {e}")
+                continue
+            if cart.last_used < idle_before and cart.is_clean and not cart.lock.locked():
+                self._carts.pop(transaksi_id, None)
+
+    def claim_worker_index(self) -> None:
+        """
+        Hold an exclusive lock on ``worker-<index>.lock`` for the life of the process.
+
+        Raises:
+            RuntimeError: another process already runs this worker index
+        """
+        if self._index_lock is not None:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        handle = open(os.path.join(self.journal_dir, f"worker-{self.worker_index}.lock"), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            raise RuntimeError(
+                f"Cart worker index {self.worker_index} is already in use; start one process "
+                f"per CART_WORKER_INDEX (not uvicorn --workers) when CART_ENGINE_ENABLED"
+            )
+        self._index_lock = handle
+
+    async def recover(self) -> None:
+        """Replay journals left by a previous process and flush them"""
+        self.claim_worker_index()
+        for name in os.listdir(self.journal_dir):
+            if not name.endswith(".jnl"):
+                continue
+            transaksi_id = int(name[:-4])
+            if self.owner_of(transaksi_id) != self.worker_index:
+                continue
+
+            async with AsyncSessionLocal() as db:
+                open_cart = (await db.execute(
+                    select(Transaksi.id).where(Transaksi.id == transaksi_id, Transaksi.sale_status == '0')
+                )).first()
+                if open_cart is None:
+                    # Checked out (or deleted) after the last scan: replaying would
+                    # write lines back into a finished sale
+                    self._drop_journal(transaksi_id)
+                    continue
+                cart = await self._load(db, transaksi_id)
+            with open(self._journal_path(transaksi_id), encoding="utf-8") as f:
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        break  # torn last write
+                    if record["op"] == "set":
+                        line = record["line"]
+                        values = {f: line[f] for f in _ROW_FIELDS if f not in ("transaksi_id", "barcode")}
+                        self.upsert_line(cart, line["barcode"], values, journal=False)
+                    elif record["op"] == "del":
+                        self.remove_line(cart, record["barcode"], journal=False)
+
+            try:
+                async with cart.lock:
+                    await self._flush_locked(cart)
+            except Exception as e:
+                # Journal stays; the cart is dirty and the flush task retries
+                print(f"❌ Cart {transaksi_id} recovery flush failed: {e}")
+            self.recovered += 1
+
+    def stats(self) -> Dict:
+        return {
+            "worker_index": self.worker_index,
+            "worker_count": self.worker_count,
+            "carts": len(self._carts),
+            "dirty_carts": sum(1 for cart in self._carts.values() if not cart.is_clean),
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "rows_written": self.rows_written,
+            "recovered": self.recovered,
+            "journal_batches": self.journal_batches,
+        }
+
+
+cart_engine = CartEngine(
+    journal_dir=settings.CART_JOURNAL_DIR,
+    worker_index=settings.CART_WORKER_INDEX,
+    worker_count=settings.CART_WORKER_COUNT,
+)
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import secrets
+
+from app.config import settings
+
+
+def deltas_enabled() -> bool:
+    """
+    Versions are kept in worker memory, so they are only exact when every
+    request of a cart reaches one worker: the cart engine pins carts to
+    their owner (CART_ENGINE_ENABLED).
+    """
+    return settings.CART_DELTA_ENABLED and settings.CART_ENGINE_ENABLED
+
+
+class CartState:
+    """Version bookkeeping of one cart"""
+    __slots__ = ("state_id", "version", "line_versions", "removed")
+
+    def __init__(self, state_id: int):
+        self.state_id = state_id
+        self.version = 0
+        self.line_versions: Dict[str, int] = {}  # barcode -> version last changed
+        self.removed: Dict[str, int] = {}  # barcode -> version removed
+
+
+class CartVersionTracker:
+    """
+    Per-worker cart version counter with change tracking.
+
+    Every mutation of a cart bumps its version and records which lines
+    changed or were removed, so a client holding version N only needs the
+    lines touched after N. Version tokens look like
+    ``{epoch}.{state_id}.{version}``: the random epoch changes on worker
+    restart and state_id changes whenever a cart's state is (re)created,
+    so a token from another worker, an earlier process or an evicted state
+    never matches and the client simply gets the full cart.
+
+    State is per worker, so it is only used when the cart engine pins
+    each transaksi to one worker (``deltas_enabled``).
+    """
+
+    def __init__(self, max_carts: int):
+        self.max_carts = max_carts
+        self.epoch = secrets.token_hex(4)
+        self._ids = count(1)
+        self._carts: "OrderedDict[int, CartState]" = OrderedDict()
+        self.delta_responses = 0
+        self.full_responses = 0
+
+    def _state(self, transaksi_id: int, create: bool) -> Optional[CartState]:
+        state = self._carts.get(transaksi_id)
+        if state is None and create:
+            state = CartState(next(self._ids))
+            self._carts[transaksi_id] = state
+            while len(self._carts) > self.max_carts:
+                self._carts.popitem(last=False)
+        if state is not None:
+            self._carts.move_to_end(transaksi_id)
+        return state
+
+    def _token(self, state: CartState) -> str:
+        return f"{self.epoch}.{state.state_id}.{state.version}"
+
+    def current(self, transaksi_id: int) -> Optional[str]:
+        """Current version token, or None if this worker does not track the cart"""
+        state = self._state(transaksi_id, create=False)
+        return self._token(state) if state else None
+
+    def register(self, transaksi_id: int) -> str:
+        """Start tracking a cart (after a full read) and return its token"""
+        return self._token(self._state(transaksi_id, create=True))
+
+    def touch(
+        self,
+        transaksi_id: int,
+        changed: Iterable[str] = (),
+        removed: Iterable[str] = (),
+    ) -> Optional[str]:
+        """Record a mutation and return the new version token (None when deltas are off)"""
+        if not deltas_enabled():
+            return None
+        state = self._state(transaksi_id, create=True)
+        state.version += 1
+        for barcode in changed:
+            state.line_versions[barcode] = state.version
+            state.removed.pop(barcode, None)
+        for barcode in removed:
+            state.line_versions.pop(barcode, None)
+            state.removed[barcode] = state.version
+        return self._token(state)
+
+    def changes_since(
+        self,
+        transaksi_id: int,
+        since: Optional[str],
+    ) -> Optional[Tuple[Set[str], List[str]]]:
+        """
+        Lines changed/removed after ``since``.
+
+        Returns None when a delta cannot be computed (unknown cart or a
+        token from another state); the caller then sends the full cart.
+        """
+        state = self._state(transaksi_id, create=False)
+        if state is None or not since:
+            return None
+
+        try:
+            epoch, state_id, version = since.split(".")
+            state_id, version = int(state_id), int(version)
+        except ValueError:
+            return None
+
+        if epoch != self.epoch or state_id != state.state_id or version > state.version:
+            return None
+
+        changed = {barcode for barcode, v in state.line_versions.items() if v > version}
+        removed = [barcode for barcode, v in state.removed.items() if v > version]
+        return changed, removed
+
+    def forget(self, transaksi_id: int) -> None:
+        """Stop tracking a cart (after checkout)"""
+        self._carts.pop(transaksi_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": deltas_enabled(),
+            "epoch": self.epoch,
+            "carts": len(self._carts),
+            "max_carts": self.max_carts,
+            "delta_responses": self.delta_responses,
+            "full_responses": self.full_responses,
+        }
+
+
+cart_versions = CartVersionTracker(max_carts=settings.CART_VERSION_MAX_CARTS)
@@ -0,0 +1,436 @@
+from sqlalchemy import select
+from datetime import datetime, timedelta
+from decimal import Decimal
+from hashlib import blake2b
+from typing import Dict, Iterator, List, Optional, Tuple
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+
+from app.config import settings
+from app.core import money
+from app.database import AsyncSessionLocal
+from app.models.customer import CustomerGroup
+from app.models.transaksi import Product, ProductPrice, Unit, Tax
+from app.services.reference_data import (
+    CustomerGroupRef,
+    ReferenceSnapshot,
+    TaxRef,
+    UnitRef,
+    _version_query,
+)
+
+
+# Same order as ProductRecord
+PRODUCT_FIELDS = (
+    "id", "store_id", "barcode", "code", "name", "name_lbl", "is_point",
+    "sale_unit_id", "cost", "tax_id", "tax_method", "updated_at",
+)
+
+MAGIC = b"FKCAT\x00\x01\x00"
+# magic, then (offset, count/length) of: meta, products, tier groups, tiers, keys, strings
+HEADER = struct.Struct("<8s12Q")
+# id, store_id, 5 x (string offset, length), is_point, sale_unit_id, tax_id, cost (sen), updated_at (us)
+PRODUCT = struct.Struct("<ii10Iiiiqq")
+# product_id, warehouse_id, first tier, tier count
+TIER_GROUP = struct.Struct("<iiII")
+# minimal (hundredths), harga (sen)
+TIER = struct.Struct("<qq")
+# key hash, product row, kind (0 = barcode, 1 = code)
+KEY = struct.Struct("<QII")
+
+NULL_INT = -(2 ** 31)
+NULL_TIME = -(2 ** 63)
+NULL_STRING = 0xFFFFFFFF
+EPOCH = datetime(1970, 1, 1)
+
+KIND_BARCODE = 0
+KIND_CODE = 1
+
+
+def key_hash(store_id: Optional[int], key: str) -> int:
+    digest = blake2b(f"{'' if store_id is None else store_id}\x00{key}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _int_or_null(value: Optional[int]) -> int:
+    return NULL_INT if value is None else int(value)
+
+
+def _null_or_int(value: int) -> Optional[int]:
+    return None if value == NULL_INT else value
+
+
+def _encode_time(value: Optional[datetime]) -> int:
+    if value is None:
+        return NULL_TIME
+    return (value.replace(tzinfo=None) - EPOCH) // timedelta(microseconds=1)
+
+
+def _decode_time(value: int) -> Optional[datetime]:
+    return None if value == NULL_TIME else EPOCH + timedelta(microseconds=value)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    raise TypeError(type(value))
+
+
+def _json_hook(obj):
+    if "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    if "$dec" in obj:
+        return Decimal(obj["$dec"])
+    return obj
+
+
+class _StringTable:
+    def __init__(self):
+        self.blob = bytearray()
+        self._offsets: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> Tuple[int, int]:
+        if value is None:
+            return 0, NULL_STRING
+        data = value.encode()
+        offset = self._offsets.get(value)
+        if offset is None:
+            offset = len(self.blob)
+            self.blob += data
+            self._offsets[value] = offset
+        return offset, len(data)
+
+
+def encode_snapshot(products, prices, units, taxes, customer_groups, reference_version) -> bytes:
+    """
+    Serialize catalog rows into the snapshot layout.
+
+    Products are sorted by id (binary search by id), tiers are grouped by
+    (product_id, warehouse_id) and sorted by minimal, and barcode / code
+    keys are stored as sorted 64-bit hashes of (store_id, key) pointing at
+    the product row; the row is compared on lookup, so collisions are harmless.
+    """
+    strings = _StringTable()
+    products = sorted(products, key=lambda row: row.id)
+
+    product_bytes = bytearray()
+    keys: List[Tuple[int, int, int]] = []
+    product_watermark = None
+    for row_no, row in enumerate(products):
+        string_refs = []
+        for value in (row.barcode, row.code, row.name, row.name_lbl, row.tax_method):
+            string_refs.extend(strings.add(value))
+        product_bytes += PRODUCT.pack(
+            row.id,
+            _int_or_null(row.store_id),
+            *string_refs,
+            _int_or_null(row.is_point),
+            _int_or_null(row.sale_unit_id),
+            _int_or_null(row.tax_id),
+            money.to_sen(row.cost),
+            _encode_time(row.updated_at),
+        )
+        if row.barcode:
+            keys.append((key_hash(row.store_id, row.barcode), KIND_BARCODE, row_no))
+        if row.code:
+            keys.append((key_hash(row.store_id, row.code), KIND_CODE, row_no))
+        if row.updated_at and (product_watermark is None or row.updated_at > product_watermark):
+            product_watermark = row.updated_at
+
+    keys.sort()
+    key_bytes = b"".join(KEY.pack(h, row_no, kind) for h, kind, row_no in keys)
+
+    grouped: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+    price_watermark = None
+    for row in prices:
+        grouped.setdefault((row.product_id, row.warehouse_id), []).append(
+            (money.to_fixed(row.minimal), money.to_sen(row.harga))
+        )
+        if row.updated_at and (price_watermark is None or row.updated_at > price_watermark):
+            price_watermark = row.updated_at
+
+    group_bytes = bytearray()
+    tier_bytes = bytearray()
+    n_tiers = 0
+    for (product_id, warehouse_id), tiers in sorted(grouped.items()):
+        tiers.sort()
+        group_bytes += TIER_GROUP.pack(product_id, warehouse_id, n_tiers, len(tiers))
+        for minimal, harga in tiers:
+            tier_bytes += TIER.pack(minimal, harga)
+        n_tiers += len(tiers)
+
+    meta = json.dumps({
+        "built_at": time.time(),
+        "product_watermark": product_watermark,
+        "price_watermark": price_watermark,
+        "reference_version": list(reference_version),
+        "units": [list(row) for row in units],
+        "taxes": [list(row) for row in taxes],
+        "customer_groups": [list(row) for row in customer_groups],
+    }, default=_json_default).encode()
+
+    sections = [
+        (meta, len(meta)),
+        (product_bytes, len(products)),
+        (group_bytes, len(grouped)),
+        (tier_bytes, n_tiers),
+        (key_bytes, len(keys)),
+        (strings.blob, len(strings.blob)),
+    ]
+    header_fields = []
+    offset = HEADER.size
+    for data, count in sections:
+        header_fields.extend((offset, count))
+        offset += len(data)
+
+    return b"".join([HEADER.pack(MAGIC, *header_fields)] + [bytes(data) for data, _ in sections])
+
+
+class CatalogSnapshot:
+    """
+    Read-only view over a memory-mapped catalog file.
+
+    All lookups are binary searches with struct.unpack_from on the mapping,
+    so the data lives in the page cache and is shared by every worker that
+    maps the same file; nothing is copied into the Python heap until a
+    record is actually returned.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._mm)
+
+        fields = HEADER.unpack_from(self._mm, 0)
+        if fields[0] != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (
+            meta_off, meta_len,
+            self._products_off, self.n_products,
+            self._groups_off, self.n_groups,
+            self._tiers_off, self.n_tiers,
+            self._keys_off, self.n_keys,
+            self._strings_off, _,
+        ) = fields[1:]
+
+        self.meta = json.loads(self._mm[meta_off:meta_off + meta_len], object_hook=_json_hook)
+        self.built_at: float = self.meta["built_at"]
+        self.product_watermark: Optional[datetime] = self.meta["product_watermark"]
+        self.price_watermark: Optional[datetime] = self.meta["price_watermark"]
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NULL_STRING:
+            return None
+        start = self._strings_off + offset
+        return self._mm[start:start + length].decode()
+
+    def _product(self, row_no: int) -> Tuple:
+        fields = PRODUCT.unpack_from(self._mm, self._products_off + row_no * PRODUCT.size)
+        product_id, store_id = fields[0], fields[1]
+        barcode, code, name, name_lbl, tax_method = (
+            self._string(fields[i], fields[i + 1]) for i in range(2, 12, 2)
+        )
+        is_point, sale_unit_id, tax_id, cost, updated_at = fields[12:]
+        return (
+            product_id, _null_or_int(store_id), barcode, code, name, name_lbl,
+            _null_or_int(is_point), _null_or_int(sale_unit_id), money.to_decimal(cost),
+            _null_or_int(tax_id), tax_method, _decode_time(updated_at),
+        )
+
+    def product_by_id(self, product_id: int) -> Optional[Tuple]:
+        """Product fields in PRODUCT_FIELDS order, or None"""
+        lo, hi = 0, self.n_products
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (mid_id,) = struct.unpack_from("<i", self._mm, self._products_off + mid * PRODUCT.size)
+            if mid_id < product_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_products:
+            (found_id,) = struct.unpack_from("<i", self._mm, self._products_off + lo * PRODUCT.size)
+            if found_id == product_id:
+                return self._product(lo)
+        return None
+
+    def product_by_key(self, store_id: Optional[int], key: str) -> Optional[Tuple]:
+        """Product whose barcode (preferred) or code equals ``key`` in a store"""
+        wanted = key_hash(store_id, key)
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (mid_hash,) = struct.unpack_from("<Q", self._mm, self._keys_off + mid * KEY.size)
+            if mid_hash < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # Entries with the same hash are sorted barcode-first
+        while lo < self.n_keys:
+            entry_hash, row_no, kind = KEY.unpack_from(self._mm, self._keys_off + lo * KEY.size)
+            if entry_hash != wanted:
+                break
+            product = self._product(row_no)
+            if product[1] == store_id and product[2 if kind == KIND_BARCODE else 3] == key:
+                return product
+            lo += 1
+        return None
+
+    def iter_products(self) -> Iterator[Tuple]:
+        """All products in id order (full scan, for building secondary indexes)"""
+        for row_no in range(self.n_products):
+            yield self._product(row_no)
+
+    def tiers(self, product_id: int, warehouse_id: int) -> Optional[List[Tuple[Decimal, Decimal]]]:
+        """Price tiers (minimal, harga) of a product in a warehouse, sorted by minimal"""
+        wanted = (product_id, warehouse_id)
+        lo, hi = 0, self.n_groups
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from("<ii", self._mm, self._groups_off + mid * TIER_GROUP.size) < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= self.n_groups:
+            return None
+        group_product, group_warehouse, first, count = TIER_GROUP.unpack_from(
+            self._mm, self._groups_off + lo * TIER_GROUP.size
+        )
+        if (group_product, group_warehouse) != wanted:
+            return None
+        return [
+            (money.to_decimal(minimal), money.to_decimal(harga))
+            for minimal, harga in TIER.iter_unpack(
+                self._mm[self._tiers_off + first * TIER.size:self._tiers_off + (first + count) * TIER.size]
+            )
+        ]
+
+    def reference(self) -> ReferenceSnapshot:
+        """Units, taxes and customer groups as of the build"""
+        return ReferenceSnapshot(
+            version=tuple(self.meta["reference_version"]),
+            units={row[0]: UnitRef(*row) for row in self.meta["units"]},
+            taxes={row[0]: TaxRef(*row) for row in self.meta["taxes"]},
+            customer_groups={row[0]: CustomerGroupRef(*row) for row in self.meta["customer_groups"]},
+        )
+
+
+class CatalogStore:
+    """
+    Owner of the snapshot file and the current mapping.
+
+    ``ensure`` opens the file when it is fresh enough and rebuilds it
+    otherwise. Builds take an exclusive flock so only one worker queries
+    the database; the file is written next to the target and swapped in
+    with os.replace, so readers either see the old or the new file. A
+    worker notices the swap by inode and re-maps; the old mapping is
+    released once nothing references it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.current: Optional[CatalogSnapshot] = None
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.opens = 0
+
+    async def _query(self):
+        async with AsyncSessionLocal() as db:
+            products = (await db.execute(
+                select(*[getattr(Product, name) for name in PRODUCT_FIELDS])
+            )).all()
+            prices = (await db.execute(
+                select(
+                    ProductPrice.product_id, ProductPrice.warehouse_id,
+                    ProductPrice.minimal, ProductPrice.harga, ProductPrice.updated_at,
+                )
+            )).all()
+            units = (await db.execute(
+                select(
+                    Unit.id, Unit.unit_code, Unit.unit_name,
+                    Unit.base_unit, Unit.operator, Unit.operation_value,
+                )
+            )).all()
+            taxes = (await db.execute(select(Tax.id, Tax.name, Tax.rate))).all()
+            customer_groups = (await db.execute(
+                select(CustomerGroup.id, CustomerGroup.name, CustomerGroup.percentage)
+            )).all()
+            reference_version = tuple((await db.execute(_version_query())).one())
+        return products, prices, units, taxes, customer_groups, reference_version
+
+    def _write(self, data: bytes) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def build(self) -> None:
+        started = time.monotonic()
+        rows = await self._query()
+        data = await asyncio.to_thread(encode_snapshot, *rows)
+        await asyncio.to_thread(self._write, data)
+        self.builds += 1
+        self.build_seconds = round(time.monotonic() - started, 3)
+
+    def _is_fresh(self, max_age: float) -> bool:
+        try:
+            snapshot = CatalogSnapshot(self.path)
+        except (FileNotFoundError, ValueError, struct.error):
+            return False
+        return time.time() - snapshot.built_at < max_age
+
+    def _open(self) -> CatalogSnapshot:
+        """Map the file, reusing the current mapping if the file was not swapped"""
+        inode = os.stat(self.path).st_ino
+        if self.current is None or self.current.inode != inode:
+            self.current = CatalogSnapshot(self.path)
+            self.opens += 1
+        return self.current
+
+    async def ensure(self, max_age: float) -> CatalogSnapshot:
+        """Current snapshot, rebuilt (by one worker) if older than ``max_age`` seconds"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self._is_fresh(max_age):
+            return self._open()
+
+        with open(f"{self.path}.lock", "w") as lock:
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(0.1)  # another worker is building
+            try:
+                if not self._is_fresh(max_age):
+                    await self.build()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        return self._open()
+
+    def stats(self) -> Dict:
+        snapshot = self.current
+        return {
+            "path": self.path,
+            "loaded": snapshot is not None,
+            "bytes": snapshot.size if snapshot else 0,
+            "products": snapshot.n_products if snapshot else 0,
+            "tier_sets": snapshot.n_groups if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.built_at, 1) if snapshot else None,
+            "builds": self.builds,
+            "last_build_seconds": self.build_seconds,
+            "opens": self.opens,
+        }
+
+
+catalog = CatalogStore(settings.CATALOG_SNAPSHOT_PATH)
@@ -0,0 +1,235 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError, OperationalError
+from typing import Dict, List, Optional, Set
+import asyncio
+import time
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.sales import ProductWarehouse
+from app.models.transaksi import Transaksi, TransaksiDetail
+from app.models.user import User
+from app.schemas.checkout import CheckoutRequest, CheckoutResponse
+from app.services.checkout_service import CheckoutService
+from app.services.idempotency_service import IdempotencyService
+from app.services.stock_journal import journal_enabled
+
+
+class _Job:
+    __slots__ = ("request", "operator", "key", "request_hash", "future")
+
+    def __init__(self, request: CheckoutRequest, operator: User, key: Optional[str], request_hash: Optional[str]):
+        self.request = request
+        self.operator = operator
+        self.key = key
+        self.request_hash = request_hash
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _Declined(Exception):
+    """Final answer that writes nothing (rolled back); None = key already claimed"""
+
+    def __init__(self, response: Optional[CheckoutResponse]):
+        super().__init__()
+        self.response = response
+
+
+class CheckoutBatcher:
+    """
+    Group commit for /checkout/finalize (CHECKOUT_BATCH_ENABLED).
+
+    Requests arriving within CHECKOUT_BATCH_WINDOW_MS of the first one (or
+    until CHECKOUT_BATCH_MAX_SIZE) are finalized in one transaction, so
+    they share one COMMIT (one log flush) instead of paying one each. The
+    stock rows of the whole batch are locked first in id order, then the
+    sales run in id_transaksi order, each in its own savepoint through
+    CheckoutService.finalize_transaction.
+
+    A sale that is declined (cart gone, point too high, stock short) gets
+    its own response and its savepoint rolled back. A sale that raises is
+    rolled back to its savepoint and retried alone after the batch
+    commits. If the transaction itself is lost (deadlock, connection:
+    OperationalError) or its commit fails, every sale is retried alone.
+    Each caller's future resolves with its own result only after
+    its sale is committed (or finally failed).
+
+    Batches are per worker; rows locked for a batch are held until its
+    single COMMIT, so keep the window short.
+    """
+
+    def __init__(self):
+        self._queue: List[_Job] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched = 0
+        self.retried = 0
+        self.batch_failures = 0
+        self.largest = 0
+        self.last_batch_ms = 0.0
+
+    async def submit(
+        self,
+        request: CheckoutRequest,
+        operator: User,
+        idempotency_key: Optional[str] = None,
+        request_hash: Optional[str] = None
+    ) -> Optional[CheckoutResponse]:
+        """
+        Finalize in the next batch.
+
+        Returns:
+            CheckoutResponse (committed if success), or None when the
+            Idempotency-Key was claimed by another request (caller replays)
+        """
+        job = _Job(request, operator, idempotency_key, request_hash)
+        self._queue.append(job)
+        if len(self._queue) >= settings.CHECKOUT_BATCH_MAX_SIZE:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                settings.CHECKOUT_BATCH_WINDOW_MS / 1000, self._dispatch
+            )
+        return await job.future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        jobs, self._queue = self._queue, []
+        if jobs:
+            task = asyncio.create_task(self._run_batch(jobs), name="checkout-batch")
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    def _resolve(job: _Job, response: Optional[CheckoutResponse] = None, error: Optional[BaseException] = None) -> None:
+        if job.future.done():  # caller went away (cancelled)
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(response)
+
+    @staticmethod
+    async def _lock_stock(db: AsyncSession, jobs: List[_Job]) -> None:
+        """Lock the stock rows of every cart in the batch, in id order (no deadlock)"""
+        if journal_enabled():
+            return  # journal mode appends deltas, no stock row locks
+        result = await db.execute(
+            select(TransaksiDetail.product_id, Transaksi.warehouse_id)
+            .join(Transaksi, Transaksi.id == TransaksiDetail.transaksi_id)
+            .where(TransaksiDetail.transaksi_id.in_([job.request.id_transaksi for job in jobs]))
+            .distinct()
+        )
+        pairs = [tuple(row) for row in result]
+        if not pairs:
+            return
+        await db.execute(
+            select(ProductWarehouse.id)
+            .where(tuple_(ProductWarehouse.product_id, ProductWarehouse.warehouse_id).in_(pairs))
+            .order_by(ProductWarehouse.id)
+            .with_for_update()
+        )
+
+    @staticmethod
+    async def _apply(db: AsyncSession, job: _Job) -> CheckoutResponse:
+        """
+        One sale in the current transaction (no commit).
+
+        Raises:
+            _Declined: answer without writes; caller rolls back
+        """
+        store_id = job.operator.store_id
+        if job.key:
+            try:
+                await IdempotencyService.claim(db, store_id, job.operator.id, job.key, job.request_hash)
+            except IntegrityError:
+                raise _Declined(None)
+        response = await CheckoutService.finalize_transaction(db, job.request, job.operator)
+        if not response.success:
+            raise _Declined(response)
+        if job.key:
+            await IdempotencyService.complete(db, store_id, job.key, response)
+        return response
+
+    async def _run_single(self, job: _Job) -> None:
+        """Retry a sale alone, in its own transaction"""
+        self.retried += 1
+        async with AsyncSessionLocal() as db:
+            try:
+                response = await self._apply(db, job)
+                await db.commit()
+            except _Declined as e:
+                await db.rollback()
+                response = e.response
+            except Exception as e:
+                await db.rollback()
+                self._resolve(job, error=e)
+                return
+        self._resolve(job, response)
+
+    async def _run_batch(self, jobs: List[_Job]) -> None:
+        started = time.perf_counter()
+        jobs.sort(key=lambda job: job.request.id_transaksi)
+        done: Dict[int, Optional[CheckoutResponse]] = {}  # job index -> response
+        retry: List[_Job] = []
+        try:
+            async with AsyncSessionLocal() as db:
+                await self._lock_stock(db, jobs)
+                for index, job in enumerate(jobs):
+                    try:
+                        async with db.begin_nested():
+                            response = await self._apply(db, job)
+                            await db.flush()
+                    except _Declined as e:
+                        response = e.response
+                    except OperationalError:
+                        # Deadlock / lost connection: InnoDB rolled back the whole
+                        # transaction, sales already in `done` included
+                        raise
+                    except Exception as e:
+                        print(f"❌ Checkout {job.request.id_transaksi} failed in batch, retrying alone: {e}")
+                        retry.append(job)
+                        continue
+                    finally:
+                        db.expunge_all()  # sales share the session, not ORM state
+                    done[index] = response
+                await db.commit()
+        except Exception as e:
+            print(f"❌ Checkout batch of {len(jobs)} failed, retrying each alone: {e}")
+            self.batch_failures += 1
+            done, retry = {}, jobs
+
+        self.batches += 1
+        self.batched += len(jobs)
+        self.largest = max(self.largest, len(jobs))
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+        for index, response in done.items():
+            self._resolve(jobs[index], response)
+        for job in retry:
+            await self._run_single(job)
+
+    async def drain(self) -> None:
+        """Run the queued batch and wait for running ones (shutdown)"""
+        self._dispatch()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.CHECKOUT_BATCH_ENABLED,
+            "window_ms": settings.CHECKOUT_BATCH_WINDOW_MS,
+            "batches": self.batches,
+            "checkouts": self.batched,
+            "avg_batch": round(self.batched / self.batches, 1) if self.batches else 0,
+            "largest_batch": self.largest,
+            "retried_alone": self.retried,
+            "batch_failures": self.batch_failures,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+        }
+
+
+checkout_batcher = CheckoutBatcher()
@@ -1,13 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, insert, update, case, func, text
 from datetime import datetime, timezone
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import random
 import string
 
 from app.models.transaksi import Transaksi, TransaksiDetail
 from app.models.sales import Sale, ProductSale, Payment, Balance, ProductLog, ProductWarehouse, CustomerLog
 from app.models.customer import Customer
+from app.models.user import User
+from app.schemas.checkout import CheckoutRequest, CheckoutResponse
+from app.config import settings
+from app.core import money
+from app.services.outbox import outbox
+from app.services.sequence_allocator import sequence_allocator
+from app.services.stock_reservations import InsufficientStockError, stock_reservations
+from app.services.stock_journal import journal_enabled, stock_journal
+from app.services.product_index import product_index
 
 
 class CheckoutService:
@@ -32,6 +41,31 @@ class CheckoutService:
         now = datetime.now()
         return f"spr-{now.strftime('%Y%m%d')}-{now.strftime('%H%M%S')}"
     
+    @staticmethod
+    async def allocate_reference_no(jenis_trx: int, store_id: int) -> str:
+        """
+        Reference number unik untuk sale: P/R/S{yymmdd}-{store_id}-{seq}.
+        
+        seq dari sequence_allocator (blok hi/lo per store), jadi tidak bisa
+        bentrok antar terminal / worker di unique index sales.reference_no.
+        Tanpa SEQUENCE_ALLOCATOR_ENABLED pakai generate_reference_no.
+        """
+        if not settings.SEQUENCE_ALLOCATOR_ENABLED:
+            return CheckoutService.generate_reference_no(jenis_trx)
+        
+        seq = await sequence_allocator.next(store_id, "sale")
+        prefix = {1: "P", 5: "R"}.get(jenis_trx, "S")  # Penjualan / Retur / lainnya
+        return f"{prefix}{datetime.now().strftime('%y%m%d')}-{store_id}-{seq:06d}"
+    
+    @staticmethod
+    async def allocate_payment_reference(store_id: int) -> str:
+        """Payment reference unik: spr-{yyyymmdd}-{store_id}-{seq}"""
+        if not settings.SEQUENCE_ALLOCATOR_ENABLED:
+            return CheckoutService.generate_payment_reference()
+        
+        seq = await sequence_allocator.next(store_id, "payment")
+        return f"spr-{datetime.now().strftime('%Y%m%d')}-{store_id}-{seq:06d}"
+    
     @staticmethod
     def get_payment_method_name(method_id: int) -> str:
         """Convert payment method ID to name"""
@@ -51,7 +85,12 @@ class CheckoutService:
         db: AsyncSession,
         transaksi_id: int
     ) -> Optional[Dict]:
-        """Get summary total dari transaksi_detail"""
+        """
+        Get summary total dari transaksi_detail
+        
+        SUM atas kolom DECIMAL sudah exact; total_price_sen dipakai untuk
+        hitungan grand total supaya tidak lewat float.
+        """
         result = await db.execute(
             select(
                 func.count(TransaksiDetail.no).label('item'),
@@ -70,6 +109,7 @@ class CheckoutService:
         return {
             "item": row.item,
             "total_price": float(row.total or 0),
+            "total_price_sen": money.to_sen(row.total),
             "total_qty": float(row.qty or 0),
             "total_tax": float(row.total_tax or 0),
             "total_discount": float(row.total_discount or 0),
@@ -135,9 +175,28 @@ class CheckoutService:
         transaksi_id: int,
         reference_no: str,
         store_id: int,
-        warehouse_id: int
+        warehouse_id: int,
+        product_logs: Optional[List[Dict]] = None
     ) -> List[Dict]:
-        """Copy transaksi_detail ke product_sales dan update stock"""
+        """
+        Copy transaksi_detail ke product_sales dan update stock.
+        
+        Semua baris product_warehouse yang terkena dikunci sekaligus
+        (SELECT ... FOR UPDATE ORDER BY id), dikurangi dengan satu UPDATE,
+        dan product_logs diisi dari hasil baca yang terkunci itu.
+        product_sales dan product_logs masing-masing ditulis dengan satu
+        Core INSERT executemany (multi-row), tanpa unit-of-work ORM.
+        Kalau ``product_logs`` diberikan, baris log ditambahkan ke list itu
+        dan tidak di-insert (ditulis caller, lewat outbox).
+        
+        Dengan STOCK_RESERVATION_ENABLED stock dikurangi lewat
+        convert_reservations (UPDATE bersyarat, tanpa baca dulu). Dengan
+        STOCK_MODE=journal product_warehouse tidak di-update sama sekali:
+        delta ditambahkan ke stock_journal (tanpa row lock).
+        
+        Raises:
+            InsufficientStockError: stock tidak cukup (mode reservasi)
+        """
         now = datetime.now(timezone.utc)
         
         # Get all transaksi detail
@@ -150,63 +209,219 @@ class CheckoutService:
         
         results = []
         
-        for detail in details:
-            # Create product sale
-            product_sale = ProductSale(
-                reference_no=reference_no,
-                product_id=detail.product_id,
-                qty=detail.jumlah,
-                sale_unit_id=detail.unit_id,
-                net_unit_price=detail.harga,
-                discount=detail.diskon or 0,
-                tax_rate=detail.tax_rate or 0,
-                tax=detail.tax or 0,
-                total=detail.total,
-                profit=detail.profit or 0,
-                taxed=0,
-                created_at=now,
-                updated_at=now
+        if not details:
+            return results
+        
+        # product_sales: satu multi-row INSERT
+        await db.execute(insert(ProductSale.__table__), [
+            {
+                "reference_no": reference_no,
+                "product_id": detail.product_id,
+                "qty": detail.jumlah,
+                "sale_unit_id": detail.unit_id,
+                "net_unit_price": detail.harga,
+                "discount": detail.diskon or 0,
+                "tax_rate": detail.tax_rate or 0,
+                "tax": detail.tax or 0,
+                "total": detail.total,
+                "profit": detail.profit or 0,
+                "taxed": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for detail in details
+        ])
+        
+        product_ids = sorted({detail.product_id for detail in details})
+        stock: Dict[int, List[int]] = {}  # product_id -> [row id, qty in hundredths]
+        journal = journal_enabled()
+        converted = not journal and settings.STOCK_RESERVATION_ENABLED
+        if journal:
+            # Unlocked read of base + pending deltas
+            stock = await stock_journal.read(db, product_ids, warehouse_id)
+        elif converted:
+            # Already decremented (conditional UPDATE); stock = qty before it
+            stock = await CheckoutService.convert_reservations(
+                db, details, product_ids, warehouse_id, now
             )
-            db.add(product_sale)
-            
-            # Update product warehouse stock
+        else:
+            # Lock every affected stock row in one query, in id order so two
+            # checkouts sharing products always lock in the same order (no deadlock)
             stock_result = await db.execute(
-                select(ProductWarehouse).where(
-                    ProductWarehouse.product_id == detail.product_id,
-                    ProductWarehouse.warehouse_id == warehouse_id
+                select(ProductWarehouse.id, ProductWarehouse.product_id, ProductWarehouse.qty)
+                .where(
+                    ProductWarehouse.warehouse_id == warehouse_id,
+                    ProductWarehouse.product_id.in_(product_ids)
                 )
+                .order_by(ProductWarehouse.id)
+                .with_for_update()
             )
-            product_warehouse = stock_result.scalar_one_or_none()
+            for row in stock_result:
+                stock.setdefault(row.product_id, [row.id, money.to_fixed(row.qty)])
+        
+        # Logs from the locked read; running qty per product so repeated
+        # lines of one product chain start/end like sequential updates
+        decrements: Dict[int, int] = {}  # row id -> hundredths sold
+        logs: List[Dict] = []
+        for detail in details:
+            entry = stock.get(detail.product_id)
+            if entry is None:
+                continue
+            row_id, old_qty = entry
+            sold = money.to_fixed(detail.jumlah)
+            entry[1] = old_qty - sold
+            decrements[row_id] = decrements.get(row_id, 0) + sold
             
-            if product_warehouse:
-                old_qty = float(product_warehouse.qty)
-                new_qty = old_qty - float(detail.jumlah)
-                product_warehouse.qty = new_qty
-                product_warehouse.updated_at = now
-                
-                # Create product log
-                product_log = ProductLog(
-                    store_id=store_id,
-                    reference_no=reference_no,
-                    warehouse_id=warehouse_id,
-                    product_id=detail.product_id,
-                    start_qty=old_qty,
-                    end_qty=new_qty,
-                    run_qty=float(detail.jumlah),
-                    status_qty=1,  # 1 = Penjualan
-                    created_at=now
+            logs.append({
+                "store_id": store_id,
+                "reference_no": reference_no,
+                "warehouse_id": warehouse_id,
+                "product_id": detail.product_id,
+                "start_qty": money.to_decimal(old_qty),
+                "end_qty": money.to_decimal(entry[1]),
+                "run_qty": money.to_decimal(sold),
+                "status_qty": 1,  # 1 = Penjualan
+                "created_at": now,
+            })
+            
+            results.append({
+                "product_id": detail.product_id,
+                "old_stock": money.from_sen(old_qty),
+                "new_stock": money.from_sen(entry[1]),
+                "qty_sold": money.from_sen(sold)
+            })
+        
+        # One UPDATE for all rows (still locked, so qty - sold is exact)
+        if journal:
+            await stock_journal.append(
+                db, reference_no, {row_id: -sold for row_id, sold in decrements.items()}
+            )
+        elif decrements and not converted:
+            await db.execute(
+                update(ProductWarehouse)
+                .where(ProductWarehouse.id.in_(list(decrements)))
+                .values(
+                    qty=ProductWarehouse.qty - case(
+                        {row_id: money.to_decimal(sold) for row_id, sold in decrements.items()},
+                        value=ProductWarehouse.id
+                    ),
+                    updated_at=now
                 )
-                db.add(product_log)
-                
-                results.append({
-                    "product_id": detail.product_id,
-                    "old_stock": old_qty,
-                    "new_stock": new_qty,
-                    "qty_sold": float(detail.jumlah)
-                })
+                .execution_options(synchronize_session=False)
+            )
+        if logs:
+            if product_logs is not None:
+                product_logs.extend(logs)
+            else:
+                await db.execute(insert(ProductLog.__table__), logs)
         
         return results
     
+    @staticmethod
+    async def convert_reservations(
+        db: AsyncSession,
+        details: List[TransaksiDetail],
+        product_ids: List[int],
+        warehouse_id: int,
+        now: datetime
+    ) -> Dict[int, List[int]]:
+        """
+        Kurangi stock cart dengan satu UPDATE bersyarat
+        (``qty >= jumlah`` per baris), memakai row id product_warehouse yang
+        sudah dicatat stock_reservations saat scan, jadi tanpa SELECT dulu.
+        Baris yang sudah di-update lalu dibaca sekali untuk product_logs.
+        
+        Returns:
+            product_id -> [row id, qty sebelum dikurangi (hundredths)]
+        
+        Raises:
+            InsufficientStockError: ada product yang stocknya kurang
+                (baris lain sudah ter-update; caller rollback)
+        """
+        row_ids = {
+            product_id: stock_reservations.row_id(product_id, warehouse_id)
+            for product_id in product_ids
+        }
+        missing = [product_id for product_id, row_id in row_ids.items() if row_id is None]
+        if missing:  # tidak di-scan lewat worker ini
+            result = await db.execute(
+                select(ProductWarehouse.id, ProductWarehouse.product_id)
+                .where(
+                    ProductWarehouse.warehouse_id == warehouse_id,
+                    ProductWarehouse.product_id.in_(missing)
+                )
+                .order_by(ProductWarehouse.id)
+            )
+            for row in result:
+                if row_ids[row.product_id] is None:
+                    row_ids[row.product_id] = row.id
+        row_ids = {product_id: row_id for product_id, row_id in row_ids.items() if row_id is not None}
+        if not row_ids:
+            return {}
+        
+        sold: Dict[int, int] = {}  # product_id -> hundredths
+        for detail in details:
+            if detail.product_id in row_ids:
+                sold[detail.product_id] = sold.get(detail.product_id, 0) + money.to_fixed(detail.jumlah)
+        
+        amount = case(
+            {row_ids[product_id]: money.to_decimal(qty) for product_id, qty in sold.items()},
+            value=ProductWarehouse.id
+        )
+        ids = sorted(row_ids.values())
+        updated = await db.execute(
+            update(ProductWarehouse)
+            .where(ProductWarehouse.id.in_(ids), ProductWarehouse.qty >= amount)
+            .values(qty=ProductWarehouse.qty - amount, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        
+        result = await db.execute(
+            select(ProductWarehouse.id, ProductWarehouse.product_id, ProductWarehouse.qty)
+            .where(ProductWarehouse.id.in_(ids))
+        )
+        rows = result.all()
+        if updated.rowcount != len(ids):
+            short = [row for row in rows if money.to_fixed(row.qty) < sold[row.product_id]]
+            for row in short:  # not updated, so qty is current: refresh the scan-time view
+                stock_reservations.observe(row.product_id, warehouse_id, row.id, money.to_fixed(row.qty))
+            raise InsufficientStockError([row.product_id for row in short] or list(row_ids))
+        
+        stock: Dict[int, List[int]] = {}
+        for row in rows:
+            end = money.to_fixed(row.qty)
+            stock[row.product_id] = [row.id, end + sold[row.product_id]]
+            stock_reservations.observe(row.product_id, warehouse_id, row.id, end)
+        return stock
+    
+    @staticmethod
+    def payment_row(
+        reference_no: str,
+        payment_method_id: int,
+        paid_amount: float,
+        paying_amount: float,
+        payment_note: Optional[str],
+        operator_id: int,
+        store_id: int,
+        payment_reference: Optional[str] = None
+    ) -> Dict:
+        """Build a payments row"""
+        now = datetime.now(timezone.utc)
+        return {
+            "reference_no": reference_no,
+            "payment_reference": payment_reference or CheckoutService.generate_payment_reference(),
+            "user_id": operator_id,
+            "account_id": 1,  # Default account
+            "paying": paying_amount,
+            "amount": paid_amount,
+            "change": paying_amount - paid_amount,
+            "paying_method": CheckoutService.get_payment_method_name(payment_method_id),
+            "payment_note": payment_note,
+            "store_id": store_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+    
     @staticmethod
     async def create_payment(
         db: AsyncSession,
@@ -219,63 +434,95 @@ class CheckoutService:
         store_id: int
     ) -> bool:
         """Create payment record"""
-        now = datetime.now(timezone.utc)
-        payment_reference = CheckoutService.generate_payment_reference()
-        payment_method = CheckoutService.get_payment_method_name(payment_method_id)
-        change = paying_amount - paid_amount
-        
-        payment = Payment(
-            reference_no=reference_no,
-            payment_reference=payment_reference,
-            user_id=operator_id,
-            account_id=1,  # Default account
-            paying=paying_amount,
-            amount=paid_amount,
-            change=change,
-            paying_method=payment_method,
-            payment_note=payment_note,
-            store_id=store_id,
-            created_at=now,
-            updated_at=now
-        )
-        
-        db.add(payment)
+        await db.execute(insert(Payment.__table__), [CheckoutService.payment_row(
+            reference_no, payment_method_id, paid_amount, paying_amount,
+            payment_note, operator_id, store_id
+        )])
         return True
     
     @staticmethod
-    async def create_balance_entry(
-        db: AsyncSession,
-        jenis_id: int,
+    def balance_rows(
         reference_no: str,
         user_id: int,
         customer_id: int,
-        jumlah: float,
-        bayar: float,
         trx_id: int,
-        payment_method_id: int,
         store_id: int,
-        warehouse_id: int
-    ) -> bool:
-        """Create balance/ledger entry"""
-        now = datetime.now(timezone.utc)
+        warehouse_id: int,
+        entries: List[Tuple[int, float, float, int]]
+    ) -> List[Dict]:
+        """
+        Build balance/ledger rows of one sale.
         
-        balance = Balance(
-            jenis_id=jenis_id,
-            reff_number=reference_no,
-            user_id=user_id,
-            customer_id=customer_id,
-            jumlah=jumlah,
-            bayar=bayar,
-            trx_id=trx_id,
-            payment_method_id=payment_method_id,
-            store_id=store_id,
-            warehouse_id=warehouse_id,
-            created_at=now,
-            updated_at=now
-        )
+        Args:
+            entries: (jenis_id, jumlah, bayar, payment_method_id) per entry
+        """
+        now = datetime.now(timezone.utc)
+        return [
+            {
+                "jenis_id": jenis_id,
+                "reff_number": reference_no,
+                "user_id": user_id,
+                "customer_id": customer_id,
+                "jumlah": jumlah,
+                "bayar": bayar,
+                "trx_id": trx_id,
+                "payment_method_id": payment_method_id,
+                "store_id": store_id,
+                "warehouse_id": warehouse_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for jenis_id, jumlah, bayar, payment_method_id in entries
+        ]
+    
+    @staticmethod
+    async def create_balance_entries(
+        db: AsyncSession,
+        reference_no: str,
+        user_id: int,
+        customer_id: int,
+        trx_id: int,
+        store_id: int,
+        warehouse_id: int,
+        entries: List[Tuple[int, float, float, int]]
+    ) -> int:
+        """
+        Create balance/ledger entries of one sale in one multi-row INSERT.
         
-        db.add(balance)
-        return True
+        Args:
+            entries: (jenis_id, jumlah, bayar, payment_method_id) per entry
+            
+        Returns:
+            Number of entries written
+        """
+        if not entries:
+            return 0
+        await db.execute(insert(Balance.__table__), CheckoutService.balance_rows(
+            reference_no, user_id, customer_id, trx_id, store_id, warehouse_id, entries
+        ))
+        return len(entries)
+    
+    @staticmethod
+    def customer_log_row(
+        customer_id: int,
+        jenis_trx: int,
+        jumlah: float,
+        reff_id: int,
+        store_id: int,
+        status_trx: int = 1
+    ) -> Dict:
+        """Build a customer_logs row"""
+        now = datetime.now(timezone.utc)
+        return {
+            "customer_id": customer_id,
+            "jenis_trx": jenis_trx,
+            "jumlah": jumlah,
+            "reff_id": reff_id,
+            "status_trx": status_trx,
+            "store_id": store_id,
+            "created_at": now,
+            "updated_at": now,
+        }
     
     @staticmethod
     async def create_customer_log(
@@ -288,18 +535,277 @@ class CheckoutService:
         status_trx: int = 1
     ) -> bool:
         """Create customer transaction log"""
-        now = datetime.now(timezone.utc)
+        await db.execute(insert(CustomerLog.__table__), [CheckoutService.customer_log_row(
+            customer_id, jenis_trx, jumlah, reff_id, store_id, status_trx
+        )])
+        return True
+    
+    @staticmethod
+    async def write_side_effects(db: AsyncSession, effects: Dict[str, List[Dict]]) -> None:
+        """
+        Write the ledger/log rows of a sale: one multi-row INSERT per table.
         
-        cust_log = CustomerLog(
-            customer_id=customer_id,
-            jenis_trx=jenis_trx,
-            jumlah=jumlah,
-            reff_id=reff_id,
-            status_trx=status_trx,
-            store_id=store_id,
-            created_at=now,
-            updated_at=now
+        Args:
+            effects: table name (SIDE_EFFECT_TABLES) -> rows
+        """
+        for table_name, rows in effects.items():
+            if rows:
+                await db.execute(insert(SIDE_EFFECT_TABLES[table_name]), rows)
+    
+    @staticmethod
+    async def finalize_transaction(
+        db: AsyncSession,
+        request: CheckoutRequest,
+        operator: User
+    ) -> CheckoutResponse:
+        """
+        Proses cart (transaksi & transaksi_detail) menjadi sale final.
+        
+        Tidak commit: caller commit kalau success, rollback kalau tidak
+        (atau kalau ada exception).
+        
+        Sale, product_sales, stock dan penghapusan cart ditulis langsung.
+        Payment, balance, customer_logs dan product_logs ditulis langsung
+        juga, atau dengan OUTBOX_ENABLED jadi satu outbox event yang
+        di-expand oleh outbox worker setelah commit, supaya row lock
+        transaksi ini dilepas lebih cepat.
+        
+        Args:
+            db: Database session
+            request: Checkout request
+            operator: Kasir (current user)
+            
+        Returns:
+            CheckoutResponse
+        """
+        # 1. Validate transaksi
+        transaksi_result = await db.execute(
+            select(Transaksi).where(
+                Transaksi.id == request.id_transaksi,
+                Transaksi.sale_status == '0'  # Belum diproses
+            )
         )
+        transaksi = transaksi_result.scalar_one_or_none()
+        
+        if not transaksi:
+            return CheckoutResponse(
+                success=False,
+                msg="Transaksi tidak ditemukan atau sudah diproses"
+            )
+        
+        # 2. Get cart summary
+        summary = await CheckoutService.get_transaksi_summary(db, request.id_transaksi)
+        
+        if not summary:
+            return CheckoutResponse(
+                success=False,
+                msg="Tidak ada produk di cart"
+            )
+        
+        # 3. Calculate totals (integer sen, app.core.money)
+        total_price_sen = summary['total_price_sen']
+        
+        # Bulatkan ke bawah ratusan
+        total_rounded_sen = money.floor_hundreds(total_price_sen)
+        
+        # Handle point (jika digunakan, jadi negatif)
+        point_sen = -abs(money.to_sen(request.point)) if request.point > 0 else 0
+        
+        # Handle order discount (jadi negatif)
+        order_discount_sen = -abs(money.to_sen(request.order_discount)) if request.order_discount > 0 else 0
+        
+        # Calculate grand total, bulatkan ke ratusan
+        grand_total_sen = money.round_hundreds(
+            total_rounded_sen +
+            money.to_sen(request.shipping_cost) +
+            money.to_sen(request.service_fee) +
+            money.to_sen(request.order_tax) +
+            order_discount_sen +
+            point_sen
+        )
+        
+        # Validate point tidak melebihi total
+        if abs(point_sen) > total_rounded_sen:
+            return CheckoutResponse(
+                success=False,
+                msg="Point tidak boleh melebihi total transaksi"
+            )
+        
+        paying_sen = money.to_sen(request.paying_amount)
+        
+        # Determine payment status
+        if request.paying_method == 6:  # COD
+            if paying_sen == 0:
+                payment_status = "1"  # Belum bayar
+            elif paying_sen < grand_total_sen:
+                payment_status = "3"  # Sebagian
+            else:
+                payment_status = "4"  # Lunas
+        else:
+            payment_status = "4"  # Lunas
+        
+        # Calculate paid amount
+        paid_sen = grand_total_sen if paying_sen >= grand_total_sen else paying_sen
+        change_sen = paying_sen - grand_total_sen
         
-        db.add(cust_log)
-        return True
\ No newline at end of file
+        # Validate payment untuk non-COD
+        if request.is_dikirim == 0 and change_sen < 0:
+            return CheckoutResponse(
+                success=False,
+                msg=f"Pembayaran kurang: {money.from_sen(abs(change_sen))}"
+            )
+        
+        # Satu konversi ke rupiah untuk ORM / response
+        total_price_rounded = money.from_sen(total_rounded_sen)
+        point_discount = money.from_sen(point_sen)
+        order_discount = money.from_sen(order_discount_sen)
+        grand_total = money.from_sen(grand_total_sen)
+        paid_amount = money.from_sen(paid_sen)
+        change = money.from_sen(change_sen)
+        
+        # 4. Generate reference number
+        reference_no = await CheckoutService.allocate_reference_no(
+            transaksi.jenis_trx or 1, operator.store_id
+        )
+        
+        # 5. Begin transaction
+        checkout_data = {
+            'order_tax': request.order_tax,
+            'order_tax_rate': request.order_tax_rate,
+            'order_discount': order_discount,
+            'shipping_cost': request.shipping_cost,
+            'service_fee': request.service_fee,
+            'point': point_discount,
+            'paid_amount': paid_amount,
+            'sale_note': request.sale_note,
+            'staff_note': request.staff_note,
+            'supervised': request.supervised,
+            'customer_alias': request.customer_alias,
+            'is_dikirim': request.is_dikirim
+        }
+        
+        # 6. Create sale
+        sale_id = await CheckoutService.create_sale(
+            db=db,
+            transaksi=transaksi,
+            summary=summary,
+            checkout_data=checkout_data,
+            reference_no=reference_no,
+            grand_total=grand_total,
+            payment_status=payment_status,
+            operator_id=operator.id,
+            store_id=operator.store_id
+        )
+        
+        # 7. Create product sales & update stock; product_logs dikumpulkan
+        # ke effects bersama payment, balance dan customer log
+        effects: Dict[str, List[Dict]] = {"product_logs": []}
+        try:
+            await CheckoutService.create_product_sales(
+                db=db,
+                transaksi_id=request.id_transaksi,
+                reference_no=reference_no,
+                store_id=operator.store_id,
+                warehouse_id=transaksi.warehouse_id,
+                product_logs=effects["product_logs"]
+            )
+        except InsufficientStockError as e:
+            names = [
+                record.name if record else str(product_id)
+                for product_id, record in ((pid, product_index.get(pid)) for pid in e.product_ids)
+            ]
+            return CheckoutResponse(
+                success=False,
+                msg=f"Stok tidak cukup: {', '.join(names)}"
+            )
+        
+        # 8. Payment
+        effects["payments"] = [CheckoutService.payment_row(
+            reference_no=reference_no,
+            payment_method_id=request.paying_method,
+            paid_amount=paid_amount,
+            paying_amount=request.paying_amount,
+            payment_note=request.staff_note,
+            operator_id=operator.id,
+            store_id=operator.store_id,
+            payment_reference=await CheckoutService.allocate_payment_reference(operator.store_id)
+        )]
+        
+        # 9. Balance entries
+        # (jenis_id, jumlah, bayar, payment_method_id)
+        balance_entries = [(1, total_price_rounded, paid_amount, request.paying_method)]  # 1 = Penjualan
+        if point_discount < 0:
+            balance_entries.append((7, point_discount, 0, 1))  # 7 = Bayar Point
+        if order_discount < 0:
+            balance_entries.append((9, order_discount, 0, request.paying_method))  # 9 = Diskon Penjualan
+        if request.shipping_cost > 0:
+            balance_entries.append((10, request.shipping_cost, 0, request.paying_method))  # 10 = Ongkir
+        if request.service_fee > 0:
+            balance_entries.append((11, request.service_fee, 0, request.paying_method))  # 11 = Layanan
+        
+        effects["balance"] = CheckoutService.balance_rows(
+            reference_no=reference_no,
+            user_id=operator.id,
+            customer_id=transaksi.customer_id,
+            trx_id=sale_id,
+            store_id=operator.store_id,
+            warehouse_id=transaksi.warehouse_id,
+            entries=balance_entries
+        )
+        
+        # 10. Customer log
+        effects["customer_logs"] = [CheckoutService.customer_log_row(
+            customer_id=transaksi.customer_id,
+            jenis_trx=1,  # 1 = Penjualan
+            jumlah=grand_total,
+            reff_id=sale_id,
+            store_id=operator.store_id,
+            status_trx=1
+        )]
+        
+        if settings.OUTBOX_ENABLED:
+            outbox.enqueue(db, SIDE_EFFECTS_EVENT, effects)
+        else:
+            await CheckoutService.write_side_effects(db, effects)
+        
+        # 11. Update transaksi status
+        #transaksi.sale_status = '1'
+        
+        # 12. Delete transaksi & transaksi_detail (cart sudah jadi sale)
+        querydt = text("""DELETE FROM transaksi_detail WHERE transaksi_id = :trans_id """)
+        await db.execute(
+            querydt,{
+                "trans_id": request.id_transaksi
+            }
+        )
+        queryT=text("""DELETE FROM transaksi WHERE id = :trans_id """)
+
+        await db.execute(
+        queryT,{
+            "trans_id": request.id_transaksi
+        }
+        )
+        
+        
+        return CheckoutResponse(
+            success=True,
+            msg="Transaksi berhasil",
+            sale_id=sale_id,
+            reference_no=reference_no,
+            grand_total=grand_total,
+            paying_amount=request.paying_amount,
+            change=change if change > 0 else 0,
+            piutang=abs(change) if change < 0 else 0
+        )
+
+
+# Tables written by CheckoutService.write_side_effects (outbox payload keys)
+SIDE_EFFECT_TABLES = {
+    "payments": Payment.__table__,
+    "balance": Balance.__table__,
+    "customer_logs": CustomerLog.__table__,
+    "product_logs": ProductLog.__table__,
+}
+
+SIDE_EFFECTS_EVENT = "sale.side_effects"
+outbox.register(SIDE_EFFECTS_EVENT, CheckoutService.write_side_effects)
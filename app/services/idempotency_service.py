@@ -0,0 +1,124 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.database import AsyncSessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.schemas.checkout import CheckoutRequest, CheckoutResponse
+
+
+# (store_id, key) -> (request_hash, CheckoutResponse) of committed checkouts
+idempotency_cache = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    name="idempotency",
+)
+
+
+def _utcnow() -> datetime:
+    """DB datetimes are naive UTC"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class IdempotencyService:
+    """
+    Idempotency-Key support for POST /checkout/finalize.
+
+    ``claim`` inserts the key inside the checkout transaction before any
+    sale is written: a concurrent request with the same key blocks on the
+    unique index until the first one commits (then gets IntegrityError and
+    replays) or rolls back (then proceeds). ``complete`` stores the
+    response in the same row before commit, so a committed key always has
+    its response. Only successful checkouts are stored; a failed one can
+    be retried with the same key.
+    """
+
+    @staticmethod
+    def request_hash(request: CheckoutRequest) -> str:
+        return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+    @staticmethod
+    async def lookup(
+        db: AsyncSession,
+        store_id: int,
+        key: str
+    ) -> Optional[Tuple[str, CheckoutResponse]]:
+        """
+        Stored (request_hash, response) for a key, from the LRU or the table.
+        
+        Returns:
+            None kalau key belum pernah dipakai untuk checkout yang sukses
+        """
+        cached = idempotency_cache.get((store_id, key))
+        if cached is not None:
+            return cached
+
+        result = await db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.response).where(
+                IdempotencyKey.store_id == store_id,
+                IdempotencyKey.idem_key == key,
+                IdempotencyKey.response.is_not(None)
+            )
+        )
+        row = result.first()
+        if row is None:
+            return None
+
+        stored = (row.request_hash, CheckoutResponse.model_validate_json(row.response))
+        idempotency_cache.set((store_id, key), stored)
+        return stored
+
+    @staticmethod
+    async def claim(
+        db: AsyncSession,
+        store_id: int,
+        user_id: int,
+        key: str,
+        request_hash: str
+    ) -> None:
+        """
+        Insert the key in the current transaction (flushed, not committed).
+        
+        Raises:
+            IntegrityError: key committed meanwhile by another request
+        """
+        db.add(IdempotencyKey(
+            store_id=store_id,
+            idem_key=key,
+            request_hash=request_hash,
+            user_id=user_id,
+            created_at=_utcnow(),
+        ))
+        await db.flush()
+
+    @staticmethod
+    async def complete(
+        db: AsyncSession,
+        store_id: int,
+        key: str,
+        response: CheckoutResponse
+    ) -> None:
+        """Store the response with the claimed key (caller commits)"""
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.store_id == store_id, IdempotencyKey.idem_key == key)
+            .values(response=response.model_dump_json())
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def remember(store_id: int, key: str, request_hash: str, response: CheckoutResponse) -> None:
+        """Cache a committed response for replays served by this worker"""
+        idempotency_cache.set((store_id, key), (request_hash, response))
+
+    @staticmethod
+    async def purge() -> None:
+        """Delete keys older than IDEMPOTENCY_TTL_SECONDS (PeriodicTask entry point)"""
+        cutoff = _utcnow() - timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+            await db.commit()
@@ -0,0 +1,161 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Optional
+import json
+import time
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.outbox import OutboxEvent
+
+Handler = Callable[[AsyncSession, Dict], Awaitable[None]]
+
+
+def _utcnow() -> datetime:
+    """DB datetimes are naive UTC"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)  # exact; MySQL parses it back into the DECIMAL column
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode_row(row: Dict) -> Dict:
+    """Timestamps (``*_at`` keys) back to datetime"""
+    for key, value in row.items():
+        if key.endswith("_at") and isinstance(value, str):
+            row[key] = datetime.fromisoformat(value)
+    return row
+
+
+def encode_payload(payload: Dict) -> str:
+    return json.dumps(payload, default=_encode_value, separators=(",", ":"))
+
+
+def decode_payload(payload: str) -> Dict:
+    return json.loads(payload, object_hook=_decode_row)
+
+
+class OutboxWorker:
+    """
+    Transactional outbox for side effects that need not hold the request's
+    row locks (ledger and log rows of a sale).
+
+    ``enqueue`` adds an event to the caller's transaction, so it commits or
+    rolls back with the sale. ``run`` (PeriodicTask entry point) claims
+    pending events with ``FOR UPDATE SKIP LOCKED`` (several workers share
+    the table without blocking each other), applies each in a savepoint
+    and marks it processed in the same transaction: a crash before commit
+    leaves the event pending, so delivery is at least once and handlers
+    write nothing outside that transaction. A failing event is retried on
+    later runs up to OUTBOX_MAX_ATTEMPTS, without blocking the others.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+        self.enqueued = 0
+        self.processed = 0
+        self.failures = 0
+        self.batches = 0
+        self.last_lag = 0.0  # seconds from commit of the sale to processing
+        self.max_lag = 0.0
+        self.pending: Optional[int] = None
+        self.oldest_pending_age: Optional[float] = None
+        self.last_run_ms = 0.0
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, db: AsyncSession, kind: str, payload: Dict) -> None:
+        """Add an event to the current transaction (no flush, no commit)"""
+        if kind not in self._handlers:
+            raise ValueError(f"No outbox handler for {kind!r}")
+        db.add(OutboxEvent(
+            kind=kind,
+            payload=encode_payload(payload),
+            created_at=_utcnow(),
+            attempts=0,
+        ))
+        self.enqueued += 1
+
+    async def _process_batch(self, after_id: int) -> List[int]:
+        """Claim and apply one batch of events with id > after_id; returns their ids"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(OutboxEvent)
+                .where(
+                    OutboxEvent.processed_at.is_(None),
+                    OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS,
+                    OutboxEvent.id > after_id
+                )
+                .order_by(OutboxEvent.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            events = result.scalars().all()
+
+            for event in events:
+                try:
+                    async with db.begin_nested():
+                        await self._handlers[event.kind](db, decode_payload(event.payload))
+                except Exception as e:
+                    event.attempts += 1
+                    event.last_error = f"{type(e).__name__}: {e}"[:2000]
+                    self.failures += 1
+                    print(f"❌ Outbox event {event.id} ({event.kind}) failed: {e}")
+                    continue
+                now = _utcnow()
+                event.processed_at = now
+                lag = (now - event.created_at).total_seconds()
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.processed += 1
+
+            await db.commit()
+        self.batches += 1
+        return [event.id for event in events]
+
+    async def _measure_backlog(self) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at))
+                .where(OutboxEvent.processed_at.is_(None))
+            )
+            pending, oldest = result.one()
+        self.pending = pending
+        self.oldest_pending_age = (_utcnow() - oldest).total_seconds() if oldest else 0.0
+
+    async def run(self) -> None:
+        """Drain pending events in batches, then refresh the backlog metrics"""
+        started = time.perf_counter()
+        after_id = 0  # failed events are retried next run, not within this one
+        while True:
+            ids = await self._process_batch(after_id)
+            if len(ids) < settings.OUTBOX_BATCH_SIZE:
+                break
+            after_id = ids[-1]
+        await self._measure_backlog()
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": settings.OUTBOX_ENABLED,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failures": self.failures,
+            "batches": self.batches,
+            "pending": self.pending,
+            "oldest_pending_age_seconds": self.oldest_pending_age,
+            "last_lag_seconds": round(self.last_lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+            "last_run_ms": round(self.last_run_ms, 1),
+        }
+
+
+outbox = OutboxWorker()
@@ -0,0 +1,195 @@
+from sqlalchemy import select
+from datetime import timezone
+from typing import Dict, Optional
+import asyncio
+import time
+import jwt
+from jwt.exceptions import PyJWTError as JWTError
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.database import AsyncSessionLocal
+from app.models.token import OauthAccessToken
+
+
+# jti -> (user_id, expires_ts); user_id 0 marks a known-invalid token
+passport_token_cache = TTLCache(
+    maxsize=settings.PASSPORT_TOKEN_CACHE_SIZE,
+    ttl=settings.PASSPORT_TOKEN_CACHE_TTL_SECONDS,
+    name="passport_tokens",
+)
+
+
+class PassportLookupBatcher:
+    """
+    Coalesce concurrent oauth_access_tokens lookups into one query.
+
+    Lookups arriving within PASSPORT_BATCH_WINDOW_MS of each other are
+    resolved with a single ``WHERE id IN (...)``; concurrent lookups of
+    the same jti share one future.
+    """
+
+    def __init__(self, window_ms: int, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.lookups = 0
+
+    async def lookup(self, jti: str) -> Optional[OauthAccessToken]:
+        future = self._pending.get(jti)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[jti] = future
+            if len(self._pending) >= self.max_size:
+                self._schedule(0)
+            elif self._flush_handle is None:
+                self._schedule(self.window)
+        return await future
+
+    def _schedule(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(
+            delay, lambda: asyncio.ensure_future(self._flush())
+        )
+
+    async def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        self.batches += 1
+        self.lookups += len(batch)
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(OauthAccessToken).where(
+                        OauthAccessToken.id.in_(list(batch))
+                    )
+                )
+                rows = {row.id: row for row in result.scalars().all()}
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for jti, future in batch.items():
+            if not future.done():
+                future.set_result(rows.get(jti))
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "lookups": self.lookups,
+            "avg_batch_size": round(self.lookups / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+passport_batcher = PassportLookupBatcher(
+    window_ms=settings.PASSPORT_BATCH_WINDOW_MS,
+    max_size=settings.PASSPORT_BATCH_MAX_SIZE,
+)
+
+
+def _load_public_key() -> Optional[str]:
+    if not settings.PASSPORT_TOKENS_ENABLED:
+        return None
+    if not settings.PASSPORT_PUBLIC_KEY_PATH:
+        # Without the key any JWT naming a known jti would be accepted
+        raise RuntimeError("PASSPORT_TOKENS_ENABLED requires PASSPORT_PUBLIC_KEY_PATH (oauth-public.key)")
+    with open(settings.PASSPORT_PUBLIC_KEY_PATH) as f:
+        return f.read()
+
+
+_passport_public_key = _load_public_key()
+
+
+class PassportService:
+    """Service untuk validasi token Laravel Passport (oauth_access_tokens)"""
+
+    @staticmethod
+    def decode_passport_token(token: str) -> Optional[Dict]:
+        """
+        Decode a Passport JWT.
+
+        The RS256 signature is always verified against
+        PASSPORT_PUBLIC_KEY_PATH (required when PASSPORT_TOKENS_ENABLED).
+
+        Args:
+            token: Bearer token string
+
+        Returns:
+            Token claims or None if it is not a Passport token
+        """
+        try:
+            if not _passport_public_key or jwt.get_unverified_header(token).get("alg") != "RS256":
+                return None
+            return jwt.decode(
+                token,
+                _passport_public_key,
+                algorithms=["RS256"],
+                options={"verify_aud": False},
+            )
+        except JWTError:
+            return None
+
+    @staticmethod
+    async def validate_token(token: str) -> Optional[Dict]:
+        """
+        Validate a Passport bearer token.
+
+        Results are cached per jti for PASSPORT_TOKEN_CACHE_TTL_SECONDS
+        (bounded by the token's expiry); misses go through the batched
+        oauth_access_tokens lookup.
+
+        Args:
+            token: Bearer token string
+
+        Returns:
+            Payload with ``sub``/``jti``/``exp`` or None if invalid
+        """
+        claims = PassportService.decode_passport_token(token)
+        if not claims or not claims.get("jti"):
+            return None
+
+        jti = claims["jti"]
+        cached = passport_token_cache.get(jti)
+        if cached is None:
+            row = await passport_batcher.lookup(jti)
+            cached = PassportService._cache_row(jti, row)
+
+        user_id, expires_ts = cached
+        if not user_id or expires_ts <= time.time():
+            return None
+
+        return {
+            "sub": str(user_id),
+            "jti": jti,
+            "exp": int(expires_ts),
+            "iat": claims.get("iat", 0),
+            "passport": True,
+        }
+
+    @staticmethod
+    def _cache_row(jti: str, row: Optional[OauthAccessToken]) -> tuple:
+        now = time.time()
+        if row is None or row.revoked or row.user_id is None or row.expires_at is None:
+            entry = (0, 0.0)
+            passport_token_cache.set(jti, entry)
+            return entry
+
+        expires_at = row.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        expires_ts = expires_at.timestamp()
+
+        entry = (row.user_id, expires_ts)
+        ttl = min(settings.PASSPORT_TOKEN_CACHE_TTL_SECONDS, max(expires_ts - now, 0))
+        passport_token_cache.set(jti, entry, ttl=ttl)
+        return entry
@@ -0,0 +1,234 @@
+from sqlalchemy import select, tuple_
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+import time
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.transaksi import ProductPrice
+from app.services.catalog_snapshot import CatalogSnapshot, catalog
+from app.services.product_index import ProductRecord, product_index
+from app.services.reference_data import reference_data
+
+
+class PriceTiers:
+    """
+    Price tiers of one (product, warehouse), sorted by ``minimal``.
+
+    ``prefix_min[i]`` is the lowest ``harga`` among the first i+1 tiers, so
+    ``MIN(harga) WHERE minimal <= qty`` is one bisect plus one index.
+    """
+    __slots__ = ("minimals", "prefix_min")
+
+    def __init__(self, tiers: List[Tuple[Decimal, Decimal]]):
+        tiers = sorted(tiers)
+        self.minimals = [minimal for minimal, _ in tiers]
+        self.prefix_min = []
+        lowest = None
+        for _, harga in tiers:
+            lowest = harga if lowest is None or harga < lowest else lowest
+            self.prefix_min.append(lowest)
+
+    def price_for(self, qty: float) -> Optional[Decimal]:
+        i = bisect_right(self.minimals, qty)
+        return self.prefix_min[i - 1] if i else None
+
+
+def build_harga_row(
+    product: ProductRecord,
+    unit_name: Optional[str],
+    tax_rate,
+    price,
+    cust_group: int,
+) -> Dict:
+    """Same keys as the row returned by the get_harga SQL for ``cust_group``"""
+    row = {
+        "barcode": product.barcode,
+        "name": product.name,
+        "product_id": product.id,
+        "is_point": product.is_point,
+        "unit_name": unit_name,
+        "unit_id": product.sale_unit_id if unit_name is not None else None,
+        "cost": product.cost,
+        "tax_rate": tax_rate,
+        "tax_method": product.tax_method,
+        "tax_id": product.tax_id,
+        "price": price,
+    }
+    if cust_group == 1:  # only the product_prices query selects p.id
+        row["id"] = product.id
+    return row
+
+
+class PriceCache:
+    """
+    In-memory replacement for the get_harga SQL.
+
+    Holds price tiers per (product_id, warehouse_id); product attributes
+    come from product_index and unit names / tax rates from reference_data
+    instead of the SQL joins. Tiers are refreshed incrementally from
+    ``product_prices.updated_at``; a periodic full reload picks up
+    deleted tiers.
+    
+    With CATALOG_SNAPSHOT_ENABLED the tiers are read from the shared
+    catalog snapshot and ``_tiers`` only holds tier sets changed since it
+    was built.
+    """
+
+    def __init__(self):
+        self._tiers: Dict[Tuple[int, int], PriceTiers] = {}
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._removed: Set[Tuple[int, int]] = set()  # snapshot tier sets deleted since the build
+        self.watermark: Optional[datetime] = None
+        self.loaded = False
+        self.last_full_load = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get_harga(
+        self,
+        product_id: int,
+        qty: float,
+        cust_group: int,
+        warehouse_id: int,
+    ) -> Optional[Dict]:
+        """
+        Resolve the get_harga row from memory.
+
+        Returns None when the product or its tiers are not cached; the
+        caller then falls back to SQL.
+        """
+        product = product_index.get(product_id) if self.loaded else None
+        reference = reference_data.snapshot
+        if product is None or reference is None:
+            self.misses += 1
+            return None
+
+        if cust_group == 1:  # Umum (retail) - pakai product_prices
+            key = (product_id, warehouse_id)
+            tiers = self._tiers.get(key)
+            if tiers is None and self.snapshot is not None and key not in self._removed:
+                rows = self.snapshot.tiers(product_id, warehouse_id)
+                tiers = PriceTiers(rows) if rows else None
+            if tiers is None:
+                self.misses += 1
+                return None
+            price = tiers.price_for(abs(qty))
+            if price is None:
+                self.misses += 1
+                return None
+        else:  # Cabang/Gudang - pakai cost
+            price = product.cost
+
+        self.hits += 1
+        return build_harga_row(
+            product,
+            reference.unit_name(product.sale_unit_id),
+            reference.tax_rate(product.tax_id),
+            price,
+            cust_group,
+        )
+
+    @staticmethod
+    def _group_tiers(rows) -> Dict[Tuple[int, int], PriceTiers]:
+        grouped: Dict[Tuple[int, int], List[Tuple[Decimal, Decimal]]] = {}
+        for row in rows:
+            grouped.setdefault((row.product_id, row.warehouse_id), []).append(
+                (row.minimal, row.harga)
+            )
+        return {key: PriceTiers(tiers) for key, tiers in grouped.items()}
+
+    async def load(self) -> None:
+        """Full (re)build of tiers, or from the catalog snapshot"""
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            snapshot = await catalog.ensure(settings.PRICE_CACHE_FULL_RELOAD_SECONDS)
+            self._tiers = {}
+            self._removed = set()
+            self.snapshot = snapshot
+            self.watermark = snapshot.price_watermark
+            self.loaded = True
+            self.last_full_load = time.monotonic()
+            return
+
+        async with AsyncSessionLocal() as db:
+            price_result = await db.execute(
+                select(
+                    ProductPrice.product_id,
+                    ProductPrice.warehouse_id,
+                    ProductPrice.minimal,
+                    ProductPrice.harga,
+                    ProductPrice.updated_at,
+                )
+            )
+            price_rows = price_result.all()
+
+        watermark = max(
+            (row.updated_at for row in price_rows if row.updated_at),
+            default=None,
+        )
+
+        self._tiers = self._group_tiers(price_rows)
+        self.watermark = watermark
+        self.loaded = True
+        self.last_full_load = time.monotonic()
+
+    async def refresh(self) -> None:
+        """Reload tiers touched since the last load (PeriodicTask entry point)"""
+        if (
+            not self.loaded
+            or self.watermark is None
+            or time.monotonic() - self.last_full_load >= settings.PRICE_CACHE_FULL_RELOAD_SECONDS
+        ):
+            await self.load()
+            return
+
+        async with AsyncSessionLocal() as db:
+            changed_result = await db.execute(
+                select(ProductPrice.product_id, ProductPrice.warehouse_id, ProductPrice.updated_at)
+                .where(ProductPrice.updated_at >= self.watermark)
+            )
+            changed = changed_result.all()
+            if not changed:
+                return
+
+            keys = {(row.product_id, row.warehouse_id) for row in changed}
+            tier_result = await db.execute(
+                select(
+                    ProductPrice.product_id,
+                    ProductPrice.warehouse_id,
+                    ProductPrice.minimal,
+                    ProductPrice.harga,
+                ).where(
+                    tuple_(ProductPrice.product_id, ProductPrice.warehouse_id).in_(list(keys))
+                )
+            )
+            fresh = self._group_tiers(tier_result.all())
+
+        # Whole tier sets are replaced, so tiers deleted alongside an update go too
+        for key in keys:
+            if key in fresh:
+                self._tiers[key] = fresh[key]
+                self._removed.discard(key)
+            else:
+                self._tiers.pop(key, None)
+                if self.snapshot is not None:
+                    self._removed.add(key)
+
+        self.watermark = max(row.updated_at for row in changed)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "loaded": self.loaded,
+            "tier_sets": len(self._tiers) + (self.snapshot.n_groups if self.snapshot else 0),
+            "overlay_tier_sets": len(self._tiers) if self.snapshot else None,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+price_cache = PriceCache()
@@ -0,0 +1,222 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Set
+import time
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.transaksi import Product
+from app.services.catalog_snapshot import CatalogSnapshot, PRODUCT_FIELDS, catalog
+
+
+class ProductRecord(NamedTuple):
+    """Compact, immutable product row used on the scan path"""
+    id: int
+    store_id: Optional[int]
+    barcode: str
+    code: Optional[str]
+    name: str
+    name_lbl: Optional[str]
+    is_point: Optional[int]
+    sale_unit_id: int
+    cost: float
+    tax_id: Optional[int]
+    tax_method: Optional[str]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, row) -> "ProductRecord":
+        """Build from a Product instance or a row with the same column names"""
+        return cls(
+            id=row.id,
+            store_id=row.store_id,
+            barcode=row.barcode,
+            code=row.code,
+            name=row.name,
+            name_lbl=row.name_lbl,
+            is_point=row.is_point,
+            sale_unit_id=row.sale_unit_id,
+            cost=row.cost,
+            tax_id=row.tax_id,
+            tax_method=row.tax_method,
+            updated_at=row.updated_at,
+        )
+
+
+PRODUCT_RECORD_COLUMNS = [getattr(Product, name) for name in ProductRecord._fields]
+assert ProductRecord._fields == PRODUCT_FIELDS
+
+
+class ProductIndex:
+    """
+    Per-store in-memory barcode/code index over ``products``.
+
+    Replaces ``barcode = :x OR code = :x`` (which defeats the single-column
+    indexes) with two dict lookups. Built at startup, then refreshed
+    incrementally from ``products.updated_at``; a periodic full reload
+    picks up deletions. Misses still fall back to the database in
+    TransaksiService.get_product_by_barcode.
+    
+    With CATALOG_SNAPSHOT_ENABLED the full product set is read from the
+    shared memory-mapped catalog snapshot and the dicts only hold products
+    changed since the snapshot was built (an overlay that shadows them).
+    """
+
+    def __init__(self):
+        # store_id -> key -> record; barcode matches win over code matches
+        self._by_barcode: Dict[Optional[int], Dict[str, ProductRecord]] = {}
+        self._by_code: Dict[Optional[int], Dict[str, ProductRecord]] = {}
+        self._by_id: Dict[int, ProductRecord] = {}
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._hidden: Set[int] = set()  # snapshot products removed in the overlay
+        # Secondary indexes (product search) follow changes through these
+        self.on_change: List[Callable[[ProductRecord], None]] = []
+        self.on_reload: List[Callable[[], Awaitable[None]]] = []
+        self.watermark: Optional[datetime] = None
+        self.loaded = False
+        self.last_full_load = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _from_snapshot(self, fields) -> Optional[ProductRecord]:
+        """Snapshot row, unless the overlay holds a newer version of that product"""
+        if fields is None or fields[0] in self._by_id or fields[0] in self._hidden:
+            return None
+        return ProductRecord(*fields)
+
+    def lookup(self, store_id: int, key: str) -> Optional[ProductRecord]:
+        record = self._by_barcode.get(store_id, {}).get(key)
+        if record is None and self.snapshot is not None:
+            record = self._from_snapshot(self.snapshot.product_by_key(store_id, key))
+        if record is None:
+            record = self._by_code.get(store_id, {}).get(key)
+
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def __len__(self) -> int:
+        """Product count (with a snapshot, overlay updates are counted twice)"""
+        return len(self._by_id) + (self.snapshot.n_products if self.snapshot else 0)
+
+    def get(self, product_id: int) -> Optional[ProductRecord]:
+        record = self._by_id.get(product_id)
+        if record is None and self.snapshot is not None:
+            record = self._from_snapshot(self.snapshot.product_by_id(product_id))
+        return record
+
+    def records(self) -> Iterator[ProductRecord]:
+        """Every product (overlay, then snapshot rows not shadowed by it)"""
+        yield from list(self._by_id.values())
+        if self.snapshot is not None:
+            for fields in self.snapshot.iter_products():
+                record = self._from_snapshot(fields)
+                if record is not None:
+                    yield record
+
+    def put(self, record: ProductRecord) -> None:
+        """Insert or replace a product, dropping keys of its previous version"""
+        self.remove(record.id)
+        self._hidden.discard(record.id)
+        self._by_id[record.id] = record
+        if record.barcode:
+            self._by_barcode.setdefault(record.store_id, {})[record.barcode] = record
+        if record.code:
+            self._by_code.setdefault(record.store_id, {})[record.code] = record
+
+    def remove(self, product_id: int) -> None:
+        if self.snapshot is not None:
+            self._hidden.add(product_id)
+        old = self._by_id.pop(product_id, None)
+        if old is None:
+            return
+        barcodes = self._by_barcode.get(old.store_id, {})
+        if barcodes.get(old.barcode) is old:
+            del barcodes[old.barcode]
+        codes = self._by_code.get(old.store_id, {})
+        if old.code and codes.get(old.code) is old:
+            del codes[old.code]
+
+    def _advance_watermark(self, record: ProductRecord) -> None:
+        if record.updated_at and (self.watermark is None or record.updated_at > self.watermark):
+            self.watermark = record.updated_at
+
+    async def load(self, db: Optional[AsyncSession] = None) -> None:
+        """Full (re)build from products, or from the catalog snapshot"""
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            snapshot = await catalog.ensure(settings.PRODUCT_INDEX_FULL_RELOAD_SECONDS)
+            self._by_barcode, self._by_code, self._by_id = {}, {}, {}
+            self._hidden = set()
+            self.snapshot = snapshot
+            self.watermark = snapshot.product_watermark
+            self.loaded = True
+            self.last_full_load = time.monotonic()
+            await self._notify_reload()
+            return
+
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.load(session)
+
+        result = await db.execute(select(*PRODUCT_RECORD_COLUMNS))
+
+        fresh = ProductIndex()
+        for row in result:
+            record = ProductRecord.from_row(row)
+            fresh.put(record)
+            fresh._advance_watermark(record)
+
+        # Swap in the new maps in one step
+        self._by_barcode = fresh._by_barcode
+        self._by_code = fresh._by_code
+        self._by_id = fresh._by_id
+        self.watermark = fresh.watermark
+        self.loaded = True
+        self.last_full_load = time.monotonic()
+        await self._notify_reload()
+
+    async def _notify_reload(self) -> None:
+        for listener in self.on_reload:
+            await listener()
+
+    async def refresh(self) -> None:
+        """Apply products changed since the last load (PeriodicTask entry point)"""
+        if (
+            not self.loaded
+            or time.monotonic() - self.last_full_load >= settings.PRODUCT_INDEX_FULL_RELOAD_SECONDS
+        ):
+            await self.load()
+            return
+
+        async with AsyncSessionLocal() as db:
+            query = select(*PRODUCT_RECORD_COLUMNS)
+            if self.watermark is not None:
+                # >= so rows sharing the watermark second are not missed
+                query = query.where(Product.updated_at >= self.watermark)
+            result = await db.execute(query)
+
+            for row in result:
+                record = ProductRecord.from_row(row)
+                self.put(record)
+                self._advance_watermark(record)
+                for listener in self.on_change:
+                    listener(record)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "loaded": self.loaded,
+            "products": len(self),
+            "overlay_products": len(self._by_id) if self.snapshot else None,
+            "stores": len(self._by_barcode),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+product_index = ProductIndex()
@@ -0,0 +1,237 @@
+from collections import Counter
+from heapq import nsmallest
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import re
+import time
+
+from app.services.product_index import ProductRecord, product_index
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+# Postings this large say little about a query; skipped when counting fuzzy hits
+_FUZZY_MAX_POSTING = 5000
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric words"""
+    return _WORD.findall(text.lower()) if text else []
+
+
+def doc_grams(word: str) -> Set[str]:
+    """
+    Grams of an indexed word: trigrams of `` word `` plus the 2-char word
+    start, so 1-2 char query words still hit a posting.
+    """
+    padded = f" {word} "
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    grams.add(padded[:2])
+    return grams
+
+
+def query_grams(token: str) -> List[str]:
+    """Grams of a query word, padded at the front only: it matches word prefixes"""
+    padded = f" {token}"
+    if len(padded) < 3:
+        return [padded]
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class _Doc:
+    __slots__ = ("record", "words", "name", "code", "rank")
+
+    def __init__(self, record: ProductRecord):
+        self.record = record
+        self.words = tuple(words(record.name) + words(record.name_lbl) + words(record.code))
+        self.name = " ".join(words(record.name))
+        self.code = "".join(words(record.code))
+        self.rank = len(self.name) << 32 | record.id  # shorter names first
+
+    def grams(self) -> Set[str]:
+        grams = set()
+        for word in self.words:
+            grams |= doc_grams(word)
+        return grams
+
+    def matches(self, tokens: Iterable[str]) -> bool:
+        return all(any(word.startswith(token) for word in self.words) for token in tokens)
+
+
+class _StoreIndex:
+    """Gram -> product ids postings of one store"""
+
+    def __init__(self):
+        self.docs: Dict[int, _Doc] = {}
+        self.rank: Dict[int, int] = {}  # id -> doc.rank, a C-level sort key
+        self.by_code: Dict[str, int] = {}
+        self.postings: Dict[str, Set[int]] = {}
+
+    def add(self, record: ProductRecord) -> None:
+        self.remove(record.id)
+        doc = _Doc(record)
+        self.docs[record.id] = doc
+        self.rank[record.id] = doc.rank
+        if doc.code:
+            self.by_code[doc.code] = record.id
+        for gram in doc.grams():
+            self.postings.setdefault(gram, set()).add(record.id)
+
+    def remove(self, product_id: int) -> None:
+        doc = self.docs.pop(product_id, None)
+        if doc is None:
+            return
+        del self.rank[product_id]
+        if self.by_code.get(doc.code) == product_id:
+            del self.by_code[doc.code]
+        for gram in doc.grams():
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def _candidates(self, tokens: List[str]) -> Set[int]:
+        """Ids holding every query gram (intersection, rarest posting first)"""
+        postings = []
+        for token in tokens:
+            for gram in query_grams(token):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return set()
+                postings.append(ids)
+        postings.sort(key=len)
+        found = set(postings[0])
+        for ids in postings[1:]:
+            found &= ids
+            if not found:
+                break
+        return found
+
+    def _fuzzy(self, tokens: List[str]) -> Dict[int, int]:
+        """Ids sharing most query grams (typos, word order); id -> hits"""
+        grams = {gram for token in tokens for gram in query_grams(token)}
+        hits = Counter()
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids and len(ids) <= _FUZZY_MAX_POSTING:
+                hits.update(ids)
+        needed = max(2, (len(grams) * 3 + 4) // 5)  # ~60% of the grams
+        return {product_id: n for product_id, n in hits.items() if n >= needed}
+
+    def search(self, query: str, limit: int) -> List[ProductRecord]:
+        tokens = words(query)
+        if not tokens:
+            return []
+        phrase = " ".join(tokens)
+        docs = self.docs
+
+        # Exact code first, then names starting with the query, then the
+        # rest; each in rank order
+        ordered = sorted(self._candidates(tokens), key=self.rank.__getitem__)
+        leading = [product_id for product_id in ordered if docs[product_id].name.startswith(phrase)]
+        code_hit = self.by_code.get("".join(tokens))
+        # 1-2 char words are single word-start grams, longer ones may match
+        # trigrams of different words: confirm those, only as far as needed
+        verify = any(len(token) > 2 for token in tokens)
+
+        results, seen = [], set()
+        for product_id in chain((code_hit,) if code_hit else (), leading, ordered):
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            doc = docs[product_id]
+            if product_id == code_hit or not verify or doc.matches(tokens):
+                results.append(doc.record)
+                if len(results) == limit:
+                    break
+        if results:
+            return results
+
+        hits = self._fuzzy(tokens)
+        best = nsmallest(limit, hits, key=lambda product_id: (-hits[product_id], self.rank[product_id]))
+        return [docs[product_id].record for product_id in best]
+
+
+class ProductSearchIndex:
+    """
+    Per-store in-memory search over ``products.name``, ``name_lbl`` and
+    ``code`` for products whose label won't scan.
+
+    Every word is indexed as padded trigrams; a query word matches the
+    words it is a prefix of ("indom" -> "Indomie"), all query words must
+    match, and results are ranked exact code first, then names starting
+    with the query, then shorter names. When nothing matches, products
+    sharing most of the query trigrams are returned (typos).
+
+    Built from product_index after each full load (in a thread, swapped
+    in when done) and updated per product from its incremental refresh.
+    """
+
+    def __init__(self):
+        self._stores: Dict[Optional[int], _StoreIndex] = {}
+        self._store_of: Dict[int, Optional[int]] = {}
+        self._pending: Optional[List[ProductRecord]] = None  # changes during a rebuild
+        self.ready = False
+        self.build_ms = 0.0
+        self.searches = 0
+
+    def attach(self) -> None:
+        """Follow product_index changes"""
+        product_index.on_change.append(self.put)
+        product_index.on_reload.append(self.rebuild)
+
+    def put(self, record: ProductRecord) -> None:
+        if self._pending is not None:
+            self._pending.append(record)
+            return
+        old_store = self._store_of.get(record.id, record.store_id)
+        if old_store != record.store_id:
+            self._stores[old_store].remove(record.id)
+        self._stores.setdefault(record.store_id, _StoreIndex()).add(record)
+        self._store_of[record.id] = record.store_id
+
+    @staticmethod
+    def _build(records: Iterable[ProductRecord]) -> Tuple[Dict, Dict]:
+        stores: Dict[Optional[int], _StoreIndex] = {}
+        store_of: Dict[int, Optional[int]] = {}
+        for record in records:
+            stores.setdefault(record.store_id, _StoreIndex()).add(record)
+            store_of[record.id] = record.store_id
+        return stores, store_of
+
+    async def rebuild(self) -> None:
+        """Full rebuild from product_index (after its full load)"""
+        if self._pending is not None:
+            return  # a rebuild is already running
+        self._pending = []
+        started = time.perf_counter()
+        try:
+            stores, store_of = await asyncio.to_thread(self._build, product_index.records())
+            self._stores, self._store_of = stores, store_of
+        finally:
+            pending, self._pending = self._pending, None
+        for record in pending:
+            self.put(record)
+        self.ready = True
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def search(self, store_id: int, query: str, limit: int = 20) -> List[ProductRecord]:
+        self.searches += 1
+        index = self._stores.get(store_id)
+        if index is None:
+            return []
+        return index.search(query, limit)
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "stores": len(self._stores),
+            "products": len(self._store_of),
+            "grams": sum(len(index.postings) for index in self._stores.values()),
+            "build_ms": round(self.build_ms, 1),
+            "searches": self.searches,
+        }
+
+
+product_search = ProductSearchIndex()
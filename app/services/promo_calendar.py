@@ -0,0 +1,149 @@
+from sqlalchemy import select
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+import asyncio
+
+from app.database import AsyncSessionLocal
+from app.models.transaksi import Product, ProductPromo
+
+
+class PromoWindow(NamedTuple):
+    """One promotion window of a product"""
+    product_id: int
+    start: datetime
+    end: datetime
+    promotion_price: float
+    max_item_promo: Optional[int]
+
+
+def _utcnow() -> datetime:
+    """DB datetimes are naive UTC (same convention as check_promo's SQL)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class PromoCalendar:
+    """
+    In-memory calendar of promotion windows.
+
+    Windows come from ``products`` (promotion = 1 with starting_date /
+    last_date) and from ``product_promos`` for products that have a
+    promotion price. The set of currently active promos is maintained by
+    a timer that fires at the next window boundary, so the scan path is a
+    dict lookup; the lookup still checks the window bounds so a late timer
+    can never serve an expired promo.
+    """
+
+    def __init__(self):
+        self._windows: Dict[int, List[PromoWindow]] = {}
+        self._active: Dict[int, PromoWindow] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.loaded = False
+        self.next_boundary: Optional[datetime] = None
+
+    def get_active(self, product_id: int, now: Optional[datetime] = None) -> Optional[PromoWindow]:
+        now = now or _utcnow()
+        window = self._active.get(product_id)
+        if window is not None and window.start <= now <= window.end:
+            return window
+
+        # Timer not yet fired for a boundary that just passed
+        for window in self._windows.get(product_id, ()):
+            if window.start <= now <= window.end:
+                return window
+        return None
+
+    @staticmethod
+    def promo_qty(window: PromoWindow, qty: float) -> float:
+        """Quantity eligible for the promo price (max_item_promo, 0 = unlimited)"""
+        if window.max_item_promo and window.max_item_promo > 0:
+            return min(qty, window.max_item_promo)
+        return qty
+
+    def _tick(self) -> None:
+        """Recompute active promos and arm the timer for the next boundary"""
+        now = _utcnow()
+        active: Dict[int, PromoWindow] = {}
+        next_boundary: Optional[datetime] = None
+
+        for product_id, windows in self._windows.items():
+            for window in windows:
+                if window.start <= now <= window.end:
+                    active.setdefault(product_id, window)
+                for boundary in (window.start, window.end):
+                    if boundary > now and (next_boundary is None or boundary < next_boundary):
+                        next_boundary = boundary
+
+        self._active = active
+        self.next_boundary = next_boundary
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if next_boundary is not None:
+            delay = (next_boundary - now).total_seconds()
+            # call_later caps at ~24 days on some platforms; refresh re-arms anyway
+            self._timer = asyncio.get_running_loop().call_later(
+                min(delay, 86400) + 0.001, self._tick
+            )
+
+    async def load(self) -> None:
+        """(Re)load windows from products and product_promos"""
+        async with AsyncSessionLocal() as db:
+            product_result = await db.execute(
+                select(
+                    Product.id,
+                    Product.starting_date,
+                    Product.last_date,
+                    Product.promotion_price,
+                    Product.max_item_promo,
+                ).where(
+                    Product.promotion == 1,
+                    Product.promotion_price.is_not(None),
+                )
+            )
+            promo_products = product_result.all()
+
+            schedule_result = await db.execute(
+                select(ProductPromo.product_id, ProductPromo.start_date, ProductPromo.end_date)
+                .where(ProductPromo.end_date >= _utcnow())
+            )
+            schedules = schedule_result.all()
+
+        windows: Dict[int, List[PromoWindow]] = {}
+        by_id = {}
+        for row in promo_products:
+            by_id[row.id] = row
+            if row.starting_date and row.last_date:
+                windows.setdefault(row.id, []).append(PromoWindow(
+                    row.id, row.starting_date, row.last_date,
+                    float(row.promotion_price), row.max_item_promo,
+                ))
+
+        for row in schedules:
+            product = by_id.get(row.product_id)
+            if product is None or not row.start_date or not row.end_date:
+                continue
+            windows.setdefault(row.product_id, []).append(PromoWindow(
+                row.product_id, row.start_date, row.end_date,
+                float(product.promotion_price), product.max_item_promo,
+            ))
+
+        self._windows = windows
+        self.loaded = True
+        self._tick()
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> Dict:
+        return {
+            "loaded": self.loaded,
+            "products": len(self._windows),
+            "active": len(self._active),
+            "next_boundary": self.next_boundary.isoformat() if self.next_boundary else None,
+        }
+
+
+promo_calendar = PromoCalendar()
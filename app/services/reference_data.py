@@ -0,0 +1,116 @@
+from sqlalchemy import select, func
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.database import AsyncSessionLocal
+from app.models.customer import CustomerGroup
+from app.models.transaksi import Unit, Tax
+
+
+class UnitRef(NamedTuple):
+    id: int
+    unit_code: str
+    unit_name: str
+    base_unit: Optional[int]
+    operator: Optional[str]
+    operation_value: Optional[Decimal]
+
+
+class TaxRef(NamedTuple):
+    id: int
+    name: str
+    rate: Decimal
+
+
+class CustomerGroupRef(NamedTuple):
+    id: int
+    name: str
+    percentage: Optional[Decimal]
+
+
+class ReferenceSnapshot(NamedTuple):
+    """Immutable view of the reference tables; replaced as a whole on change"""
+    version: Tuple
+    units: Dict[int, UnitRef]
+    taxes: Dict[int, TaxRef]
+    customer_groups: Dict[int, CustomerGroupRef]
+
+    def unit_name(self, unit_id: Optional[int]) -> Optional[str]:
+        unit = self.units.get(unit_id)
+        return unit.unit_name if unit else None
+
+    def tax_rate(self, tax_id: Optional[int]):
+        """Same as COALESCE(taxes.rate, 0) in the pricing SQL"""
+        tax = self.taxes.get(tax_id)
+        return (tax.rate or 0) if tax else 0
+
+
+def _version_query():
+    """Row count + latest updated_at of each table, in one statement"""
+    return select(
+        select(func.count(Unit.id)).scalar_subquery(),
+        select(func.max(Unit.updated_at)).scalar_subquery(),
+        select(func.count(Tax.id)).scalar_subquery(),
+        select(func.max(Tax.updated_at)).scalar_subquery(),
+        select(func.count(CustomerGroup.id)).scalar_subquery(),
+        select(func.max(CustomerGroup.updated_at)).scalar_subquery(),
+    )
+
+
+class ReferenceData:
+    """
+    Per-worker cache of units, taxes and customer groups.
+
+    These tables change a few times a year, so hot queries read them from
+    ``snapshot`` instead of joining. ``refresh`` runs one cheap version
+    query and reloads only when a count or updated_at moved.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[ReferenceSnapshot] = None
+        self.reloads = 0
+
+    async def _load(self, db, version: Tuple) -> None:
+        unit_result = await db.execute(
+            select(
+                Unit.id, Unit.unit_code, Unit.unit_name,
+                Unit.base_unit, Unit.operator, Unit.operation_value,
+            )
+        )
+        tax_result = await db.execute(select(Tax.id, Tax.name, Tax.rate))
+        group_result = await db.execute(
+            select(CustomerGroup.id, CustomerGroup.name, CustomerGroup.percentage)
+        )
+
+        self.snapshot = ReferenceSnapshot(
+            version=version,
+            units={row.id: UnitRef(*row) for row in unit_result},
+            taxes={row.id: TaxRef(*row) for row in tax_result},
+            customer_groups={row.id: CustomerGroupRef(*row) for row in group_result},
+        )
+        self.reloads += 1
+
+    def seed(self, snapshot: ReferenceSnapshot) -> None:
+        """Start from a prebuilt snapshot (catalog file); refresh keeps it while the version matches"""
+        self.snapshot = snapshot
+
+    async def refresh(self) -> None:
+        """Reload if the version changed (also used for the initial load)"""
+        async with AsyncSessionLocal() as db:
+            version = tuple((await db.execute(_version_query())).one())
+            if self.snapshot is not None and self.snapshot.version == version:
+                return
+            await self._load(db, version)
+
+    def stats(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            "loaded": snapshot is not None,
+            "reloads": self.reloads,
+            "units": len(snapshot.units) if snapshot else 0,
+            "taxes": len(snapshot.taxes) if snapshot else 0,
+            "customer_groups": len(snapshot.customer_groups) if snapshot else 0,
+        }
+
+
+reference_data = ReferenceData()
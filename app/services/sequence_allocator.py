@@ -0,0 +1,82 @@
+from sqlalchemy import text
+from typing import Dict, Tuple
+import asyncio
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+# One statement reserves a block and leaves its end in LAST_INSERT_ID()
+# (per connection), so no SELECT ... FOR UPDATE round trip is needed
+_RESERVE = text("""
+    INSERT INTO sequence_counters (store_id, kind, next_value)
+    VALUES (:store_id, :kind, LAST_INSERT_ID(1 + :block))
+    ON DUPLICATE KEY UPDATE next_value = LAST_INSERT_ID(next_value + :block)
+""")
+_RESERVED_END = text("SELECT LAST_INSERT_ID()")
+
+
+class _Block:
+    __slots__ = ("next", "end", "lock")
+
+    def __init__(self):
+        self.next = 0
+        self.end = 0  # exclusive; next == end means exhausted
+        self.lock = asyncio.Lock()
+
+
+class SequenceAllocator:
+    """
+    Hi/lo allocator for per-store sequence numbers (sale / payment references).
+
+    Each worker reserves a block of ``block_size`` values from
+    ``sequence_counters`` in its own short transaction (a separate session,
+    committed at once, so the reservation never waits on or extends the
+    checkout transaction) and hands values out locally until the block is
+    used up. Blocks never overlap across workers, so values are unique;
+    they are increasing per worker but not gap-free (an unfinished block
+    is lost on restart).
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._blocks: Dict[Tuple[int, str], _Block] = {}
+        self.allocated = 0
+        self.reservations = 0
+
+    async def _reserve(self, store_id: int, kind: str) -> int:
+        """Reserve the next block; returns its exclusive end"""
+        async with AsyncSessionLocal() as db:
+            params = {"store_id": store_id, "kind": kind, "block": self.block_size}
+            await db.execute(_RESERVE, params)
+            end = (await db.execute(_RESERVED_END)).scalar_one()
+            await db.commit()
+        self.reservations += 1
+        return int(end)
+
+    async def next(self, store_id: int, kind: str) -> int:
+        block = self._blocks.get((store_id, kind))
+        if block is None:
+            block = self._blocks.setdefault((store_id, kind), _Block())
+        if block.next >= block.end:
+            async with block.lock:
+                if block.next >= block.end:  # another task may have refilled it
+                    end = await self._reserve(store_id, kind)
+                    block.next, block.end = end - self.block_size, end
+        value = block.next
+        block.next += 1
+        self.allocated += 1
+        return value
+
+    def stats(self) -> Dict:
+        return {
+            "block_size": self.block_size,
+            "allocated": self.allocated,
+            "reservations": self.reservations,
+            "blocks": {
+                f"{store_id}:{kind}": block.end - block.next
+                for (store_id, kind), block in self._blocks.items()
+            },
+        }
+
+
+sequence_allocator = SequenceAllocator(settings.SEQUENCE_BLOCK_SIZE)
@@ -0,0 +1,151 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, case, func
+from datetime import datetime, timezone
+from typing import Dict, List
+import time
+
+from app.config import settings
+from app.core import money
+from app.database import AsyncSessionLocal
+from app.models.sales import ProductWarehouse
+from app.models.stock_journal import StockJournalEntry
+
+
+def journal_enabled() -> bool:
+    return settings.STOCK_MODE == "journal"
+
+
+def on_hand_qty():
+    """
+    ``product_warehouse.qty`` plus the deltas still pending in the journal
+    (journal mode). One statement, so the compactor folding a batch in
+    between can't make it count that batch twice or not at all.
+    """
+    if not journal_enabled():
+        return ProductWarehouse.qty
+    pending = (
+        select(func.coalesce(func.sum(StockJournalEntry.delta), 0))
+        .where(StockJournalEntry.product_warehouse_id == ProductWarehouse.id)
+        .correlate(ProductWarehouse)
+        .scalar_subquery()
+    )
+    return (ProductWarehouse.qty + pending).label("qty")
+
+
+class StockJournal:
+    """
+    Append-only stock deltas for hot products (``STOCK_MODE=journal``).
+
+    A sale appends one negative delta per ``product_warehouse`` row
+    (``append``, in the sale's transaction) instead of updating the row,
+    so lanes selling the same bestseller don't queue on its row lock.
+    ``compact`` (PeriodicTask entry point) claims a batch of deltas with
+    ``FOR UPDATE SKIP LOCKED``, adds their sums to ``product_warehouse.qty``
+    in one UPDATE and deletes them, in one transaction; several workers
+    may run it at once. Reads use ``on_hand_qty()`` (base + pending).
+
+    Stock is not locked while a sale is built, so product_logs start/end
+    quantities of concurrent sales of one product may overlap; the total
+    is exact. Run ``compact`` until the journal is empty before switching
+    back to ``STOCK_MODE=row``.
+    """
+
+    def __init__(self):
+        self.appended = 0
+        self.folded = 0
+        self.compactions = 0
+        self.pending = None
+        self.last_run_ms = 0.0
+
+    async def append(self, db: AsyncSession, reference_no: str, deltas: Dict[int, int]) -> None:
+        """Add deltas (product_warehouse id -> hundredths) to the current transaction"""
+        if not deltas:
+            return
+        now = datetime.now(timezone.utc)
+        await db.execute(insert(StockJournalEntry.__table__), [
+            {
+                "product_warehouse_id": row_id,
+                "delta": money.to_decimal(delta),
+                "reference_no": reference_no,
+                "created_at": now,
+            }
+            for row_id, delta in deltas.items()
+        ])
+        self.appended += len(deltas)
+
+    async def read(self, db: AsyncSession, product_ids: List[int], warehouse_id: int) -> Dict[int, List[int]]:
+        """product_id -> [row id, on-hand in hundredths] (lowest row id per product)"""
+        result = await db.execute(
+            select(ProductWarehouse.id, ProductWarehouse.product_id, on_hand_qty())
+            .where(
+                ProductWarehouse.warehouse_id == warehouse_id,
+                ProductWarehouse.product_id.in_(product_ids)
+            )
+            .order_by(ProductWarehouse.id)
+        )
+        stock: Dict[int, List[int]] = {}
+        for row in result:
+            stock.setdefault(row.product_id, [row.id, money.to_fixed(row.qty)])
+        return stock
+
+    async def _compact_batch(self) -> int:
+        """Fold one batch into product_warehouse; returns the number of deltas"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StockJournalEntry.id, StockJournalEntry.product_warehouse_id, StockJournalEntry.delta)
+                .order_by(StockJournalEntry.id)
+                .limit(settings.STOCK_COMPACT_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            entries = result.all()
+            if not entries:
+                return 0
+
+            totals: Dict[int, int] = {}
+            for entry in entries:
+                totals[entry.product_warehouse_id] = (
+                    totals.get(entry.product_warehouse_id, 0) + money.to_fixed(entry.delta)
+                )
+            await db.execute(
+                update(ProductWarehouse)
+                .where(ProductWarehouse.id.in_(sorted(totals)))
+                .values(
+                    qty=ProductWarehouse.qty + case(
+                        {row_id: money.to_decimal(total) for row_id, total in totals.items()},
+                        value=ProductWarehouse.id
+                    ),
+                    updated_at=datetime.now(timezone.utc)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(
+                delete(StockJournalEntry)
+                .where(StockJournalEntry.id.in_([entry.id for entry in entries]))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        self.folded += len(entries)
+        return len(entries)
+
+    async def compact(self) -> None:
+        """Fold pending deltas in batches, then refresh the backlog metric"""
+        started = time.perf_counter()
+        while await self._compact_batch() == settings.STOCK_COMPACT_BATCH_SIZE:
+            pass
+        async with AsyncSessionLocal() as db:
+            self.pending = (await db.execute(select(func.count(StockJournalEntry.id)))).scalar_one()
+        self.compactions += 1
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> Dict:
+        return {
+            "mode": settings.STOCK_MODE,
+            "appended": self.appended,
+            "folded": self.folded,
+            "compactions": self.compactions,
+            "pending": self.pending,
+            "last_run_ms": round(self.last_run_ms, 1),
+        }
+
+
+stock_journal = StockJournal()
@@ -0,0 +1,164 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Dict, List, Optional, Tuple
+import time
+
+from app.config import settings
+from app.core import money
+from app.models.sales import ProductWarehouse
+from app.services.product_index import ProductRecord
+from app.services.stock_journal import on_hand_qty
+
+Key = Tuple[int, int]  # (product_id, warehouse_id)
+
+
+class InsufficientStockError(Exception):
+    """Conditional stock decrement matched fewer rows than requested"""
+
+    def __init__(self, product_ids: List[int]):
+        super().__init__(f"Insufficient stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+class _OnHand:
+    __slots__ = ("row_id", "qty", "loaded_at")
+
+    def __init__(self, row_id: int, qty: int):
+        self.row_id = row_id
+        self.qty = qty  # hundredths (money.to_fixed)
+        self.loaded_at = time.monotonic()
+
+
+class StockReservations:
+    """
+    In-memory stock reservation ledger per (product, warehouse).
+
+    Cart add/update/delete set or drop the cart's reservation for a line;
+    ``available = on-hand - reserved`` is reported at scan time so an
+    oversell shows up while the customer is still at the till, not at
+    finalize. On-hand and the ``product_warehouse`` row id are cached for
+    STOCK_ONHAND_TTL_SECONDS; the row id lets finalize decrement stock with
+    one conditional UPDATE and no read first (CheckoutService).
+
+    Reservations of carts idle longer than STOCK_RESERVATION_TTL_SECONDS
+    are dropped by ``expire`` (abandoned carts). The ledger is per worker
+    and only sees carts served by this process; the conditional UPDATE at
+    finalize is the guard across workers.
+    """
+
+    def __init__(self):
+        # transaksi_id -> barcode -> (product_id, warehouse_id, qty in hundredths)
+        self._carts: Dict[int, Dict[str, Tuple[int, int, int]]] = {}
+        self._touched: Dict[int, float] = {}
+        self._reserved: Dict[Key, int] = {}
+        self._on_hand: Dict[Key, _OnHand] = {}
+        self.expired = 0
+        self.onhand_loads = 0
+
+    async def _load_on_hand(self, db: AsyncSession, key: Key) -> Optional[_OnHand]:
+        entry = self._on_hand.get(key)
+        if entry is not None and time.monotonic() - entry.loaded_at < settings.STOCK_ONHAND_TTL_SECONDS:
+            return entry
+
+        # Same row create_product_sales decrements: lowest id per product/warehouse
+        result = await db.execute(
+            select(ProductWarehouse.id, on_hand_qty())
+            .where(ProductWarehouse.product_id == key[0], ProductWarehouse.warehouse_id == key[1])
+            .order_by(ProductWarehouse.id)
+            .limit(1)
+        )
+        row = result.first()
+        self.onhand_loads += 1
+        if row is None:
+            self._on_hand.pop(key, None)
+            return None
+        entry = self._on_hand[key] = _OnHand(row.id, money.to_fixed(row.qty))
+        return entry
+
+    def _adjust(self, key: Key, delta: int) -> None:
+        reserved = self._reserved.get(key, 0) + delta
+        if reserved:
+            self._reserved[key] = reserved
+        else:
+            self._reserved.pop(key, None)
+
+    async def hold(
+        self,
+        db: AsyncSession,
+        transaksi_id: int,
+        product: ProductRecord,
+        warehouse_id: int,
+        qty: float
+    ) -> Optional[float]:
+        """
+        Set the cart's reservation for a line to ``qty``.
+
+        Returns:
+            Stock still available after all reservations, or None when the
+            product has no stock row in this warehouse
+        """
+        lines = self._carts.setdefault(transaksi_id, {})
+        self._touched[transaksi_id] = time.monotonic()
+        old = lines.get(product.barcode)
+        if old is not None:
+            self._adjust(old[:2], -old[2])
+
+        key = (product.id, warehouse_id)
+        held = money.to_fixed(qty)
+        lines[product.barcode] = (product.id, warehouse_id, held)
+        self._adjust(key, held)
+
+        on_hand = await self._load_on_hand(db, key)
+        if on_hand is None:
+            return None
+        return money.from_sen(on_hand.qty - self._reserved.get(key, 0))
+
+    def release(self, transaksi_id: int, barcode: str) -> None:
+        line = self._carts.get(transaksi_id, {}).pop(barcode, None)
+        if line is not None:
+            self._adjust(line[:2], -line[2])
+
+    def release_cart(self, transaksi_id: int) -> None:
+        for product_id, warehouse_id, held in self._carts.pop(transaksi_id, {}).values():
+            self._adjust((product_id, warehouse_id), -held)
+        self._touched.pop(transaksi_id, None)
+
+    def row_id(self, product_id: int, warehouse_id: int) -> Optional[int]:
+        entry = self._on_hand.get((product_id, warehouse_id))
+        return entry.row_id if entry is not None else None
+
+    def observe(self, product_id: int, warehouse_id: int, row_id: int, qty: int) -> None:
+        """Record on-hand (hundredths) read at finalize"""
+        self._on_hand[(product_id, warehouse_id)] = _OnHand(row_id, qty)
+
+    async def availability(self, db: AsyncSession, product_id: int, warehouse_id: int) -> Optional[Dict]:
+        key = (product_id, warehouse_id)
+        on_hand = await self._load_on_hand(db, key)
+        if on_hand is None:
+            return None
+        reserved = self._reserved.get(key, 0)
+        return {
+            "on_hand": money.from_sen(on_hand.qty),
+            "reserved": money.from_sen(reserved),
+            "available": money.from_sen(on_hand.qty - reserved),
+        }
+
+    async def expire(self) -> None:
+        """Drop reservations of idle carts (PeriodicTask entry point)"""
+        cutoff = time.monotonic() - settings.STOCK_RESERVATION_TTL_SECONDS
+        for transaksi_id in [t for t, touched in self._touched.items() if touched < cutoff]:
+            if self._carts.get(transaksi_id):
+                self.expired += 1
+            self.release_cart(transaksi_id)
+
+    def stats(self) -> Dict:
+        return {
+            "carts": len(self._carts),
+            "reserved_products": len(self._reserved),
+            "on_hand_cached": len(self._on_hand),
+            "on_hand_loads": self.onhand_loads,
+            "expired_carts": self.expired,
+        }
+
+
+stock_reservations = StockReservations()
@@ -0,0 +1,203 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.token import RevokedToken
+from app.models.user import User
+
+
+def _to_timestamp(value: datetime) -> float:
+    """DB datetimes are stored as naive UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TokenDenylist:
+    """
+    Compact in-memory view of revoked tokens.
+
+    Checked on every request, so lookups are plain dict/set operations.
+    The authoritative copy lives in ``token_revocations`` and is re-read
+    periodically by ``TokenService.sync_denylist``; local revocations are
+    applied immediately so logout takes effect on this worker at once.
+
+    ``user_claims`` mirrors the users columns copied into access tokens
+    (store, warehouse, biller, role); it is read incrementally from
+    ``users.updated_at`` and a change revokes the user's older tokens.
+    """
+
+    def __init__(self):
+        self.jtis: Dict[str, float] = {}  # jti -> token exp
+        self.users: Dict[int, float] = {}  # user_id -> tokens issued before are revoked
+        self.inactive_users: Set[int] = set()  # deactivated or deleted users
+        self.user_claims: Dict[int, Tuple] = {}  # user_id -> (store, warehouse, biller, role)
+        self.users_watermark: Optional[datetime] = None  # max users.updated_at seen
+        self.last_sync: float = 0.0
+
+    def is_revoked(self, payload: Dict) -> bool:
+        """Check decoded token claims against the denylist"""
+        jti = payload.get("jti")
+        if jti is not None and jti in self.jtis:
+            return True
+
+        try:
+            user_id = int(payload.get("sub"))
+        except (TypeError, ValueError):
+            return False
+
+        if user_id in self.inactive_users:
+            return True
+
+        revoked_before = self.users.get(user_id)
+        if revoked_before is not None and payload.get("iat", 0) <= revoked_before:
+            return True
+
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            "revoked_tokens": len(self.jtis),
+            "revoked_users": len(self.users),
+            "inactive_users": len(self.inactive_users),
+            "known_users": len(self.user_claims),
+            "last_sync": self.last_sync,
+        }
+
+
+token_denylist = TokenDenylist()
+
+
+class TokenService:
+    """Service untuk token revocation (logout / revoke semua sesi user)"""
+
+    @staticmethod
+    async def revoke_token(db: AsyncSession, payload: Dict) -> None:
+        """
+        Revoke a single token by its jti.
+
+        Args:
+            db: Database session
+            payload: Decoded token claims
+        """
+        jti = payload.get("jti")
+        exp = payload.get("exp")
+        if not jti or not exp:
+            return
+
+        db.add(RevokedToken(
+            jti=jti,
+            user_id=int(payload["sub"]),
+            expires_at=datetime.fromtimestamp(exp, timezone.utc),
+            created_at=datetime.now(timezone.utc),
+        ))
+        await db.commit()
+
+        token_denylist.jtis[jti] = float(exp)
+
+    @staticmethod
+    async def revoke_user_tokens(db: AsyncSession, user_id: int, expires_at: datetime) -> None:
+        """
+        Revoke every token issued to a user up to now.
+
+        Args:
+            db: Database session
+            user_id: User ID
+            expires_at: When the entry can be purged (latest token expiry)
+        """
+        now = datetime.now(timezone.utc)
+        db.add(RevokedToken(
+            user_id=user_id,
+            expires_at=expires_at,
+            created_at=now,
+        ))
+        await db.commit()
+
+        token_denylist.users[user_id] = now.timestamp()
+
+    @staticmethod
+    async def sync_denylist() -> None:
+        """
+        Reload the denylist from token_revocations, purge expired rows and
+        apply users changed since the last sync (deactivated, or moved to
+        another store / role: their earlier tokens are revoked)
+        """
+        now = datetime.now(timezone.utc)
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at < now)
+            )
+            await db.commit()
+
+            result = await db.execute(
+                select(
+                    RevokedToken.jti,
+                    RevokedToken.user_id,
+                    RevokedToken.expires_at,
+                    RevokedToken.created_at,
+                )
+            )
+            rows = result.all()
+
+            # Only users changed since the last sync (all of them on the first)
+            query = select(
+                User.id, User.is_active, User.is_deleted, User.store_id,
+                User.warehouse_id, User.biller_id, User.role_id, User.updated_at,
+            )
+            watermark = token_denylist.users_watermark
+            if watermark is not None:
+                query = query.where(User.updated_at >= watermark)  # same-second updates
+            changed_users = (await db.execute(query)).all()
+
+            inactive_users = set(token_denylist.inactive_users)
+            moved = []  # users whose store / role changed: their tokens carry old claims
+            for user in changed_users:
+                if not user.is_active or user.is_deleted:
+                    inactive_users.add(user.id)
+                else:
+                    inactive_users.discard(user.id)
+                claims = (user.store_id, user.warehouse_id, user.biller_id, user.role_id)
+                previous = token_denylist.user_claims.get(user.id)
+                if previous is not None and previous != claims:
+                    moved.append(user.id)
+                token_denylist.user_claims[user.id] = claims
+                if user.updated_at is not None and (watermark is None or user.updated_at > watermark):
+                    watermark = user.updated_at
+            token_denylist.users_watermark = watermark
+
+            if moved:
+                expires_at = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+                for user_id in moved:
+                    db.add(RevokedToken(user_id=user_id, expires_at=expires_at, created_at=now))
+                await db.commit()
+
+        jtis: Dict[str, float] = {}
+        users: Dict[int, float] = {}
+        for row in rows:
+            if row.jti:
+                jtis[row.jti] = _to_timestamp(row.expires_at)
+            elif row.user_id is not None and row.created_at is not None:
+                revoked_before = _to_timestamp(row.created_at)
+                users[row.user_id] = max(users.get(row.user_id, 0.0), revoked_before)
+
+        # Keep local revocations the snapshot may have raced with
+        now_ts = now.timestamp()
+        for jti, exp in token_denylist.jtis.items():
+            if exp > now_ts:
+                jtis.setdefault(jti, exp)
+        oldest_live_token = now_ts - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for user_id, revoked_before in token_denylist.users.items():
+            if revoked_before > oldest_live_token:
+                users[user_id] = max(users.get(user_id, 0.0), revoked_before)
+        for user_id in moved:
+            users[user_id] = max(users.get(user_id, 0.0), now_ts)
+
+        # Swap in new views atomically (readers never see a partial state)
+        token_denylist.jtis = jtis
+        token_denylist.users = users
+        token_denylist.inactive_users = inactive_users
+        token_denylist.last_sync = now.timestamp()
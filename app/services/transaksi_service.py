@@ -1,9 +1,18 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import select, text, insert, update, and_, func
 from datetime import datetime, timezone
-from typing import Optional, Tuple, Dict, List
-from app.models.transaksi import Transaksi, TransaksiDetail, Product
+from typing import Optional, Tuple, Dict, List, Union
+from app.models.transaksi import Transaksi, TransaksiDetail, Product, ProductPrice
 from app.models.customer import Customer
+from app.config import settings
+from app.core import money
+from app.services.product_index import ProductRecord, PRODUCT_RECORD_COLUMNS, product_index
+from app.services.product_search import product_search
+from app.services.price_cache import PriceTiers, price_cache, build_harga_row
+from app.services.reference_data import reference_data
+from app.services.promo_calendar import PromoCalendar, PromoWindow, promo_calendar
+from app.services.cart_versions import cart_versions, deltas_enabled
+from app.services.cart_engine import CartLine, cart_engine
 
 
 class TransaksiService:
@@ -63,18 +72,688 @@ class TransaksiService:
         db: AsyncSession,
         barcode: str,
         store_id: int
-    ) -> Optional[Product]:
+    ) -> Optional[ProductRecord]:
         """
         Get product by barcode or code
         Sama seperti Laravel: getproduct($store_id, $barcode)
+        
+        Dilayani dari product_index (in-memory); kalau tidak ketemu,
+        fallback ke database dan hasilnya dimasukkan ke index.
         """
+        if settings.PRODUCT_INDEX_ENABLED:
+            record = product_index.lookup(store_id, barcode)
+            if record is not None:
+                return record
+        
         result = await db.execute(
             select(Product).where(
                 Product.store_id == store_id,
                 ((Product.barcode == barcode) | (Product.code == barcode))
             )
         )
-        return result.scalar_one_or_none()
+        product = result.scalar_one_or_none()
+        if product is None:
+            return None
+        
+        record = ProductRecord.from_row(product)
+        if settings.PRODUCT_INDEX_ENABLED:
+            product_index.put(record)
+        return record
+    
+    @staticmethod
+    async def get_product_record(
+        db: AsyncSession,
+        product_id: int
+    ) -> Optional[ProductRecord]:
+        """Get product by ID, dari product_index kalau ada"""
+        if settings.PRODUCT_INDEX_ENABLED:
+            record = product_index.get(product_id)
+            if record is not None:
+                return record
+        
+        result = await db.execute(
+            select(*PRODUCT_RECORD_COLUMNS).where(Product.id == product_id)
+        )
+        row = result.first()
+        return ProductRecord.from_row(row) if row else None
+    
+    @staticmethod
+    async def search_products(
+        db: AsyncSession,
+        store_id: int,
+        query: str,
+        limit: int
+    ) -> Tuple[List[ProductRecord], str]:
+        """
+        Cari product berdasarkan nama, nama label atau kode
+        (untuk label yang tidak bisa di-scan).
+        
+        Dilayani dari product_search (in-memory); selama index belum siap
+        atau dimatikan, fallback ke LIKE di database.
+        
+        Returns:
+            Tuple of (products, source) - source "index" atau "database"
+        """
+        if settings.PRODUCT_SEARCH_ENABLED and product_search.ready:
+            return product_search.search(store_id, query, limit), "index"
+        
+        pattern = f"%{query.strip()}%"
+        result = await db.execute(
+            select(*PRODUCT_RECORD_COLUMNS).where(
+                Product.store_id == store_id,
+                (Product.name.like(pattern) | Product.name_lbl.like(pattern) | Product.code.like(pattern))
+            ).order_by(func.length(Product.name), Product.name).limit(limit)
+        )
+        return [ProductRecord.from_row(row) for row in result], "database"
+    
+    @staticmethod
+    async def resolve_scan(
+        db: AsyncSession,
+        transaksi_id: int,
+        barcode: str,
+        store_id: int
+    ) -> Tuple[Optional[ProductRecord], Optional[Tuple[int, float]]]:
+        """
+        Resolve product dan baris cart yang sudah ada dalam satu query.
+        
+        Kalau product ada di product_index cukup baca baris cart; kalau
+        tidak, product dan baris cart di-resolve sekaligus lewat LEFT JOIN.
+        
+        Returns:
+            (product, (no, jumlah) baris cart yang sudah ada atau None)
+        """
+        product = product_index.lookup(store_id, barcode) if settings.PRODUCT_INDEX_ENABLED else None
+        
+        if product is not None:
+            result = await db.execute(
+                select(TransaksiDetail.no, TransaksiDetail.jumlah).where(
+                    TransaksiDetail.transaksi_id == transaksi_id,
+                    TransaksiDetail.barcode == product.barcode
+                )
+            )
+            line = result.first()
+            return product, (tuple(line) if line else None)
+        
+        result = await db.execute(
+            select(*PRODUCT_RECORD_COLUMNS, TransaksiDetail.no, TransaksiDetail.jumlah)
+            .outerjoin(
+                TransaksiDetail,
+                and_(
+                    TransaksiDetail.transaksi_id == transaksi_id,
+                    TransaksiDetail.barcode == Product.barcode
+                )
+            )
+            .where(
+                Product.store_id == store_id,
+                ((Product.barcode == barcode) | (Product.code == barcode))
+            )
+            # Barcode match wins over a code match, like product_index
+            .order_by((Product.barcode == barcode).desc(), Product.id)
+            .limit(1)
+        )
+        row = result.first()
+        if row is None:
+            return None, None
+        
+        product = ProductRecord.from_row(row)
+        if settings.PRODUCT_INDEX_ENABLED:
+            product_index.put(product)
+        return product, ((row.no, row.jumlah) if row.no is not None else None)
+    
+    @staticmethod
+    async def scan_product(
+        db: AsyncSession,
+        transaksi_id: int,
+        barcode: str,
+        qty: float,
+        cust_group: int,
+        warehouse_id: int,
+        store_id: int
+    ) -> Tuple[Optional[ProductRecord], float, Optional[str]]:
+        """
+        Tambah product ke cart (scan barcode) dengan round trip minimal:
+        1 query resolve product + baris cart, harga dari price_cache,
+        lalu 1 statement INSERT atau UPDATE per primary key.
+        
+        Tidak commit; caller yang commit. Dengan cart engine, baris cart
+        diubah di memory (tanpa query ke transaksi_detail).
+        
+        Returns:
+            (product, jumlah baris cart setelah scan, pesan error atau None)
+        """
+        if settings.CART_ENGINE_ENABLED:
+            product = await TransaksiService.get_product_by_barcode(db, barcode, store_id)
+            if product is None:
+                return None, 0, "Product not found"
+            
+            async with cart_engine.locked(db, transaksi_id) as cart:
+                line = cart.lines.get(product.barcode)
+                new_qty = line.jumlah + qty if line else qty
+                error = await TransaksiService._set_engine_line(
+                    db, cart, product, new_qty, cust_group, warehouse_id
+                )
+            return product, new_qty, error
+        
+        product, existing = await TransaksiService.resolve_scan(
+            db, transaksi_id, barcode, store_id
+        )
+        if product is None:
+            return None, 0, "Product not found"
+        
+        # Harga dihitung dari qty akhir (harga bisa berubah berdasarkan qty)
+        new_qty = float(existing[1]) + qty if existing else qty
+        
+        harga_data = await TransaksiService.get_harga(
+            db=db,
+            product_id=product.id,
+            qty=new_qty,
+            cust_group=cust_group,
+            warehouse_id=warehouse_id
+        )
+        if not harga_data:
+            return product, new_qty, "Harga belum disetting"
+        
+        calculation = TransaksiService.calculate_price(
+            harga_data=harga_data,
+            qty=new_qty,
+            cust_group=cust_group
+        )
+        
+        values = TransaksiService._line_values(calculation, new_qty)
+        
+        if existing:
+            await db.execute(
+                update(TransaksiDetail)
+                .where(TransaksiDetail.no == existing[0])
+                .values(**values)
+            )
+        else:
+            await db.execute(
+                insert(TransaksiDetail).values(
+                    transaksi_id=transaksi_id,
+                    barcode=product.barcode,
+                    **TransaksiService._new_line_values(product, harga_data),
+                    **values
+                )
+            )
+        
+        return product, new_qty, None
+    
+    @staticmethod
+    def _line_values(calculation: Dict, qty: float) -> Dict:
+        """Kolom transaksi_detail yang dihitung ulang setiap qty berubah"""
+        return {
+            "jumlah": qty,
+            "harga": calculation['harganet'],
+            "tax": calculation['pajak'],
+            "total": calculation['total_harga'],
+            "profit": calculation['profit'],
+            "tax_rate": calculation['tax_rate'],
+        }
+    
+    @staticmethod
+    def _new_line_values(product: ProductRecord, harga_data: Dict) -> Dict:
+        """Kolom transaksi_detail yang hanya di-set saat baris dibuat"""
+        return {
+            "nama": product.name,
+            "product_id": product.id,
+            "unit": harga_data['unit_name'],
+            "unit_id": harga_data['unit_id'],
+            "diskon": 0,
+            "is_point": product.is_point or 0,
+        }
+    
+    @staticmethod
+    async def _set_engine_line(
+        db: AsyncSession,
+        cart,
+        product: ProductRecord,
+        new_qty: float,
+        cust_group: int,
+        warehouse_id: int,
+        harga_data: Optional[Dict] = None
+    ) -> Optional[str]:
+        """
+        Hitung harga untuk qty baru dan tulis ke baris cart engine.
+        Dipanggil sambil memegang lock cart.
+        
+        Returns:
+            Pesan error atau None
+        """
+        if harga_data is None:
+            harga_data = await TransaksiService.get_harga(
+                db=db,
+                product_id=product.id,
+                qty=new_qty,
+                cust_group=cust_group,
+                warehouse_id=warehouse_id
+            )
+        if not harga_data:
+            return "Harga belum disetting"
+        
+        calculation = TransaksiService.calculate_price(
+            harga_data=harga_data,
+            qty=new_qty,
+            cust_group=cust_group
+        )
+        values = TransaksiService._line_values(calculation, new_qty)
+        if product.barcode not in cart.lines:
+            values.update(TransaksiService._new_line_values(product, harga_data))
+        cart_engine.upsert_line(cart, product.barcode, values)
+        return None
+    
+    @staticmethod
+    async def update_cart_item(
+        db: AsyncSession,
+        transaksi_id: int,
+        barcode: str,
+        qty: float,
+        cust_group: int,
+        warehouse_id: int,
+        store_id: int
+    ) -> Tuple[Optional[ProductRecord], Optional[str]]:
+        """
+        Set quantity baris cart dan recalculate harga (harga bisa beda
+        berdasarkan qty). Tidak commit.
+        
+        Returns:
+            (product, pesan error atau None)
+        """
+        existing_item = await TransaksiService.get_cart_item(db, transaksi_id, barcode)
+        if not existing_item:
+            return None, "Product not found in cart"
+        
+        product = await TransaksiService.get_product_by_barcode(db, barcode, store_id)
+        if not product:
+            return None, "Product not found"
+        
+        if settings.CART_ENGINE_ENABLED:
+            async with cart_engine.locked(db, transaksi_id) as cart:
+                if product.barcode not in cart.lines:
+                    return None, "Product not found in cart"
+                error = await TransaksiService._set_engine_line(
+                    db, cart, product, qty, cust_group, warehouse_id
+                )
+            return product, error
+        
+        harga_data = await TransaksiService.get_harga(
+            db=db,
+            product_id=product.id,
+            qty=qty,
+            cust_group=cust_group,
+            warehouse_id=warehouse_id
+        )
+        if not harga_data:
+            return product, "Harga belum disetting"
+        
+        calculation = TransaksiService.calculate_price(
+            harga_data=harga_data,
+            qty=qty,
+            cust_group=cust_group
+        )
+        for name, value in TransaksiService._line_values(calculation, qty).items():
+            setattr(existing_item, name, value)
+        
+        return product, None
+    
+    @staticmethod
+    async def remove_cart_item(
+        db: AsyncSession,
+        transaksi_id: int,
+        barcode: str
+    ) -> bool:
+        """
+        Hapus baris cart. Tidak commit.
+        
+        Returns:
+            False kalau barcode tidak ada di cart
+        """
+        if settings.CART_ENGINE_ENABLED:
+            async with cart_engine.locked(db, transaksi_id) as cart:
+                return cart_engine.remove_line(cart, barcode)
+        
+        item = await TransaksiService.get_cart_item(db, transaksi_id, barcode)
+        if not item:
+            return False
+        await db.delete(item)
+        return True
+    
+    @staticmethod
+    async def get_product_records(
+        db: AsyncSession,
+        product_ids: List[int]
+    ) -> Dict[int, ProductRecord]:
+        """Batch get_product_record: index dulu, sisanya satu query"""
+        found: Dict[int, ProductRecord] = {}
+        missing: List[int] = []
+        for product_id in product_ids:
+            record = product_index.get(product_id) if settings.PRODUCT_INDEX_ENABLED else None
+            if record is not None:
+                found[product_id] = record
+            else:
+                missing.append(product_id)
+        
+        if missing:
+            result = await db.execute(
+                select(*PRODUCT_RECORD_COLUMNS).where(Product.id.in_(missing))
+            )
+            for row in result:
+                found[row.id] = ProductRecord.from_row(row)
+        
+        return found
+    
+    @staticmethod
+    async def reprice_cart(
+        db: AsyncSession,
+        transaksi_id: int,
+        cust_group: int,
+        warehouse_id: int
+    ) -> Tuple[List[str], List[Dict]]:
+        """
+        Hitung ulang harga semua baris cart (ganti customer group / tier).
+        
+        Product dan tier semua baris di-load sekaligus (get_harga_batch),
+        harga dihitung per kolom dengan calculate_prices, lalu baris yang
+        berubah ditulis dengan satu executemany UPDATE (atau ke cart engine).
+        Baris yang tidak punya harga dibiarkan. Tidak commit.
+        
+        Returns:
+            (barcode yang berubah, list error per barcode)
+        """
+        if settings.CART_ENGINE_ENABLED:
+            async with cart_engine.locked(db, transaksi_id) as cart:
+                return await TransaksiService._reprice_lines(
+                    db, list(cart.lines.values()), cust_group, warehouse_id, cart
+                )
+        
+        items = await TransaksiService.get_all_cart_items(db, transaksi_id)
+        return await TransaksiService._reprice_lines(db, items, cust_group, warehouse_id)
+    
+    @staticmethod
+    async def _reprice_lines(
+        db: AsyncSession,
+        items: List,
+        cust_group: int,
+        warehouse_id: int,
+        cart=None
+    ) -> Tuple[List[str], List[Dict]]:
+        errors: List[Dict] = []
+        if not items:
+            return [], errors
+        
+        products = await TransaksiService.get_product_records(
+            db, list({item.product_id for item in items})
+        )
+        priced = []
+        for item in items:
+            product = products.get(item.product_id)
+            if product is None:
+                errors.append({"barcode": item.barcode, "msg": "Product not found"})
+            else:
+                priced.append((item, product))
+        
+        harga = await TransaksiService.get_harga_batch(
+            db, [(product, float(item.jumlah)) for item, product in priced], cust_group, warehouse_id
+        )
+        lines = []
+        for item, product in priced:
+            if product.id in harga:
+                lines.append((item, harga[product.id]))
+            else:
+                errors.append({"barcode": item.barcode, "msg": "Harga belum disetting"})
+        if not lines:
+            return [], errors
+        
+        columns = TransaksiService.calculate_prices(
+            [harga_data for _, harga_data in lines],
+            [float(item.jumlah) for item, _ in lines],
+            cust_group
+        )
+        
+        changed: List[str] = []
+        updates: List[Dict] = []
+        for i, (item, _) in enumerate(lines):
+            values = TransaksiService._line_values(
+                {name: column[i] for name, column in columns.items()}, float(item.jumlah)
+            )
+            if all(float(getattr(item, name) or 0) == float(value) for name, value in values.items()):
+                continue
+            changed.append(item.barcode)
+            if cart is not None:
+                cart_engine.upsert_line(cart, item.barcode, values)
+            else:
+                updates.append({"no": item.no, **values})
+        
+        if updates:
+            await db.execute(update(TransaksiDetail), updates)
+        
+        return changed, errors
+    
+    @staticmethod
+    async def get_products_by_barcodes(
+        db: AsyncSession,
+        barcodes: List[str],
+        store_id: int
+    ) -> Dict[str, ProductRecord]:
+        """
+        Batch get_product_by_barcode: index dulu, sisanya satu query.
+        
+        Returns:
+            Dict barcode/code yang diminta -> product (yang tidak ketemu tidak ada)
+        """
+        found: Dict[str, ProductRecord] = {}
+        missing: List[str] = []
+        for barcode in barcodes:
+            record = product_index.lookup(store_id, barcode) if settings.PRODUCT_INDEX_ENABLED else None
+            if record is not None:
+                found[barcode] = record
+            else:
+                missing.append(barcode)
+        
+        if missing:
+            result = await db.execute(
+                select(*PRODUCT_RECORD_COLUMNS).where(
+                    Product.store_id == store_id,
+                    (Product.barcode.in_(missing) | Product.code.in_(missing))
+                )
+            )
+            by_barcode: Dict[str, ProductRecord] = {}
+            by_code: Dict[str, ProductRecord] = {}
+            for row in result:
+                record = ProductRecord.from_row(row)
+                by_barcode[record.barcode] = record
+                if record.code:
+                    by_code[record.code] = record
+                if settings.PRODUCT_INDEX_ENABLED:
+                    product_index.put(record)
+            
+            for barcode in missing:
+                record = by_barcode.get(barcode) or by_code.get(barcode)
+                if record is not None:
+                    found[barcode] = record
+        
+        return found
+    
+    @staticmethod
+    async def get_harga_batch(
+        db: AsyncSession,
+        products: List[Tuple[ProductRecord, float]],
+        cust_group: int,
+        warehouse_id: int
+    ) -> Dict[int, Dict]:
+        """
+        Batch get_harga untuk banyak (product, qty).
+        
+        Dari price_cache dulu; sisanya semua tier di-load dengan satu query
+        (butuh reference_data), kalau tidak bisa fallback ke get_harga.
+        
+        Returns:
+            Dict product_id -> harga_data (product tanpa harga tidak ada)
+        """
+        harga: Dict[int, Dict] = {}
+        missing: List[Tuple[ProductRecord, float]] = []
+        for product, qty in products:
+            data = price_cache.get_harga(product.id, abs(qty), cust_group, warehouse_id) \
+                if settings.PRICE_CACHE_ENABLED else None
+            if data is not None:
+                harga[product.id] = data
+            else:
+                missing.append((product, qty))
+        
+        if not missing:
+            return harga
+        
+        reference = reference_data.snapshot if settings.REFERENCE_DATA_ENABLED else None
+        if reference is None:
+            for product, qty in missing:
+                data = await TransaksiService.get_harga(db, product.id, qty, cust_group, warehouse_id)
+                if data:
+                    harga[product.id] = data
+            return harga
+        
+        tiers: Dict[int, PriceTiers] = {}
+        if cust_group == 1:
+            result = await db.execute(
+                select(ProductPrice.product_id, ProductPrice.minimal, ProductPrice.harga).where(
+                    ProductPrice.warehouse_id == warehouse_id,
+                    ProductPrice.product_id.in_([product.id for product, _ in missing])
+                )
+            )
+            grouped: Dict[int, List] = {}
+            for row in result:
+                grouped.setdefault(row.product_id, []).append((row.minimal, row.harga))
+            tiers = {product_id: PriceTiers(rows) for product_id, rows in grouped.items()}
+        
+        for product, qty in missing:
+            if cust_group == 1:
+                product_tiers = tiers.get(product.id)
+                price = product_tiers.price_for(abs(qty)) if product_tiers else None
+                if price is None:
+                    continue
+            else:
+                price = product.cost
+            harga[product.id] = build_harga_row(
+                product,
+                reference.unit_name(product.sale_unit_id),
+                reference.tax_rate(product.tax_id),
+                price,
+                cust_group
+            )
+        
+        return harga
+    
+    @staticmethod
+    async def scan_products(
+        db: AsyncSession,
+        transaksi_id: int,
+        items: List[Tuple[str, float]],
+        cust_group: int,
+        warehouse_id: int,
+        store_id: int
+    ) -> Tuple[List[Tuple[ProductRecord, float]], List[Dict]]:
+        """
+        Batch scan_product untuk scanner yang buffer / terminal offline.
+        
+        Product dan harga di-resolve sekaligus, barcode duplikat digabung,
+        baris baru di-insert dengan satu multi-row INSERT dan baris lama
+        di-update dengan satu executemany UPDATE. Tidak commit.
+        
+        Args:
+            items: List (barcode, qty)
+        
+        Returns:
+            (list (product, jumlah baris cart) yang berhasil, list error per barcode)
+        """
+        errors: List[Dict] = []
+        
+        products = await TransaksiService.get_products_by_barcodes(
+            db, list(dict.fromkeys(barcode for barcode, _ in items)), store_id
+        )
+        
+        # Gabungkan scan dengan product yang sama (barcode atau code)
+        merged: Dict[int, List] = {}
+        for barcode, qty in items:
+            product = products.get(barcode)
+            if product is None:
+                errors.append({"barcode": barcode, "msg": "Product not found"})
+                continue
+            if product.id in merged:
+                merged[product.id][1] += qty
+            else:
+                merged[product.id] = [product, qty]
+        
+        if not merged:
+            return [], errors
+        
+        if settings.CART_ENGINE_ENABLED:
+            scanned: List[Tuple[ProductRecord, float]] = []
+            async with cart_engine.locked(db, transaksi_id) as cart:
+                lines = []
+                for product, qty in merged.values():
+                    line = cart.lines.get(product.barcode)
+                    lines.append((product, line.jumlah + qty if line else qty))
+                
+                harga = await TransaksiService.get_harga_batch(db, lines, cust_group, warehouse_id)
+                for product, new_qty in lines:
+                    error = await TransaksiService._set_engine_line(
+                        db, cart, product, new_qty, cust_group, warehouse_id,
+                        harga_data=harga.get(product.id) or {}
+                    )
+                    if error:
+                        errors.append({"barcode": product.barcode, "msg": error})
+                    else:
+                        scanned.append((product, new_qty))
+            return scanned, errors
+        
+        result = await db.execute(
+            select(TransaksiDetail.no, TransaksiDetail.barcode, TransaksiDetail.jumlah).where(
+                TransaksiDetail.transaksi_id == transaksi_id,
+                TransaksiDetail.barcode.in_([product.barcode for product, _ in merged.values()])
+            )
+        )
+        existing = {row.barcode: (row.no, row.jumlah) for row in result}
+        
+        lines: List[Tuple[ProductRecord, float]] = []
+        for product, qty in merged.values():
+            line = existing.get(product.barcode)
+            lines.append((product, float(line[1]) + qty if line else qty))
+        
+        harga = await TransaksiService.get_harga_batch(db, lines, cust_group, warehouse_id)
+        
+        inserts: List[Dict] = []
+        updates: List[Dict] = []
+        scanned: List[Tuple[ProductRecord, float]] = []
+        for product, new_qty in lines:
+            harga_data = harga.get(product.id)
+            if not harga_data:
+                errors.append({"barcode": product.barcode, "msg": "Harga belum disetting"})
+                continue
+            
+            calculation = TransaksiService.calculate_price(
+                harga_data=harga_data,
+                qty=new_qty,
+                cust_group=cust_group
+            )
+            values = TransaksiService._line_values(calculation, new_qty)
+            
+            line = existing.get(product.barcode)
+            if line:
+                updates.append({"no": line[0], **values})
+            else:
+                inserts.append({
+                    "transaksi_id": transaksi_id,
+                    "barcode": product.barcode,
+                    **TransaksiService._new_line_values(product, harga_data),
+                    **values
+                })
+            scanned.append((product, new_qty))
+        
+        if inserts:
+            await db.execute(insert(TransaksiDetail), inserts)
+        if updates:
+            await db.execute(update(TransaksiDetail), updates)
+        
+        return scanned, errors
     
     @staticmethod
     async def get_harga(
@@ -87,9 +766,46 @@ class TransaksiService:
         """
         Get harga product berdasarkan qty dan customer group
         Sama seperti Laravel: GetHarga($product_id, $qty, $cust_group, $warehouse_id)
+        
+        Dilayani dari price_cache kalau tersedia. Fallback: kalau
+        reference_data sudah di-load, query tanpa join units/taxes; kalau
+        belum, SQL asli di bawah (referensi hasil yang harus sama persis).
         """
         qty = abs(qty)
         
+        if settings.PRICE_CACHE_ENABLED:
+            harga_data = price_cache.get_harga(product_id, qty, cust_group, warehouse_id)
+            if harga_data is not None:
+                return harga_data
+        
+        reference = reference_data.snapshot if settings.REFERENCE_DATA_ENABLED else None
+        if reference is not None:
+            product = await TransaksiService.get_product_record(db, product_id)
+            if product is None:
+                return None
+            
+            if cust_group == 1:  # Umum (retail) - pakai product_prices
+                result = await db.execute(
+                    select(func.min(ProductPrice.harga)).where(
+                        ProductPrice.product_id == product_id,
+                        ProductPrice.warehouse_id == warehouse_id,
+                        ProductPrice.minimal <= qty
+                    )
+                )
+                price = result.scalar()
+                if price is None:
+                    return None
+            else:  # Cabang/Gudang (2/3) - pakai cost
+                price = product.cost
+            
+            return build_harga_row(
+                product,
+                reference.unit_name(product.sale_unit_id),
+                reference.tax_rate(product.tax_id),
+                price,
+                cust_group
+            )
+        
         if cust_group == 1:  # Umum (retail) - pakai product_prices
             query = text("""
                 SELECT T1.*, MIN(pp.harga) as price 
@@ -126,7 +842,10 @@ class TransaksiService:
             result = await db.execute(query, {"product_id": product_id})
         
         row = result.first()
-        return dict(row._mapping) if row else None
+        if not row or row.price is None:
+            # MIN() tanpa tier yang cocok tetap menghasilkan 1 row berisi NULL
+            return None
+        return dict(row._mapping)
     
     @staticmethod
     def calculate_price(
@@ -137,36 +856,62 @@ class TransaksiService:
         """
         Calculate harga, tax, total
         Sama seperti di Laravel InsertCart/UpdateCart
+        
+        Dihitung dalam integer sen (app.core.money) dengan pembulatan half
+        up seperti PHP round(); dikonversi ke rupiah sekali di akhir.
+        """
+        line = money.price_line(
+            price=money.to_sen(harga_data.get('price', 0)),
+            cost=money.to_sen(harga_data.get('cost', 0)),
+            tax_rate=money.to_fixed(harga_data.get('tax_rate', 0) or 0) if cust_group == 1 else 0,
+            qty=money.to_fixed(qty),
+            tax_method=harga_data.get('tax_method'),
+            cust_group=cust_group
+        )
+        
+        return {
+            "harganet": money.from_sen(line.harganet),
+            "pajak": money.from_sen(line.pajak),
+            "total_harga": money.from_sen(line.total),
+            "profit": money.from_sen(line.profit),
+            "tax_rate": float(harga_data.get('tax_rate', 0) or 0) if cust_group == 1 else 0
+        }
+    
+    @staticmethod
+    def calculate_prices(
+        harga_rows: List[Dict],
+        qtys: List[float],
+        cust_group: int
+    ) -> Dict[str, List[float]]:
         """
-        # Convert all to float to avoid Decimal issues
-        tax_rate = float(harga_data.get('tax_rate', 0) or 0)
-        base_price = float(harga_data.get('price', 0))
-        cost = float(harga_data.get('cost', 0))
-        tax_method = harga_data.get('tax_method')
-        qty = float(qty)
-        
-        if cust_group == 1:  # Umum
-            if tax_method == "1":  # Exclude tax
-                harganet = base_price
-                pajak = round((harganet * (tax_rate / 100)) * qty, 2)
-                total_harga = (harganet * qty) + pajak
-            else:  # Include tax
-                harganet = (100 / (100 + tax_rate)) * base_price
-                pajak = round((base_price - harganet) * qty, 2)
-                total_harga = base_price * qty
-        else:  # Cabang/Gudang
-            harganet = base_price
-            tax_rate = 0
-            pajak = 0
-            total_harga = base_price * qty
-        
-        profit = round(qty * (harganet - cost), 2)
+        calculate_price untuk banyak baris sekaligus, dihitung per kolom.
+        
+        Kolom dikonversi ke integer sen sekali, lalu dihitung dengan
+        money.price_columns (rumus price_line per kolom, bukan per baris),
+        jadi hasil per baris identik dengan versi scalar.
+        
+        Returns:
+            Dict dengan key yang sama seperti calculate_price, isinya list per baris
+        """
+        prices = [money.to_sen(row.get('price', 0)) for row in harga_rows]
+        costs = [money.to_sen(row.get('cost', 0)) for row in harga_rows]
+        if cust_group == 1:
+            tax_rate = [float(row.get('tax_rate', 0) or 0) for row in harga_rows]
+            rates = [money.to_fixed(row.get('tax_rate', 0) or 0) for row in harga_rows]
+        else:
+            tax_rate = [0] * len(harga_rows)
+            rates = tax_rate
+        quantities = [money.to_fixed(qty) for qty in qtys]
+        
+        columns = money.price_columns(
+            prices, costs, rates, quantities, [row.get('tax_method') for row in harga_rows], cust_group
+        )
         
         return {
-            "harganet": round(harganet, 2),
-            "pajak": pajak,
-            "total_harga": round(total_harga, 2),
-            "profit": profit,
+            "harganet": [money.from_sen(sen) for sen in columns.harganet],
+            "pajak": [money.from_sen(sen) for sen in columns.pajak],
+            "total_harga": [money.from_sen(sen) for sen in columns.total],
+            "profit": [money.from_sen(sen) for sen in columns.profit],
             "tax_rate": tax_rate
         }
     
@@ -174,8 +919,16 @@ class TransaksiService:
     async def check_promo(
         db: AsyncSession,
         product_id: int
-    ) -> Optional[Product]:
-        """Check apakah product sedang promo"""
+    ) -> Optional[PromoWindow]:
+        """
+        Check apakah product sedang promo
+        
+        Dilayani dari promo_calendar (tanpa query); query ke products hanya
+        dipakai kalau calendar belum di-load.
+        """
+        if settings.PROMO_CALENDAR_ENABLED and promo_calendar.loaded:
+            return promo_calendar.get_active(product_id)
+        
         now = datetime.now(timezone.utc)
         
         result = await db.execute(
@@ -186,15 +939,42 @@ class TransaksiService:
                 Product.last_date >= now
             )
         )
-        return result.scalar_one_or_none()
+        product = result.scalar_one_or_none()
+        if product is None:
+            return None
+        return PromoWindow(
+            product.id,
+            product.starting_date,
+            product.last_date,
+            float(product.promotion_price or 0),
+            product.max_item_promo
+        )
+    
+    @staticmethod
+    def format_promo(promo: Optional[PromoWindow], qty: float) -> Optional[Dict]:
+        """
+        Format promo untuk response, termasuk jumlah yang dapat harga promo
+        (dibatasi max_item_promo)
+        """
+        if promo is None:
+            return None
+        return {
+            "promotion_price": promo.promotion_price,
+            "max_item_promo": promo.max_item_promo,
+            "qty_promo": PromoCalendar.promo_qty(promo, float(qty))
+        }
     
     @staticmethod
     async def get_cart_item(
         db: AsyncSession,
         transaksi_id: int,
         barcode: str
-    ) -> Optional[TransaksiDetail]:
+    ) -> Optional[Union[TransaksiDetail, CartLine]]:
         """Get item yang sudah ada di cart"""
+        if settings.CART_ENGINE_ENABLED:
+            cart = await cart_engine.get(db, transaksi_id)
+            return cart.lines.get(barcode)
+        
         result = await db.execute(
             select(TransaksiDetail).where(
                 TransaksiDetail.transaksi_id == transaksi_id,
@@ -207,8 +987,12 @@ class TransaksiService:
     async def get_all_cart_items(
         db: AsyncSession,
         transaksi_id: int
-    ) -> List[TransaksiDetail]:
+    ) -> List[Union[TransaksiDetail, CartLine]]:
         """Get semua item di cart"""
+        if settings.CART_ENGINE_ENABLED:
+            cart = await cart_engine.get(db, transaksi_id)
+            return list(cart.lines.values())
+        
         result = await db.execute(
             select(TransaksiDetail)
             .where(TransaksiDetail.transaksi_id == transaksi_id)
@@ -217,11 +1001,70 @@ class TransaksiService:
         return result.scalars().all()
     
     @staticmethod
-    def format_cart_items(items: List[TransaksiDetail]) -> List[Dict]:
+    async def get_cart_payload(
+        db: AsyncSession,
+        transaksi_id: int,
+        since: Optional[str] = None
+    ) -> Dict:
+        """
+        Cart lines untuk response add/update/delete/get cart.
+        
+        Jika client mengirim ``since`` (cart_version yang dipegang) dan worker
+        ini bisa menghitung delta, hanya baris yang berubah setelah versi itu
+        yang di-query dan dikirim, plus barcode yang dihapus. Selain itu
+        kirim full cart.
+        
+        Returns:
+            Dict dengan dataproduk, removed, delta, cart_version
+        """
+        changes = None
+        if deltas_enabled():
+            changes = cart_versions.changes_since(transaksi_id, since)
+        
+        if changes is not None:
+            changed, removed = changes
+            items = []
+            if changed and settings.CART_ENGINE_ENABLED:
+                cart = await cart_engine.get(db, transaksi_id)
+                items = [line for barcode, line in cart.lines.items() if barcode in changed]
+            elif changed:
+                result = await db.execute(
+                    select(TransaksiDetail)
+                    .where(
+                        TransaksiDetail.transaksi_id == transaksi_id,
+                        TransaksiDetail.barcode.in_(changed)
+                    )
+                    .order_by(TransaksiDetail.no.asc())
+                )
+                items = result.scalars().all()
+            cart_versions.delta_responses += 1
+            return {
+                "dataproduk": TransaksiService.format_cart_items(items),
+                "removed": removed,
+                "delta": True,
+                "cart_version": cart_versions.current(transaksi_id),
+            }
+        
+        items = await TransaksiService.get_all_cart_items(db, transaksi_id)
+        cart_version = None
+        if deltas_enabled():
+            cart_version = cart_versions.current(transaksi_id) or cart_versions.register(transaksi_id)
+            cart_versions.full_responses += 1
+        return {
+            "dataproduk": TransaksiService.format_cart_items(items),
+            "removed": None,
+            "delta": False,
+            "cart_version": cart_version,
+        }
+    
+    @staticmethod
+    def format_cart_items(items: List[Union[TransaksiDetail, CartLine]]) -> List[Dict]:
         """Format cart items untuk response"""
         result = []
         for item in items:
-            hargatax = float(item.harga) + (float(item.tax) / float(item.jumlah) if item.jumlah > 0 else 0)
+            harga_sen = money.to_sen(item.harga)
+            jumlah = money.to_fixed(item.jumlah)
+            hargatax = harga_sen + (money.div_half_up(money.to_sen(item.tax) * 100, jumlah) if jumlah > 0 else 0)
             result.append({
                 "no": item.no,
                 "transaksi_id": item.transaksi_id,
@@ -229,7 +1072,7 @@ class TransaksiService:
                 "product_id": item.product_id,
                 "harga": float(item.harga),
                 "tax": float(item.tax or 0),
-                "hargatax": round(hargatax, 2),
+                "hargatax": money.from_sen(hargatax),
                 "nama": item.nama,
                 "jumlah": float(item.jumlah),
                 "unit": item.unit,
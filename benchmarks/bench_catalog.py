@@ -0,0 +1,82 @@
+"""
+Benchmark: worker warmup and memory, dict caches vs the mmap catalog snapshot.
+
+Loads the product index and price cache the old way (full queries into
+per-worker dicts), then builds the catalog snapshot once and maps it, and
+reports warmup time, RSS growth of this process and lookup latency for
+both. With the snapshot the per-worker cost is the mapping itself: pages
+are shared through the page cache, so RSS stays flat as workers are added.
+
+    python -m benchmarks.bench_catalog --store-id 1 --lookups 20000
+"""
+import argparse
+import asyncio
+import random
+import resource
+import time
+
+from app.config import settings
+from app.database import engine
+from app.services.catalog_snapshot import catalog
+from app.services.price_cache import price_cache
+from app.services.product_index import product_index
+from app.services.reference_data import reference_data
+
+
+def rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def time_lookups(store_id, keys) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        product_index.lookup(store_id, key)
+    return (time.perf_counter() - started) * 1e6 / len(keys)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store-id", type=int, required=True)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    await reference_data.refresh()
+
+    settings.CATALOG_SNAPSHOT_ENABLED = False
+    rss = rss_mib()
+    started = time.perf_counter()
+    await product_index.load()
+    await price_cache.load()
+    warmup = time.perf_counter() - started
+    keys = [record.barcode for record in product_index._by_id.values() if record.store_id == args.store_id]
+    keys = random.choices(keys, k=args.lookups) if keys else ["-"]
+    print(
+        f"dicts     warmup={warmup * 1000:.0f}ms rss+={rss_mib() - rss:.1f}MiB "
+        f"lookup={time_lookups(args.store_id, keys):.2f}us"
+    )
+
+    product_index._by_barcode, product_index._by_code, product_index._by_id = {}, {}, {}
+    price_cache._tiers = {}
+
+    started = time.perf_counter()
+    await catalog.build()
+    build = time.perf_counter() - started
+
+    settings.CATALOG_SNAPSHOT_ENABLED = True
+    rss = rss_mib()
+    started = time.perf_counter()
+    await product_index.load()
+    await price_cache.load()
+    warmup = time.perf_counter() - started
+    print(
+        f"snapshot  build={build * 1000:.0f}ms (once, one worker) warmup={warmup * 1000:.1f}ms "
+        f"rss+={rss_mib() - rss:.1f}MiB file={catalog.current.size / 2 ** 20:.1f}MiB "
+        f"lookup={time_lookups(args.store_id, keys):.2f}us"
+    )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
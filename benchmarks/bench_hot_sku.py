@@ -0,0 +1,148 @@
+"""
+Benchmark: concurrent finalizes on a single hot product, row vs journal stock mode.
+
+--terminals concurrent sessions each finalize --rounds one-line carts of
+the same product (CheckoutService.create_product_sales and commit, like
+the checkout router), once with STOCK_MODE=row (every sale updates the
+product_warehouse row and queues on its lock) and once with
+STOCK_MODE=journal (every sale appends a delta). Reports throughput and
+p50/p99 finalize latency per mode. After the journal run the compactor
+folds the deltas, and the final qty is checked against the quantity sold.
+
+Uses scratch rows (transaksi_detail of the transaksi ids it creates from
+--id-base, reference_no HOTSKU-*) that are deleted at the end, and
+adds the quantity it sold back to qty (sales made by other sessions in
+the meantime are kept).
+Run it against a development database only.
+
+    python -m benchmarks.bench_hot_sku --warehouse-id 1 --terminals 20 --rounds 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, select, update
+
+from app.config import settings
+from app.core import money
+from app.database import AsyncSessionLocal, engine
+from app.models.sales import ProductLog, ProductSale, ProductWarehouse
+from app.models.stock_journal import StockJournalEntry
+from app.models.transaksi import TransaksiDetail
+from app.services.checkout_service import CheckoutService
+from app.services.stock_journal import stock_journal
+
+
+async def terminal(
+    args, id_base: int, terminal_no: int, product_id: int, latencies: list, created: list, sold: dict
+) -> None:
+    for round_no in range(args.rounds):
+        transaksi_id = id_base + terminal_no * args.rounds + round_no
+        created.append(transaksi_id)
+        async with AsyncSessionLocal() as db:
+            db.add(TransaksiDetail(
+                transaksi_id=transaksi_id, barcode="HOTSKU", product_id=product_id,
+                nama="hot sku", jumlah=1, unit="pcs", harga=0, total=0, unit_id=1,
+            ))
+            await db.commit()
+
+            started = time.perf_counter()
+            await CheckoutService.create_product_sales(
+                db, transaksi_id, f"HOTSKU-{transaksi_id}", 0, args.warehouse_id
+            )
+            await db.commit()
+            latencies.append(time.perf_counter() - started)
+            sold[settings.STOCK_MODE] += 100  # one unit, in hundredths
+
+
+async def run_mode(args, mode: str, id_base: int, product_id: int, created: list, sold: dict) -> None:
+    settings.STOCK_MODE = mode
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        terminal(args, id_base, terminal_no, product_id, latencies, created, sold)
+        for terminal_no in range(args.terminals)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{mode:8} finalizes={len(latencies)} {len(latencies) / elapsed:.0f}/s "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+    )
+
+
+async def read_qty(row_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        qty = (await db.execute(select(ProductWarehouse.qty).where(ProductWarehouse.id == row_id))).scalar_one()
+    return money.to_fixed(qty)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--warehouse-id", type=int, required=True)
+    parser.add_argument("--terminals", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--id-base", type=int, default=910_000_000)
+    args = parser.parse_args()
+    settings.STOCK_RESERVATION_ENABLED = False  # row mode = SELECT ... FOR UPDATE baseline
+
+    async with engine.begin() as conn:
+        await conn.run_sync(StockJournalEntry.__table__.create, checkfirst=True)
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(ProductWarehouse.id, ProductWarehouse.product_id)
+            .where(ProductWarehouse.warehouse_id == args.warehouse_id)
+            .order_by(ProductWarehouse.id)
+            .limit(1)
+        )).first()
+    if row is None:
+        raise SystemExit("no product_warehouse rows for this warehouse")
+    row_id, product_id = row.id, row.product_id
+    initial = await read_qty(row_id)
+    per_mode = args.terminals * args.rounds
+    created = []  # transaksi ids of the scratch carts (only these are deleted)
+    sold = {"row": 0, "journal": 0}  # committed sales per mode, in hundredths
+
+    try:
+        await run_mode(args, "row", args.id_base, product_id, created, sold)
+        assert await read_qty(row_id) == initial - per_mode * 100
+
+        await run_mode(args, "journal", args.id_base + per_mode, product_id, created, sold)
+        started = time.perf_counter()
+        await stock_journal.compact()
+        print(
+            f"compact  deltas={stock_journal.folded} {(time.perf_counter() - started) * 1000:.0f}ms "
+            f"pending={stock_journal.pending}"
+        )
+        assert await read_qty(row_id) == initial - 2 * per_mode * 100
+        print("qty ok (no lost updates in either mode)")
+    finally:
+        async with AsyncSessionLocal() as db:
+            # Deltas not compacted yet never reached qty: lock them (the compactor
+            # skips locked rows), drop them, and add back only the rest of the sales
+            pending = (await db.execute(
+                select(StockJournalEntry.id, StockJournalEntry.delta)
+                .where(StockJournalEntry.reference_no.like("HOTSKU-%"))
+                .with_for_update()
+            )).all()
+            if pending:
+                await db.execute(delete(StockJournalEntry).where(StockJournalEntry.id.in_([e.id for e in pending])))
+            restore = sold["row"] + sold["journal"] + sum(money.to_fixed(e.delta) for e in pending)
+            if restore:
+                await db.execute(
+                    update(ProductWarehouse)
+                    .where(ProductWarehouse.id == row_id)
+                    .values(qty=ProductWarehouse.qty + money.to_decimal(restore))
+                )
+            if created:
+                await db.execute(delete(TransaksiDetail).where(TransaksiDetail.transaksi_id.in_(created)))
+            await db.execute(delete(ProductSale).where(ProductSale.reference_no.like("HOTSKU-%")))
+            await db.execute(delete(ProductLog).where(ProductLog.reference_no.like("HOTSKU-%")))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
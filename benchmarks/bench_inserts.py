@@ -0,0 +1,102 @@
+"""
+Benchmark: checkout writers, ORM unit-of-work vs Core executemany.
+
+Writes --lines product_sales and product_logs rows (a wholesale sale)
+plus balance entries, once with one db.add() per row and a flush (the
+previous writers) and once with one Core INSERT executemany per table
+(the driver sends a multi-row INSERT), and reports rows per second. Each
+round runs inside a transaction that is rolled back, so nothing is kept.
+Run it against a development database.
+
+    python -m benchmarks.bench_inserts --lines 200 --rounds 20
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, engine
+from app.models.sales import Balance, ProductLog, ProductSale
+
+
+def make_rows(lines: int):
+    now = datetime.now(timezone.utc)
+    sales = [
+        {
+            "reference_no": "BENCH-INSERT", "product_id": no + 1, "qty": Decimal("2.00"),
+            "sale_unit_id": 1, "net_unit_price": Decimal("12500.00"), "discount": 0,
+            "tax_rate": Decimal("11.00"), "tax": Decimal("2477.48"), "total": Decimal("25000.00"),
+            "profit": Decimal("3100.00"), "taxed": 0, "created_at": now, "updated_at": now,
+        }
+        for no in range(lines)
+    ]
+    logs = [
+        {
+            "store_id": 1, "reference_no": "BENCH-INSERT", "warehouse_id": 1, "product_id": no + 1,
+            "start_qty": Decimal("100.00"), "end_qty": Decimal("98.00"), "run_qty": Decimal("2.00"),
+            "status_qty": 1, "created_at": now,
+        }
+        for no in range(lines)
+    ]
+    balances = [
+        {
+            "jenis_id": jenis_id, "reff_number": "BENCH-INSERT", "user_id": 1, "customer_id": 1,
+            "jumlah": Decimal("5000.00"), "bayar": 0, "trx_id": 0, "payment_method_id": 1,
+            "store_id": 1, "warehouse_id": 1, "created_at": now, "updated_at": now,
+        }
+        for jenis_id in (1, 7, 9, 10, 11)
+    ]
+    return sales, logs, balances
+
+
+async def write_orm(db, sales, logs, balances) -> None:
+    for row in sales:
+        db.add(ProductSale(**row))
+    for row in logs:
+        db.add(ProductLog(**row))
+    for row in balances:
+        db.add(Balance(**row))
+    await db.flush()
+
+
+async def write_core(db, sales, logs, balances) -> None:
+    await db.execute(insert(ProductSale.__table__), sales)
+    await db.execute(insert(ProductLog.__table__), logs)
+    await db.execute(insert(Balance.__table__), balances)
+
+
+async def measure(writer, rows, rounds: int) -> float:
+    count = sum(len(table) for table in rows)
+    elapsed = 0.0
+    for _ in range(rounds):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await writer(db, *rows)
+            elapsed += time.perf_counter() - started
+            await db.rollback()
+    return count * rounds / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.lines)
+    await measure(write_core, rows, 1)  # warm up the pool
+
+    orm = await measure(write_orm, rows, args.rounds)
+    core = await measure(write_core, rows, args.rounds)
+    print(f"lines={args.lines} rows/sale={sum(len(table) for table in rows)}")
+    print(f"orm  {orm:10.0f} rows/s")
+    print(f"core {core:10.0f} rows/s  ({core / orm:.1f}x)")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
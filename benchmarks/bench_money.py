@@ -0,0 +1,142 @@
+"""
+Benchmark + property check: integer sen pricing (app.core.money) vs the
+previous float calculate_price.
+
+For random lines (tax inclusive/exclusive, umum/cabang, fractional
+quantities) it checks that
+
+* the integer kernel equals an exact Fraction oracle (half-up, one rounding),
+* it differs from the old float code by at most 1 sen, and only where the
+  float code was off (rounding ties / binary representation),
+* grand total rounding to hundreds matches the old code except on exact
+  .50 ties, where money rounds half up like PHP and the old code rounded
+  half to even,
+
+then times both. No database needed.
+
+    python -m benchmarks.bench_money --lines 200000
+"""
+import argparse
+import random
+import time
+from fractions import Fraction
+
+from app.core import money
+from app.services.transaksi_service import TransaksiService
+
+
+def legacy_calculate_price(harga_data, qty, cust_group):
+    """calculate_price before the money kernel"""
+    tax_rate = float(harga_data.get('tax_rate', 0) or 0)
+    base_price = float(harga_data.get('price', 0))
+    cost = float(harga_data.get('cost', 0))
+    tax_method = harga_data.get('tax_method')
+    qty = float(qty)
+
+    if cust_group == 1:
+        if tax_method == "1":
+            harganet = base_price
+            pajak = round((harganet * (tax_rate / 100)) * qty, 2)
+            total_harga = (harganet * qty) + pajak
+        else:
+            harganet = (100 / (100 + tax_rate)) * base_price
+            pajak = round((base_price - harganet) * qty, 2)
+            total_harga = base_price * qty
+    else:
+        harganet = base_price
+        tax_rate = 0
+        pajak = 0
+        total_harga = base_price * qty
+
+    profit = round(qty * (harganet - cost), 2)
+    return {
+        "harganet": round(harganet, 2),
+        "pajak": pajak,
+        "total_harga": round(total_harga, 2),
+        "profit": profit,
+        "tax_rate": tax_rate
+    }
+
+
+def oracle(harga_data, qty, cust_group):
+    """Exact rational pricing with a single half-up rounding per field"""
+    price = Fraction(str(harga_data['price']))
+    cost = Fraction(str(harga_data['cost']))
+    rate = Fraction(str(harga_data['tax_rate'])) if cust_group == 1 else Fraction(0)
+    qty = Fraction(str(qty))
+
+    def r(value):
+        cents = abs(value) * 100
+        rounded = int(cents) + (1 if cents - int(cents) >= Fraction(1, 2) else 0)
+        return (rounded if value >= 0 else -rounded) / 100
+
+    if cust_group == 1 and harga_data['tax_method'] != "1":
+        net = price * 100 / (100 + rate)
+        return {"harganet": r(net), "pajak": r(price * rate * qty / (100 + rate)),
+                "total_harga": r(price * qty), "profit": r(qty * (net - cost))}
+    pajak = r(price * rate / 100 * qty)
+    return {"harganet": r(price), "pajak": pajak,
+            "total_harga": r(price * qty) + pajak, "profit": r(qty * (price - cost))}
+
+
+def random_line(rng):
+    price = rng.choice([rng.randint(5, 5000) * 100, round(rng.uniform(100, 250000), 2)])
+    harga_data = {
+        "price": price,
+        "cost": round(price * rng.uniform(0.6, 1.05), 2),
+        "tax_rate": rng.choice([0, 10, 11, 12.5]),
+        "tax_method": rng.choice(["1", "2"]),
+    }
+    qty = rng.choice([1, 2, 3, 12, 0.25, 1.5, round(rng.uniform(1, 500), 2)])
+    return harga_data, qty, rng.choice([1, 1, 1, 2])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lines = [random_line(rng) for _ in range(args.lines)]
+
+    differs = 0
+    for harga_data, qty, cust_group in lines:
+        new = TransaksiService.calculate_price(harga_data, qty, cust_group)
+        exact = oracle(harga_data, qty, cust_group)
+        for name, value in exact.items():
+            assert money.to_sen(new[name]) == money.to_sen(value), (harga_data, qty, cust_group, name)
+
+        old = legacy_calculate_price(harga_data, qty, cust_group)
+        for name in exact:
+            gap = abs(money.to_sen(new[name]) - money.to_sen(old[name]))
+            if gap:
+                differs += 1
+            assert gap <= 1, (harga_data, qty, cust_group, name, new[name], old[name])
+
+    ties = 0
+    for _ in range(args.lines):
+        total = rng.randint(0, 10_000_000) * 50  # sen, hits .50 ties often
+        old = round((total / 100) / 100) * 100
+        new = money.from_sen(money.round_hundreds(total))
+        if old != new:
+            ties += 1
+            assert total % 10000 == 5000, total
+        assert money.from_sen(money.floor_hundreds(total)) == (int(total / 100) // 100) * 100
+
+    started = time.perf_counter()
+    for harga_data, qty, cust_group in lines:
+        legacy_calculate_price(harga_data, qty, cust_group)
+    legacy_us = (time.perf_counter() - started) * 1e6 / args.lines
+
+    started = time.perf_counter()
+    for harga_data, qty, cust_group in lines:
+        TransaksiService.calculate_price(harga_data, qty, cust_group)
+    money_us = (time.perf_counter() - started) * 1e6 / args.lines
+
+    print(f"lines={args.lines} oracle=exact fields_off_by_1_sen_vs_float={differs} rounding_ties={ties}")
+    print(f"float={legacy_us:.2f}us/line money={money_us:.2f}us/line")
+
+
+if __name__ == "__main__":
+    main()
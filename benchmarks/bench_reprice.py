@@ -0,0 +1,78 @@
+"""
+Benchmark: whole-cart repricing, scalar calculate_price vs calculate_prices.
+
+Generates random carts (prices, tax rates and methods, fractional and
+wholesale quantities), checks that every column of calculate_prices is
+identical to calculate_price line by line, then times both. Both convert
+to integer sen the same way; calculate_prices then runs
+money.price_columns (price_line's formulas over whole columns) instead
+of one price_line call per line. Carts that mix tax-inclusive and
+tax-exclusive lines are split by method, so they gain the least.
+--tax-method pins every line to one method. No database needed.
+
+    python -m benchmarks.bench_reprice --lines 150 --carts 2000
+"""
+import argparse
+import random
+import time
+
+from app.services.transaksi_service import TransaksiService
+
+
+def random_cart(rng: random.Random, lines: int, methods: list):
+    rows, qtys = [], []
+    for _ in range(lines):
+        price = rng.choice([rng.randint(5, 2000) * 100, round(rng.uniform(100, 250000), 2)])
+        rows.append({
+            "price": price,
+            "cost": round(price * rng.uniform(0.6, 1.05), 2),
+            "tax_rate": rng.choice([0, 0, 10, 11, 12.5]),
+            "tax_method": rng.choice(methods),
+        })
+        qtys.append(rng.choice([1, 2, 3, 12, 24, 0.25, 1.5, round(rng.uniform(1, 500), 2)]))
+    return rows, qtys
+
+
+def check(carts, cust_group: int) -> None:
+    for rows, qtys in carts:
+        columns = TransaksiService.calculate_prices(rows, qtys, cust_group)
+        for i, (row, qty) in enumerate(zip(rows, qtys)):
+            expected = TransaksiService.calculate_price(row, qty, cust_group)
+            actual = {name: column[i] for name, column in columns.items()}
+            assert actual == expected, (row, qty, expected, actual)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=150)
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tax-method", choices=["1", "2", "mixed"], default="mixed")
+    args = parser.parse_args()
+
+    methods = ["1", "2", None] if args.tax_method == "mixed" else [args.tax_method]
+    rng = random.Random(args.seed)
+    carts = [random_cart(rng, args.lines, methods) for _ in range(args.carts)]
+
+    for cust_group in (1, 2):
+        check(carts, cust_group)
+
+        started = time.perf_counter()
+        for rows, qtys in carts:
+            for row, qty in zip(rows, qtys):
+                TransaksiService.calculate_price(row, qty, cust_group)
+        scalar = (time.perf_counter() - started) * 1000 / args.carts
+
+        started = time.perf_counter()
+        for rows, qtys in carts:
+            TransaksiService.calculate_prices(rows, qtys, cust_group)
+        columnar = (time.perf_counter() - started) * 1000 / args.carts
+
+        print(
+            f"cust_group={cust_group} tax_method={args.tax_method} lines={args.lines} identical=yes "
+            f"scalar={scalar:.3f}ms/cart columnar={columnar:.3f}ms/cart"
+        )
+
+
+if __name__ == "__main__":
+    main()
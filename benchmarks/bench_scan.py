@@ -0,0 +1,122 @@
+"""
+Benchmark: round trips and latency per barcode scan (/transaksi/add-product).
+
+Compares the original sequence of awaits (product lookup, price, cart line,
+second price, commit, promo, cart reload) with TransaksiService.scan_product.
+Runs against the database in DATABASE_URL and adds to a real cart, so point
+it at a scratch transaksi. Round trips are counted as executed statements;
+COMMIT is issued once per scan in both variants and is not counted.
+
+    python -m benchmarks.bench_scan --transaksi-id 300233 --barcode ppp \\
+        --store-id 1 --warehouse-id 1 --scans 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.models.transaksi import TransaksiDetail
+from app.services.price_cache import price_cache
+from app.services.product_index import product_index
+from app.services.transaksi_service import TransaksiService
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+async def legacy_scan(db, args) -> None:
+    """The add-product handler before the scan pipeline"""
+    product = await TransaksiService.get_product_by_barcode(db, args.barcode, args.store_id)
+    harga_data = await TransaksiService.get_harga(db, product.id, 1, args.cust_group, args.warehouse_id)
+    calculation = TransaksiService.calculate_price(harga_data, 1, args.cust_group)
+    existing = await TransaksiService.get_cart_item(db, args.transaksi_id, product.barcode)
+    if existing:
+        new_qty = existing.jumlah + 1
+        new_harga = await TransaksiService.get_harga(db, product.id, new_qty, args.cust_group, args.warehouse_id)
+        new_calculation = TransaksiService.calculate_price(new_harga, new_qty, args.cust_group)
+        existing.jumlah = new_qty
+        existing.harga = new_calculation['harganet']
+        existing.tax = new_calculation['pajak']
+        existing.total = new_calculation['total_harga']
+        existing.profit = new_calculation['profit']
+    else:
+        db.add(TransaksiDetail(
+            transaksi_id=args.transaksi_id, barcode=product.barcode, nama=product.name,
+            product_id=product.id, jumlah=1, unit=harga_data['unit_name'],
+            harga=calculation['harganet'], diskon=0, total=calculation['total_harga'],
+            is_point=product.is_point or 0, tax_rate=calculation['tax_rate'],
+            tax=calculation['pajak'], profit=calculation['profit'], unit_id=harga_data['unit_id'],
+        ))
+    await db.commit()
+    await TransaksiService.check_promo(db, product.id)
+    TransaksiService.format_cart_items(
+        await TransaksiService.get_all_cart_items(db, args.transaksi_id)
+    )
+
+
+async def pipeline_scan(db, args) -> None:
+    """The add-product handler with scan_product"""
+    product, _, _ = await TransaksiService.scan_product(
+        db, args.transaksi_id, args.barcode, 1, args.cust_group, args.warehouse_id, args.store_id
+    )
+    await db.commit()
+    await TransaksiService.check_promo(db, product.id)
+    TransaksiService.format_cart_items(
+        await TransaksiService.get_all_cart_items(db, args.transaksi_id)
+    )
+
+
+async def run(name, scan, args, counter) -> None:
+    latencies = []
+    counter.count = 0
+    for _ in range(args.scans):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await scan(db, args)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<10} round trips/scan={counter.count / args.scans:.2f} "
+        f"p50={statistics.median(latencies):.2f}ms p99={p99:.2f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transaksi-id", type=int, required=True)
+    parser.add_argument("--barcode", required=True)
+    parser.add_argument("--store-id", type=int, required=True)
+    parser.add_argument("--warehouse-id", type=int, required=True)
+    parser.add_argument("--cust-group", type=int, default=1)
+    parser.add_argument("--scans", type=int, default=200)
+    args = parser.parse_args()
+
+    counter = RoundTripCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+
+    settings.PRODUCT_INDEX_ENABLED = False
+    settings.PRICE_CACHE_ENABLED = False
+    await run("before", legacy_scan, args, counter)
+
+    settings.PRODUCT_INDEX_ENABLED = True
+    settings.PRICE_CACHE_ENABLED = True
+    await product_index.load()
+    await price_cache.load()
+    await run("after", pipeline_scan, args, counter)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
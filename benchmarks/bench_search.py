@@ -0,0 +1,84 @@
+"""
+Benchmark: /products/search index on a synthetic store.
+
+Builds a store of --products SKUs from a small vocabulary (so postings are
+dense, a harder case than real catalogs), checks incremental updates
+(rename, move to another store) against the index, then reports build time
+and per-query latency for typical cashier queries: word prefixes,
+multi-word, exact code, 2-char and misspelled input. No database needed.
+
+    python -m benchmarks.bench_search --products 50000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.product_index import ProductRecord, product_index
+from app.services.product_search import product_search
+
+BRANDS = [
+    "indomie", "sedaap", "abc", "aqua", "teh botol", "pocari", "sari roti", "chitato", "oreo",
+    "beng beng", "silverqueen", "ultra milk", "frisian flag", "kapal api", "gula pasir",
+    "minyak goreng bimoli", "sabun lifebuoy", "rinso", "molto", "pepsodent",
+]
+VARIANTS = [
+    "goreng", "rebus", "soto", "ayam bawang", "kari", "original", "coklat", "keju", "strawberry",
+    "vanilla", "pedas", "jumbo", "mini", "sachet", "botol", "kaleng", "pouch", "refill",
+]
+SIZES = ["75g", "80gr", "250ml", "600ml", "1l", "1kg", "500g", "2kg", "5l", "isi 10", "dus", "pak"]
+
+QUERIES = [
+    "indom goreng", "indomi", "brg00042", "bimoli 2kg", "teh", "ab",
+    "sari roti coklat", "kapl api", "silverquen keju",
+]
+
+
+def make_product(rng: random.Random, product_id: int) -> ProductRecord:
+    name = f"{rng.choice(BRANDS)} {rng.choice(VARIANTS)} {rng.choice(SIZES)}".upper()
+    return ProductRecord(
+        product_id, 1, f"899{product_id:010d}", f"BRG{product_id:05d}", name, name.title(),
+        0, 1, 1000.0, None, "1", None,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for product_id in range(1, args.products + 1):
+        product_index.put(make_product(rng, product_id))
+
+    product_search.attach()
+    await product_search.rebuild()
+    print(f"products={args.products} build={product_search.build_ms:.0f}ms grams={product_search.stats()['grams']}")
+
+    renamed = product_index.get(7)._replace(name="KOPI LUWAK SPESIAL", name_lbl=None)
+    product_index.put(renamed)
+    for listener in product_index.on_change:
+        listener(renamed)
+    assert [r.id for r in product_search.search(1, "luwak spes")] == [7]
+    assert 7 not in {r.id for r in product_search.search(1, "BRG00007", 50)[1:]}
+    moved = renamed._replace(store_id=2)
+    product_search.put(moved)
+    assert product_search.search(1, "luwak") == [] and product_search.search(2, "luwak")[0].id == 7
+    assert product_search.search(1, "BRG00042")[0].code == "BRG00042"
+
+    worst = 0.0
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            results = product_search.search(1, query, 20)
+        ms = (time.perf_counter() - started) * 1000 / args.repeat
+        worst = max(worst, ms)
+        top = results[0].name if results else "-"
+        print(f"{query!r:20} {ms:6.2f}ms results={len(results):2} top={top}")
+    print(f"worst={worst:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Parity check: price_cache.get_harga vs the original get_harga SQL.
+
+Samples --tier-sets (product, warehouse) tier sets from product_prices and
+asks both for every customer group at quantities around each tier
+(below the lowest minimal, on each minimal, between and above them).
+The SQL side is TransaksiService.get_harga with the price cache and
+reference data switched off, i.e. the joined query the cache replaces.
+Rows must have the same keys and equal values (numbers compared as
+Decimal, so float cost vs DECIMAL column is not a difference). Prints
+every mismatch and exits 1 if there was any.
+
+Read-only; safe against any database.
+
+    python -m benchmarks.parity_price_cache --tier-sets 500
+"""
+import argparse
+import asyncio
+import random
+import sys
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.models.transaksi import ProductPrice
+from app.services.price_cache import price_cache
+from app.services.product_index import product_index
+from app.services.reference_data import reference_data
+from app.services.transaksi_service import TransaksiService
+
+
+def normalize(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return Decimal(str(value)).normalize()
+    return value
+
+
+def differences(cached, expected) -> list:
+    if cached is None or expected is None:
+        return [] if cached is expected else [f"cache={cached!r} sql={expected!r}"]
+    diffs = []
+    if set(cached) != set(expected):
+        diffs.append(
+            f"keys cache-only={sorted(set(cached) - set(expected))} "
+            f"sql-only={sorted(set(expected) - set(cached))}"
+        )
+    for key in sorted(set(cached) & set(expected)):
+        if normalize(cached[key]) != normalize(expected[key]):
+            diffs.append(f"{key}: cache={cached[key]!r} sql={expected[key]!r}")
+    return diffs
+
+
+def quantities(minimals: list) -> list:
+    minimals = sorted({float(m) for m in minimals})
+    qtys = {max(minimals[0] - 0.5, 0.0), minimals[-1] + 1000}
+    for low, high in zip(minimals, minimals[1:] + [minimals[-1] + 2]):
+        qtys.update((low, (low + high) / 2))
+    return sorted(qtys)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tier-sets", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    await reference_data.refresh()
+    await product_index.load()
+    await price_cache.load()
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(ProductPrice.product_id, ProductPrice.warehouse_id, ProductPrice.minimal)
+        )).all()
+    tier_sets = {}
+    for row in rows:
+        tier_sets.setdefault((row.product_id, row.warehouse_id), []).append(row.minimal)
+    keys = sorted(tier_sets)
+    random.Random(args.seed).shuffle(keys)
+    keys = keys[:args.tier_sets]
+
+    settings.PRICE_CACHE_ENABLED = False
+    settings.REFERENCE_DATA_ENABLED = False
+    checked = mismatches = 0
+    async with AsyncSessionLocal() as db:
+        for product_id, warehouse_id in keys:
+            for qty in quantities(tier_sets[(product_id, warehouse_id)]):
+                for cust_group in (1, 2, 3):
+                    cached = price_cache.get_harga(product_id, qty, cust_group, warehouse_id)
+                    expected = await TransaksiService.get_harga(db, product_id, qty, cust_group, warehouse_id)
+                    checked += 1
+                    if cached is None and expected is not None:
+                        # Miss: production falls back to SQL, so only a wrong hit matters
+                        continue
+                    diffs = differences(cached, expected)
+                    if diffs:
+                        mismatches += 1
+                        print(f"product={product_id} warehouse={warehouse_id} qty={qty} group={cust_group}: {'; '.join(diffs)}")
+
+    print(
+        f"checked={checked} mismatches={mismatches} "
+        f"cache hits={price_cache.hits} misses={price_cache.misses}"
+    )
+    await engine.dispose()
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
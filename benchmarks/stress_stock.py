@@ -0,0 +1,145 @@
+"""
+Stress test: concurrent checkouts decrementing the same stock rows.
+
+Runs --terminals concurrent sessions, each finalizing --rounds carts of
+random lines over the same few products (CheckoutService.create_product_sales
+and commit, like the checkout router). Afterwards it checks that
+
+* every product_warehouse.qty dropped by exactly the quantity sold
+  (no lost updates),
+* per product, the product_logs written by the run chain exactly:
+  ordered by id, each start_qty is the previous end_qty,
+* no deadlock surfaced (lock order is by row id).
+
+Uses scratch rows (transaksi_detail of the transaksi ids it creates from
+--id-base, reference_no STRESS-*) that are deleted at the end, and
+adds the quantity it sold back to qty (sales made by other sessions in
+the meantime are kept).
+Run it against a development database only.
+
+    python -m benchmarks.stress_stock --warehouse-id 1 --products 5 --terminals 20 --rounds 10
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import delete, select, update
+
+from app.core import money
+from app.database import AsyncSessionLocal, engine
+from app.models.sales import ProductLog, ProductSale, ProductWarehouse
+from app.models.transaksi import TransaksiDetail
+from app.services.checkout_service import CheckoutService
+
+
+async def terminal(args, terminal_no: int, product_ids, sold: dict, created: list) -> None:
+    rng = random.Random(terminal_no)
+    for round_no in range(args.rounds):
+        transaksi_id = args.id_base + terminal_no * args.rounds + round_no
+        created.append(transaksi_id)
+        lines = []
+        for product_id in rng.sample(product_ids, rng.randint(1, len(product_ids))):
+            qty = rng.choice([1, 2, 3, Decimal("0.25"), Decimal("1.5")])
+            lines.append((product_id, qty))
+
+        async with AsyncSessionLocal() as db:
+            for no, (product_id, qty) in enumerate(lines):
+                db.add(TransaksiDetail(
+                    transaksi_id=transaksi_id, barcode=f"STRESS{no}", product_id=product_id,
+                    nama="stress", jumlah=qty, unit="pcs", harga=0, total=0, unit_id=1,
+                ))
+            await db.commit()
+
+            await CheckoutService.create_product_sales(
+                db, transaksi_id, f"STRESS-{transaksi_id}", 0, args.warehouse_id
+            )
+            await db.commit()
+
+        for product_id, qty in lines:
+            sold[product_id] += money.to_fixed(qty)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--warehouse-id", type=int, required=True)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--terminals", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--id-base", type=int, default=900_000_000)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ProductWarehouse.id, ProductWarehouse.product_id, ProductWarehouse.qty)
+            .where(ProductWarehouse.warehouse_id == args.warehouse_id)
+            .order_by(ProductWarehouse.id)
+            .limit(args.products)
+        )
+        # First row per product: the one create_product_sales decrements
+        row_ids, initial = {}, {}
+        for row in result:
+            if row.product_id not in row_ids:
+                row_ids[row.product_id] = row.id
+                initial[row.product_id] = money.to_fixed(row.qty)
+    product_ids = list(initial)
+    if not product_ids:
+        raise SystemExit("no product_warehouse rows for this warehouse")
+
+    sold = defaultdict(int)
+    created = []  # transaksi ids of the scratch carts (only these are deleted)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            terminal(args, terminal_no, product_ids, sold, created) for terminal_no in range(args.terminals)
+        ))
+        elapsed = time.perf_counter() - started
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(ProductWarehouse.product_id, ProductWarehouse.qty)
+                .where(ProductWarehouse.id.in_(list(row_ids.values())))
+            )
+            final = {row.product_id: money.to_fixed(row.qty) for row in result}
+
+            logs = await db.execute(
+                select(ProductLog.product_id, ProductLog.start_qty, ProductLog.end_qty)
+                .where(ProductLog.reference_no.like("STRESS-%"))
+                .order_by(ProductLog.id)
+            )
+            last_end = dict(initial)
+            for log in logs:
+                assert money.to_fixed(log.start_qty) == last_end[log.product_id], log
+                last_end[log.product_id] = money.to_fixed(log.end_qty)
+
+        for product_id in product_ids:
+            assert final[product_id] == initial[product_id] - sold[product_id], (
+                product_id, initial[product_id], sold[product_id], final[product_id]
+            )
+            assert last_end[product_id] == final[product_id]
+
+        checkouts = args.terminals * args.rounds
+        print(
+            f"checkouts={checkouts} products={len(product_ids)} lost_updates=0 "
+            f"log_chains=ok {checkouts / elapsed:.0f} checkouts/s"
+        )
+    finally:
+        async with AsyncSessionLocal() as db:
+            for product_id, qty in sold.items():  # only committed sales are counted
+                await db.execute(
+                    update(ProductWarehouse)
+                    .where(ProductWarehouse.id == row_ids[product_id])
+                    .values(qty=ProductWarehouse.qty + money.to_decimal(qty))
+                )
+            if created:
+                await db.execute(delete(TransaksiDetail).where(TransaksiDetail.transaksi_id.in_(created)))
+            await db.execute(delete(ProductSale).where(ProductSale.reference_no.like("STRESS-%")))
+            await db.execute(delete(ProductLog).where(ProductLog.reference_no.like("STRESS-%")))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())